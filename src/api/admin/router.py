@@ -0,0 +1,58 @@
+# admin routes
+import hmac
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel
+
+from external import db_service
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Admin endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+router = APIRouter(prefix="/admin")
+
+
+class ReloadRequest(BaseModel):
+    """Files to reload from; unset fields keep their currently served values"""
+
+    data_folder: Optional[str] = None
+    data_file: Optional[str] = None
+
+
+def check_admin_token(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.post("/reload", status_code=202)
+def reload(
+    request: Optional[ReloadRequest] = None,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """Build the player store in the background, then swap it in"""
+    check_admin_token(x_admin_token)
+    overrides = request.model_dump(exclude_none=True) if request else {}
+    source = {**db_service.get_player_store().source, **overrides}
+    if not db_service.start_reload(source):
+        raise HTTPException(status_code=409, detail="A reload is in progress")
+    logger.info(f"Reloading data from {source}")
+    return {"status": "reloading", "source": source}
+
+
+@router.get("/version")
+def version(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    store = db_service.get_player_store()
+    return {
+        "data_version": store.version,
+        "source": store.source,
+        "reload": db_service.reload_status,
+    }
@@ -1,9 +1,14 @@
+import asyncio
+import contextlib
+import logging
 import os
 from dotenv import load_dotenv
 import fastapi
+from admin.router import router as admin_router
 from model.router import router as model_router
 from chat.router import router as chat_router
-from external.db_service import initialize_data
+from players.router import router as players_router
+from external.db_service import initialize_data, reload_if_manifest_changed
 from cors import setup_cors
 
 if os.environ.get("ENV") != "prod":
@@ -16,12 +21,37 @@ if os.environ.get("ENV") != "test":
     initialize_data()
 
 
+# Reload the player data when the version manifest changes (0 disables)
+MANIFEST_POLL_SECONDS = float(os.environ.get("MANIFEST_POLL_SECONDS", "0"))
+
+
+async def poll_manifest():
+    while True:
+        await asyncio.sleep(MANIFEST_POLL_SECONDS)
+        try:
+            await asyncio.to_thread(reload_if_manifest_changed)
+        except Exception as e:
+            logging.warning(f"Checking the version manifest failed: {e}")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    task = None
+    if MANIFEST_POLL_SECONDS > 0:
+        task = asyncio.create_task(poll_manifest())
+    yield
+    if task is not None:
+        task.cancel()
+
+
 def create_app():
-    app = fastapi.FastAPI()
+    app = fastapi.FastAPI(lifespan=lifespan)
     setup_cors(app)
 
     app.include_router(model_router)
     app.include_router(chat_router)
+    app.include_router(admin_router)
+    app.include_router(players_router)
 
     @app.get("/health")
     def health():
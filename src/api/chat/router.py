@@ -4,8 +4,9 @@ import json
 import logging
 import os
 
-from external.llm_service import ChatRequest, stream_chat_response
-from fastapi import APIRouter, WebSocket
+from external.llm_service import ChatRequest, UnknownPlayerError, stream_chat_response
+from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.websockets import WebSocketDisconnect, WebSocketState
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -28,15 +29,24 @@ async def websocket_endpoint(websocket: WebSocket):
             logging.info(f"Received WebSocket message: {text_data}")
             request = ChatRequest(**json.loads(text_data))
 
-            async for chunk in stream_chat_response(request):
-                await websocket.send_text(chunk)
+            try:
+                async for chunk in stream_chat_response(request):
+                    await websocket.send_text(chunk)
+            except UnknownPlayerError as e:
+                # Players are looked up before anything is streamed, so the
+                # error is the whole reply and the connection stays usable
+                logging.info(f"Rejecting chat message: {e}")
+                await websocket.send_text(f"Error: {e}")
 
             await websocket.send_text(END_MARKER)
+    except WebSocketDisconnect:
+        logging.info("WebSocket disconnected")
     except Exception as e:
         logging.error(f"WebSocket error: {str(e)}")
         raise
     finally:
-        await websocket.close()
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
 
 
 class ChatResponse(BaseModel):
@@ -47,6 +57,9 @@ class ChatResponse(BaseModel):
 async def chat(request: ChatRequest):
     # run chat stream and append to a string, then return the string
     response = ""
-    async for chunk in stream_chat_response(request):
-        response += chunk
+    try:
+        async for chunk in stream_chat_response(request):
+            response += chunk
+    except UnknownPlayerError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     return ChatResponse(message=response)
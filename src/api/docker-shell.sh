@@ -12,6 +12,10 @@ export GCS_BUCKET_NAME="msmballstars-data"
 export DATA_FOLDER="version1"
 export DATA_FILE="combined_atp_matches.csv"
 export GOOGLE_APPLICATION_CREDENTIALS=/secrets/data-service-account.json
+# Admin reloads are disabled unless ADMIN_TOKEN is set
+export ADMIN_TOKEN=${ADMIN_TOKEN:-""}
+export MANIFEST_POLL_SECONDS=${MANIFEST_POLL_SECONDS:-0}
+export WEB_CONCURRENCY=${WEB_CONCURRENCY:-1}
 export API_PORT=8000
 # Check to see if path to secrets is correct
 if [ ! -f "$SECRETS_DIR/data-service-account.json" ]; then
@@ -40,6 +44,9 @@ docker run --rm -it \
 -e GCS_BUCKET_NAME=$GCS_BUCKET_NAME \
 -e DATA_FOLDER=$DATA_FOLDER \
 -e DATA_FILE=$DATA_FILE \
+-e ADMIN_TOKEN=$ADMIN_TOKEN \
+-e MANIFEST_POLL_SECONDS=$MANIFEST_POLL_SECONDS \
+-e WEB_CONCURRENCY=$WEB_CONCURRENCY \
 -e ENV=prod \
 -e PORT=$API_PORT \
 -p $API_PORT:$API_PORT \
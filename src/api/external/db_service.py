@@ -1,10 +1,23 @@
-from io import StringIO
+from io import BytesIO
+import json
 import logging
 import os
+import threading
 
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 import pandas as pd
 
+from .gcs_cache import GcsCache
+from .pair_matrix import SCHEMA_FILE as PAIR_MATRIX_SCHEMA_FILE
+from .pair_matrix import PairMatrix
+from .player_index import PlayerIndex
+from .player_snapshot import (
+    FORMAT_VERSION,
+    SCHEMA_FILE,
+    PlayerSnapshot,
+    snapshot_files,
+)
 from .helper import (
     get_h2h_match_history,
     get_player_last_nplus1_matches,
@@ -22,6 +35,28 @@ GOOGLE_APPLICATION_CREDENTIALS = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"
 DATA_FOLDER = os.environ.get("DATA_FOLDER", "version1")
 DATA_FILE = os.environ.get("DATA_FILE", "combined_atp_matches.csv")
 GCS_CACHE = os.environ.get("GCS_CACHE")
+# Least recently used files are evicted past this size; 0 for no limit
+GCS_CACHE_MAX_MB = int(os.environ.get("GCS_CACHE_MAX_MB", "4096"))
+# Files larger than GCS_CHUNK_MB download as concurrent byte ranges
+GCS_DOWNLOAD_WORKERS = int(os.environ.get("GCS_DOWNLOAD_WORKERS", "8"))
+GCS_CHUNK_MB = int(os.environ.get("GCS_CHUNK_MB", "32"))
+gcs_cache = GcsCache(
+    GCS_CACHE,
+    GCS_CACHE_MAX_MB * 1024 * 1024 or None,
+    workers=GCS_DOWNLOAD_WORKERS,
+    chunk_bytes=GCS_CHUNK_MB * 1024 * 1024,
+)
+# Reloads keep serving the current data if the "api" section of MANIFEST_FILE
+# (in the bucket) is unchanged
+MANIFEST_FILE = os.environ.get("MANIFEST_FILE", "serving_manifest.json")
+# Map the player snapshot preprocessing writes next to DATA_FILE, when there
+# is one, instead of parsing the CSV
+USE_PLAYER_SNAPSHOT = os.environ.get("USE_PLAYER_SNAPSHOT", "1") == "1"
+SNAPSHOT_SUFFIX = ".snapshot"
+# Serve the top players' pairs from the matrix probability_model's
+# precompute_pairs.py writes to DATA_FOLDER/PAIR_MATRIX_DIR, when there is one
+USE_PAIR_MATRIX = os.environ.get("USE_PAIR_MATRIX", "1") == "1"
+PAIR_MATRIX_DIR = os.environ.get("PAIR_MATRIX_DIR", "pair_matrix")
 
 
 def get_gcs_client():
@@ -34,27 +69,74 @@ def get_gcs_client():
 
 
 def read_csv_from_gcs(bucket, file_name):
+    """Read a CSV from GCS, through the local cache under GCS_CACHE if it is set"""
     logging.info(f"Reading file: {file_name}")
     if GCS_CACHE:
-        local_file_path = os.path.join(GCS_CACHE, file_name)
-        if os.path.exists(local_file_path):
-            logging.info(f"File found in local cache: {local_file_path}")
-            return pd.read_csv(local_file_path)
-
-    blob = bucket.blob(file_name)
-    content = blob.download_as_text()
-    # Write to local cache
-    if GCS_CACHE:
-        local_file_path = os.path.join(GCS_CACHE, file_name)
-        # create all parent directories if they don't exist
-        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-        with open(local_file_path, "w") as f:
-            f.write(content)
+        return pd.read_csv(gcs_cache.get_path(bucket, file_name))
+    return pd.read_csv(BytesIO(gcs_cache.read_bytes(bucket, file_name)))
+
+
+def load_player_snapshot(bucket, data_folder, data_file):
+    """
+    Memory-map the player snapshot of data_file from the local cache, or
+    return None if preprocessing did not write one, or wrote it in another
+    format. Workers on a node map the same cached files, so they share its
+    pages.
+    """
+    prefix = os.path.join(
+        data_folder, f"{os.path.splitext(data_file)[0]}{SNAPSHOT_SUFFIX}"
+    )
+    try:
+        schema_path = gcs_cache.get_path(bucket, f"{prefix}/{SCHEMA_FILE}")
+    except NotFound:
+        logging.info(f"No player snapshot at {prefix}")
+        return None
+    with open(schema_path) as f:
+        schema = json.load(f)
+    if schema.get("format_version") != FORMAT_VERSION:
+        logging.info(
+            f"Player snapshot at {prefix} has format {schema.get('format_version')}, "
+            f"expected {FORMAT_VERSION}"
+        )
+        return None
+    # The schema is fetched again, a cache hit, so that it is pinned as well
+    names = [SCHEMA_FILE] + snapshot_files(schema)
+    gcs_cache.get_paths(bucket, [f"{prefix}/{name}" for name in names])
+    return PlayerSnapshot(os.path.dirname(schema_path))
 
-    return pd.read_csv(StringIO(content))
 
+def load_pair_matrix(bucket, data_folder):
+    """
+    Memory-map the precomputed pair matrix of data_folder from the local
+    cache, or return None if none was computed
+    """
+    prefix = os.path.join(data_folder, PAIR_MATRIX_DIR)
+    try:
+        schema_path = gcs_cache.get_path(bucket, f"{prefix}/{PAIR_MATRIX_SCHEMA_FILE}")
+    except NotFound:
+        logging.info(f"No pair matrix at {prefix}")
+        return None
+    with open(schema_path) as f:
+        schema = json.load(f)
+    names = [PAIR_MATRIX_SCHEMA_FILE, schema["matrix_file"]]
+    gcs_cache.get_paths(bucket, [f"{prefix}/{name}" for name in names])
+    pair_matrix = PairMatrix(os.path.dirname(schema_path))
+    logging.info(
+        f"Mapped pair matrix of {len(pair_matrix)} players for "
+        f"{pair_matrix.model_version}"
+    )
+    return pair_matrix
 
-def load_data():
+
+def load_precomputed_pairs(data_folder=DATA_FOLDER):
+    if os.environ.get("ENV") == "test" or not USE_PAIR_MATRIX:
+        return None
+
+    bucket = get_gcs_client().bucket(BUCKET_NAME)
+    return load_pair_matrix(bucket, data_folder)
+
+
+def load_data(data_folder=DATA_FOLDER, data_file=DATA_FILE):
     """Load data from GCS and preprocess it."""
     if os.environ.get("ENV") == "test":
         return None, None
@@ -62,7 +144,13 @@ def load_data():
     client = get_gcs_client()
     bucket = client.bucket(BUCKET_NAME)
 
-    df = read_csv_from_gcs(bucket, os.path.join(DATA_FOLDER, DATA_FILE))
+    if USE_PLAYER_SNAPSHOT:
+        snapshot = load_player_snapshot(bucket, data_folder, data_file)
+        if snapshot is not None:
+            logging.info(f"Mapped player snapshot of {len(snapshot)} players")
+            return snapshot, snapshot.feature_cols
+
+    df = read_csv_from_gcs(bucket, os.path.join(data_folder, data_file))
     logging.info(f"Data shape: {df.shape}")
 
     # Create dataset
@@ -73,19 +161,115 @@ def load_data():
     return player_dfs, feature_cols
 
 
-player_dfs, feature_cols = None, None
+class PlayerStore:
+    """
+    Per-player match histories and the files they were built from.
+    player_dfs maps player id to frame: a dict built from the CSV, or a
+    memory-mapped PlayerSnapshot. pair_matrix holds precomputed predictions
+    for the top players, if any. A reload builds a new store and swaps the
+    module reference, so requests that already hold a store keep using it.
+    """
+
+    def __init__(self, player_dfs, feature_cols, source, pair_matrix=None):
+        self.player_dfs = player_dfs
+        self.feature_cols = feature_cols
+        self.source = source
+        self.pair_matrix = pair_matrix
+        self.version = f"{source['data_folder']}/{source['data_file']}"
+        self._player_index = None
+        self._player_index_lock = threading.Lock()
+
+    @property
+    def player_index(self) -> PlayerIndex:
+        """The directory of the store's players, built on first use"""
+        with self._player_index_lock:
+            if self._player_index is None:
+                self._player_index = PlayerIndex(self.player_dfs)
+        return self._player_index
+
+
+def default_source():
+    return {"data_folder": DATA_FOLDER, "data_file": DATA_FILE}
+
+
+def load_player_store(source=None) -> PlayerStore:
+    source = source or default_source()
+    player_dfs, feature_cols = load_data(source["data_folder"], source["data_file"])
+    pair_matrix = load_precomputed_pairs(source["data_folder"])
+    return PlayerStore(player_dfs, feature_cols, source, pair_matrix)
+
+
+player_store = None
+reload_lock = threading.Lock()
+reload_status = {"state": "idle", "source": None, "error": None}
 
 
 def initialize_data():
-    global player_dfs, feature_cols
-    player_dfs, feature_cols = load_data()
+    global player_store
+    player_store = load_player_store()
+
+
+def get_player_store() -> PlayerStore:
+    if player_store is None:
+        initialize_data()
+    return player_store
+
+
+def run_reload(source):
+    global player_store
+    try:
+        player_store = load_player_store(source)
+        reload_status.update(state="idle", error=None)
+        logging.info(f"Now serving data {player_store.version}")
+    except Exception as e:
+        reload_status.update(state="failed", error=str(e))
+        logging.error(f"Reloading data from {source} failed: {e}", exc_info=True)
+    finally:
+        reload_lock.release()
+
+
+def start_reload(source) -> bool:
+    """Build a store from source in a background thread, unless a reload is running"""
+    if not reload_lock.acquire(blocking=False):
+        return False
+    reload_status.update(state="reloading", source=source, error=None)
+    threading.Thread(
+        target=run_reload, args=(source,), name="data-reload", daemon=True
+    ).start()
+    return True
+
+
+def read_manifest():
+    """The API's section of the version manifest, or None if there is none"""
+    bucket = get_gcs_client().bucket(BUCKET_NAME)
+    try:
+        manifest = json.loads(bucket.blob(MANIFEST_FILE).download_as_bytes())
+    except NotFound:
+        return None
+    return manifest.get("api")
+
+
+def reload_if_manifest_changed():
+    """Start a reload if the manifest points at other files than are served"""
+    manifest = read_manifest()
+    if not manifest:
+        return False
+    current = get_player_store().source
+    source = {**current, **manifest}
+    failed_before = (
+        reload_status["state"] == "failed" and reload_status["source"] == source
+    )
+    if source == current or failed_before:
+        return False
+    logging.info(f"{MANIFEST_FILE} changed, reloading data from {source}")
+    return start_reload(source)
 
 
 def get_match_data(
-    player_a_id: str, player_b_id: str, lookback: int
+    player_a_id: int, player_b_id: int, lookback: int, store: PlayerStore = None
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, list[str]]:
-    if player_dfs is None or feature_cols is None:
-        initialize_data()
+    store = store or get_player_store()
+    player_dfs = store.player_dfs
 
     player_a_previous_matches = get_player_last_nplus1_matches(
         player_dfs, player_a_id, lookback
@@ -99,5 +283,5 @@ def get_match_data(
         player_a_previous_matches,
         player_b_previous_matches,
         h2h_match_history,
-        feature_cols,
+        store.feature_cols,
     )
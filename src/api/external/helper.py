@@ -4,9 +4,20 @@ import numpy as np
 import pandas as pd
 
 
-def preprocess_data(df: pd.DataFrame) -> tuple[dict[str, pd.DataFrame], list[str]]:
+def with_player_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """df with its winner_id and loser_id, the ATP player ids, as int64"""
+    return df.astype({"winner_id": np.int64, "loser_id": np.int64})
+
+
+def player_id(history: pd.DataFrame) -> int:
+    """The id of the player whose history this is"""
+    match = history.iloc[0]
+    return match["winner_id"] if match["is_winner"] == 1 else match["loser_id"]
+
+
+def preprocess_data(df: pd.DataFrame) -> tuple[dict[int, pd.DataFrame], list[str]]:
     # Sort by date
-    df = df.sort_values("tourney_date")
+    df = with_player_ids(df).sort_values("tourney_date")
 
     # Select relevant features
     feature_cols: list[str] = [
@@ -14,18 +25,18 @@ def preprocess_data(df: pd.DataFrame) -> tuple[dict[str, pd.DataFrame], list[str
     ]
 
     # Create player-specific dataframes
-    player_dfs: dict[str, pd.DataFrame] = {}
-    for player in set(df["winner_name"].unique()) | set(df["loser_name"].unique()):
+    player_dfs: dict[int, pd.DataFrame] = {}
+    for player in np.union1d(df["winner_id"].unique(), df["loser_id"].unique()):
         player_matches = df[
-            (df["winner_name"] == player) | (df["loser_name"] == player)
+            (df["winner_id"] == player) | (df["loser_id"] == player)
         ].copy()
-        player_matches["is_winner"] = (player_matches["winner_name"] == player).astype(
-            int
-        )
+        is_winner = player_matches["winner_id"] == player
+        player_matches["is_winner"] = is_winner.astype(int)
         player_matches["opponent"] = np.where(
-            player_matches["winner_name"] == player,
-            player_matches["loser_name"],
-            player_matches["winner_name"],
+            is_winner, player_matches["loser_name"], player_matches["winner_name"]
+        )
+        player_matches["opponent_id"] = np.where(
+            is_winner, player_matches["loser_id"], player_matches["winner_id"]
         )
         player_dfs[player] = player_matches.reset_index()
 
@@ -39,13 +50,13 @@ def calculate_percentage_difference(val1, val2):
 
 
 def get_player_last_nplus1_matches(
-    player_dfs: Dict[str, pd.DataFrame], player_id: str, n: int
+    player_dfs: Dict[int, pd.DataFrame], player_id: int, n: int
 ) -> pd.DataFrame:
     return player_dfs[player_id].tail(n + 1).reset_index()
 
 
 def get_player_last_nplus1_matches_since_date(
-    player_dfs: Dict[str, Any], player_id: str, n: int, date: str
+    player_dfs: Dict[int, Any], player_id: int, n: int, date: str
 ) -> pd.DataFrame:
     return (
         player_dfs[player_id][player_dfs[player_id]["tourney_date"] < date]
@@ -55,16 +66,18 @@ def get_player_last_nplus1_matches_since_date(
 
 
 def get_h2h_match_history(
-    player_dfs: Dict[str, Any], player_a_id: str, player_b_id: str
+    player_dfs: Dict[int, Any], player_a_id: int, player_b_id: int
 ) -> pd.DataFrame:
-    return player_dfs[player_a_id][player_dfs[player_a_id]["opponent"] == player_b_id]
+    return player_dfs[player_a_id][
+        player_dfs[player_a_id]["opponent_id"] == player_b_id
+    ]
 
 
 def get_h2h_match_history_since_date(
-    player_dfs: Dict[str, Any], player_a_id: str, player_b_id: str, date: str
+    player_dfs: Dict[int, Any], player_a_id: int, player_b_id: int, date: str
 ) -> pd.DataFrame:
     return player_dfs[player_a_id][
-        (player_dfs[player_a_id]["opponent"] == player_b_id)
+        (player_dfs[player_a_id]["opponent_id"] == player_b_id)
         & (player_dfs[player_a_id]["tourney_date"] < date)
     ]
 
@@ -86,7 +99,7 @@ def create_matchup_data(
                 continue
 
             # Store opponent ID for this match
-            opponents.append(matchup["opponent"])
+            opponents.append(matchup["opponent_id"])
 
             # Extract match features
             match_features = [
@@ -119,14 +132,9 @@ def create_matchup_data(
                     )  # Include raw value and difference
             features.append(match_features)
 
-    # Get player names by counting occurrences in their histories
-    p1_names = pd.concat([p1_history["winner_name"], p1_history["loser_name"]])
-    p2_names = pd.concat([p2_history["winner_name"], p2_history["loser_name"]])
-    p1_name = p1_names.value_counts().index[0]  # Most frequent name is the player
-    p2_name = p2_names.value_counts().index[0]
-
     # Create opponent masks - mark matches where players played each other
-    p1_mask = [1 if opp == p2_name else 0 for opp in p1_opponents]
-    p2_mask = [1 if opp == p1_name else 0 for opp in p2_opponents]
+    p1_id, p2_id = player_id(p1_history), player_id(p2_history)
+    p1_mask = [1 if opp == p2_id else 0 for opp in p1_opponents]
+    p2_mask = [1 if opp == p1_id else 0 for opp in p2_opponents]
 
     return p1_features, p2_features, p1_mask, p2_mask
@@ -1,12 +1,16 @@
 import logging
-from typing import List, Literal
+from typing import List, Literal, Union
 
 import httpx
-from external.db_service import get_match_data
+from external.db_service import PlayerStore, get_match_data, get_player_store
 from config import LLM_BASE_URL
 from pydantic import BaseModel
 
 
+class UnknownPlayerError(ValueError):
+    """A chat request names a player the player store does not have"""
+
+
 class ChatMessage(BaseModel):
     message: str
     sender: Literal["user", "assistant"]
@@ -16,8 +20,9 @@ class ChatMessage(BaseModel):
 
 
 class ChatRequest(BaseModel):
-    player_a_id: str
-    player_b_id: str
+    # Player ids, or names, which are resolved to ids
+    player_a_id: Union[int, str]
+    player_b_id: Union[int, str]
     lookback: int = 10
 
     query: str
@@ -25,14 +30,16 @@ class ChatRequest(BaseModel):
 
 
 def make_rag_system_message_from_match_data(
-    player_a_name: str, player_b_name: str, lookback: int
+    player_a: dict, player_b: dict, lookback: int, store: PlayerStore = None
 ) -> str:
+    """player_a and player_b are the store's player index entries"""
+    player_a_name, player_b_name = player_a["name"], player_b["name"]
     (
         player_a_previous_matches,
         player_b_previous_matches,
         h2h_match_history,
         _feature_cols,
-    ) = get_match_data(player_a_name, player_b_name, lookback)
+    ) = get_match_data(player_a["id"], player_b["id"], lookback, store)
 
     # Format player A's recent matches
     player_a_stats = "\nPlayer A ({}) recent matches:\n".format(player_a_name)
@@ -87,8 +94,15 @@ analysis.
 async def stream_chat_response(request: ChatRequest):
     url = f"{LLM_BASE_URL}/chat"
 
+    store = get_player_store()
+    players = []
+    for player in (request.player_a_id, request.player_b_id):
+        entry = store.player_index.get(player)
+        if entry is None:
+            raise UnknownPlayerError(f"Unknown player: {player}")
+        players.append(entry)
     rag_match_data_message = make_rag_system_message_from_match_data(
-        request.player_a_id, request.player_b_id, request.lookback
+        *players, request.lookback, store
     )
 
     async with httpx.AsyncClient() as client:
@@ -1,19 +1,88 @@
+import logging
+import os
+import threading
+import time
+
 import requests
 from config import MODEL_BASE_URL
-from external.db_service import get_match_data
+from fastapi import HTTPException
+from external.db_service import PlayerStore, get_match_data
 from external.helper import create_matchup_data
 
+# Model service response headers that say what served a prediction, and the
+# names the API passes them on under
+MODEL_VERSION_HEADERS = {
+    "X-Model-Version": "X-Model-Version",
+    "X-Data-Version": "X-Model-Data-Version",
+}
+# The same versions in the model service's /ready response
+MODEL_VERSION_FIELDS = {
+    "model_version": "X-Model-Version",
+    "data_version": "X-Model-Data-Version",
+}
+MODEL_VERSION_CHECK_SECONDS = float(os.environ.get("MODEL_VERSION_CHECK_SECONDS", "5"))
+
+model_versions = {}
+model_versions_checked = None
+model_versions_lock = threading.Lock()
+
+
+def update_model_versions(versions: dict[str, str]):
+    """Remember what the model service serves, from any of its responses"""
+    global model_versions
+    if versions:
+        model_versions = versions
+
 
-def get_victory_prediction(player_a_id: str, player_b_id: str, lookback: int) -> float:
+def get_model_versions() -> dict[str, str]:
+    """
+    What the model service currently serves, under the API's header names.
+    Checked with its /ready endpoint at most every MODEL_VERSION_CHECK_SECONDS;
+    the last known versions are kept while it cannot be reached.
+    """
+    global model_versions_checked
+    now = time.monotonic()
+    with model_versions_lock:
+        due = (
+            model_versions_checked is None
+            or now - model_versions_checked >= MODEL_VERSION_CHECK_SECONDS
+        )
+        if due:
+            model_versions_checked = now
+    if due:
+        try:
+            response = requests.get(f"{MODEL_BASE_URL}/ready", timeout=1)
+            if response.status_code == 200:
+                body = response.json()
+                update_model_versions(
+                    {
+                        name: body[field]
+                        for field, name in MODEL_VERSION_FIELDS.items()
+                        if body.get(field)
+                    }
+                )
+        except requests.RequestException as e:
+            logging.warning(f"Checking the model version failed: {e}")
+    return model_versions
+
+
+def get_victory_prediction(
+    player_a_id: int, player_b_id: int, lookback: int, store: PlayerStore = None
+) -> tuple[float, dict[str, str]]:
+    """
+    Returns the probability and the model service's version headers, renamed.
+    Raises a 503 with the model service's Retry-After while it cannot serve,
+    e.g. while loading a model or with a full queue.
+    """
     if player_a_id == player_b_id:
-        return 0.5
+        return 0.5, {}
 
     (
         player_a_previous_matches,
         player_b_previous_matches,
         _,
         feature_cols,
-    ) = get_match_data(player_a_id, player_b_id, lookback)
+    ) = get_match_data(player_a_id, player_b_id, lookback, store)
 
     player_a_features, player_b_features, player_a_mask, player_b_mask = (
         create_matchup_data(
@@ -30,4 +99,18 @@ def get_victory_prediction(player_a_id: str, player_b_id: str, lookback: int) ->
             "M2": [float(x) for x in player_b_mask],
         },
     )
-    return response.json()["player_a_win_probability"]
+    if response.status_code == 503:
+        retry_after = response.headers.get("Retry-After")
+        raise HTTPException(
+            status_code=503,
+            detail="Model service unavailable",
+            headers={"Retry-After": retry_after} if retry_after else None,
+        )
+    response.raise_for_status()
+    versions = {
+        name: response.headers[model_name]
+        for model_name, name in MODEL_VERSION_HEADERS.items()
+        if model_name in response.headers
+    }
+    update_model_versions(versions)
+    return response.json()["player_a_win_probability"], versions
@@ -0,0 +1,150 @@
+import bisect
+import difflib
+import functools
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+# Fuzzy matches must be at least this similar to the query (difflib ratio)
+FUZZY_CUTOFF = 0.75
+# Recent searches kept per index, so paging through results scans once
+SEARCH_CACHE_SIZE = 256
+
+
+def latest_name(df: pd.DataFrame) -> str:
+    """The player's name in their latest match"""
+    match = df.iloc[-1]
+    return match["winner_name"] if match["is_winner"] == 1 else match["loser_name"]
+
+
+def player_summaries(player_dfs) -> Dict[int, tuple]:
+    """(name, number of matches, date of the latest match) of every player id"""
+    if hasattr(player_dfs, "summaries"):
+        return player_dfs.summaries()
+    return {
+        player: (latest_name(df), len(df), df["tourney_date"].max())
+        for player, df in player_dfs.items()
+    }
+
+
+def name_keys(name: str) -> List[str]:
+    """
+    Lowercase keys a name is found under by prefix: the whole name and the
+    part from each later word on, so "fed" finds "Roger Federer"
+    """
+    words = name.lower().split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class PlayerIndex:
+    """
+    Directory of the players in a store, sorted by name, with their ids,
+    match counts and last active dates. Prefix search is a binary search in
+    a sorted list of name keys; fuzzy search ranks the remaining names by
+    similarity to the query. Clients may name players; resolve maps names
+    to the ids the store is keyed by.
+    """
+
+    def __init__(self, player_dfs):
+        summaries = player_summaries(player_dfs)
+        self.ids = sorted(
+            (int(player) for player in summaries),
+            key=lambda player: (
+                summaries[player][0].lower(),
+                summaries[player][0],
+                player,
+            ),
+        )
+        self.names = [summaries[player][0] for player in self.ids]
+        self.positions = {player: i for i, player in enumerate(self.ids)}
+        self.matches = [summaries[player][1] for player in self.ids]
+        self.last_active = [
+            pd.Timestamp(summaries[player][2]).date().isoformat() for player in self.ids
+        ]
+        # A name shared by several players resolves to the most recently
+        # active one
+        self.name_ids = {
+            self.names[i]: self.ids[i]
+            for i in sorted(range(len(self.ids)), key=self.last_active.__getitem__)
+        }
+        keys = sorted(
+            (key, i) for i, name in enumerate(self.names) for key in name_keys(name)
+        )
+        self.keys = [key for key, _ in keys]
+        self.key_positions = [i for _, i in keys]
+        # Fuzzy search compares the query with the whole name, with the part
+        # from each later word on and with each word, so a misspelt surname
+        # still matches
+        self.fuzzy_keys = [
+            sorted(set(name_keys(name) + name.lower().split())) for name in self.names
+        ]
+        self.cached_search = functools.lru_cache(SEARCH_CACHE_SIZE)(self.find)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, player) -> bool:
+        return self.resolve(player) is not None
+
+    def resolve(self, player: Union[int, str]) -> Optional[int]:
+        """The id of a player given by id, by id as a string, or by name"""
+        if isinstance(player, str):
+            if not player.isdigit():
+                return self.name_ids.get(player)
+            player = int(player)
+        return player if player in self.positions else None
+
+    def entry(self, position: int) -> dict:
+        return {
+            "id": self.ids[position],
+            "name": self.names[position],
+            "matches": self.matches[position],
+            "last_active": self.last_active[position],
+        }
+
+    def get(self, player: Union[int, str]) -> Optional[dict]:
+        player_id = self.resolve(player)
+        return None if player_id is None else self.entry(self.positions[player_id])
+
+    def prefix_matches(self, query: str) -> List[int]:
+        """Positions of the names with a word starting with query, in name order"""
+        start = bisect.bisect_left(self.keys, query)
+        end = bisect.bisect_left(self.keys, query + "\uffff", lo=start)
+        return sorted(set(self.key_positions[start:end]))
+
+    def search(self, query: str = "", fuzzy: bool = True) -> Tuple[int, ...]:
+        """
+        Positions of the players matching query: all of them for an empty
+        query, else prefix matches in name order, then, with fuzzy, other
+        names close to the query, most similar first
+        """
+        return self.cached_search(" ".join(query.lower().split()), fuzzy)
+
+    def find(self, query: str, fuzzy: bool) -> Tuple[int, ...]:
+        if not query:
+            return tuple(range(len(self.names)))
+        positions = self.prefix_matches(query)
+        if fuzzy:
+            found = set(positions)
+            scored = []
+            matcher = difflib.SequenceMatcher()
+            matcher.set_seq2(query)
+            for i, keys in enumerate(self.fuzzy_keys):
+                if i in found:
+                    continue
+                best = 0.0
+                for key in keys:
+                    matcher.set_seq1(key)
+                    if (
+                        matcher.real_quick_ratio() >= FUZZY_CUTOFF
+                        and matcher.quick_ratio() >= FUZZY_CUTOFF
+                    ):
+                        best = max(best, matcher.ratio())
+                if best >= FUZZY_CUTOFF:
+                    scored.append((-best, i))
+            positions += [i for _, i in sorted(scored)]
+        return tuple(positions)
+
+    def page(self, positions: Sequence[int], offset: int, limit: int) -> List[dict]:
+        end = offset + limit
+        return [self.entry(i) for i in positions[offset:end]]
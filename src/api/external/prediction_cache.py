@@ -0,0 +1,95 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+from typing import Any, Hashable, Optional
+
+# Most recent predictions kept (0 disables the cache), and how long each is
+# served for (0 for as long as the data and model versions are unchanged)
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_SECONDS = float(
+    os.environ.get("PREDICTION_CACHE_TTL_SECONDS", "0")
+)
+
+
+class PredictionCache:
+    """
+    LRU cache of predictions, bounded to max_entries, with an optional TTL.
+
+    Every lookup and insert passes the version of what produced the value
+    (the player data and model versions). A new version clears the cache,
+    so nothing computed from older data or an older model is served.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        clock=time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def check_version(self, version: Hashable):
+        """Clear the cache if version differs from its entries'; call locked"""
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """The cached value, or None on a miss"""
+        if self.max_entries <= 0:
+            return None
+        with self.lock:
+            self.check_version(version)
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl_seconds:
+                if self.clock() - entry[0] > self.ttl_seconds:
+                    del self.entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.check_version(version)
+            self.entries[key] = (self.clock(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+prediction_cache = PredictionCache(
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS or None
+)
@@ -1,9 +1,13 @@
 # model routes
 import logging
-from fastapi import APIRouter, HTTPException
+from typing import Union
+
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 
-from external.model_service import get_victory_prediction
+from external.db_service import get_player_store
+from external.model_service import get_model_versions, get_victory_prediction
+from external.prediction_cache import prediction_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -12,8 +16,9 @@ router = APIRouter()
 
 
 class PredictionRequest(BaseModel):
-    player_a_id: str
-    player_b_id: str
+    # Player ids, or names, which are resolved to ids
+    player_a_id: Union[int, str]
+    player_b_id: Union[int, str]
     lookback: int = 10  # Default value if not provided
 
 
@@ -21,25 +26,95 @@ class PredictionResponse(BaseModel):
     player_a_win_probability: float
 
 
+def cache_version(data_version, model_versions):
+    return data_version, tuple(sorted(model_versions.items()))
+
+
+def resolve_player(store, player) -> int:
+    player_id = store.player_index.resolve(player)
+    if player_id is None:
+        raise HTTPException(status_code=404, detail=f"Unknown player: {player}")
+    return player_id
+
+
+def precomputed_probability(store, key, model_versions):
+    """
+    The top players' pairs come from the store's precomputed matrix, while
+    it was computed from the store's data by the model the model service
+    serves. None for other pairs.
+    """
+    if store.pair_matrix is None:
+        return None
+    first_id, second_id, lookback = key
+    return store.pair_matrix.get(
+        first_id,
+        second_id,
+        lookback,
+        store.version,
+        model_versions.get("X-Model-Version"),
+    )
+
+
 @router.post("/predict", response_model=PredictionResponse)
-def predict(request: PredictionRequest):
+def predict(request: PredictionRequest, response: Response):
     try:
+        # Use one version of the player data for the whole request
+        store = get_player_store()
+        player_a_id = resolve_player(store, request.player_a_id)
+        player_b_id = resolve_player(store, request.player_b_id)
         # we want our requests to be symmetric, so we swap the ids if player_a_id > player_b_id
         # this guarantees that the probability we return is consistent regardless of the order
         # of the ids
-        should_swap = request.player_a_id > request.player_b_id
-        first_id = request.player_a_id if not should_swap else request.player_b_id
-        second_id = request.player_b_id if not should_swap else request.player_a_id
-        probability = get_victory_prediction(first_id, second_id, request.lookback)
-        logger.info(f"Received probability from model: {probability}")
+        should_swap = player_a_id > player_b_id
+        first_id = player_a_id if not should_swap else player_b_id
+        second_id = player_b_id if not should_swap else player_a_id
+        # Predictions are deterministic for the ordered pair, the lookback and
+        # the data and model versions that produce them
+        key = (first_id, second_id, request.lookback)
+        current_model_versions = get_model_versions()
+        probability = precomputed_probability(store, key, current_model_versions)
+        cached = None
+        if probability is None:
+            cached = prediction_cache.get(
+                key, cache_version(store.version, current_model_versions)
+            )
+        if probability is not None:
+            model_versions = current_model_versions
+            response.headers["X-Cache"] = "PRECOMPUTED"
+        elif cached is not None:
+            probability, model_versions = cached
+            response.headers["X-Cache"] = "HIT"
+        else:
+            probability, model_versions = get_victory_prediction(
+                first_id, second_id, request.lookback, store
+            )
+            logger.info(f"Received probability from model: {probability}")
+            response.headers["X-Cache"] = "MISS"
+            # Stored under the versions that served it, which win if the model
+            # changed since the last check
+            prediction_cache.put(
+                key,
+                cache_version(store.version, model_versions or current_model_versions),
+                (probability, model_versions),
+            )
+        response.headers["X-Data-Version"] = store.version
+        response.headers.update(model_versions)
 
-        response = PredictionResponse(
+        prediction = PredictionResponse(
             player_a_win_probability=probability if not should_swap else 1 - probability
         )
-        logger.info(f"Returning prediction response: {response}")
-        return response
+        logger.info(f"Returning prediction response: {prediction}")
+        return prediction
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during prediction: {str(e)}")
         logger.exception("Full traceback:")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+
+@router.get("/metrics/prediction-cache")
+def prediction_cache_metrics():
+    """Hit rate and size of this worker's prediction cache"""
+    return prediction_cache.stats()
@@ -0,0 +1,106 @@
+# player directory routes
+import hashlib
+import logging
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+
+from external.db_service import PlayerStore, get_player_store
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 500
+
+router = APIRouter(prefix="/players")
+
+
+class Player(BaseModel):
+    # The id /predict takes as player_a_id and player_b_id
+    id: int
+    name: str
+    matches: int
+    last_active: str
+
+
+class PlayersResponse(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    players: List[Player]
+
+
+def etag(store: PlayerStore, request: Request) -> str:
+    """
+    Responses only change with the player data, so the data version and the
+    request URL identify them
+    """
+    digest = hashlib.md5(f"{store.version}|{request.url}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(request: Request, tag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return "*" in tags or tag in tags
+
+
+def cached_response(store: PlayerStore, request: Request, response: Response):
+    """
+    Set the validators on response, and return a 304 response instead if the
+    client's copy is current. Clients revalidate on every use (no-cache), so
+    they see new player data as soon as it is served.
+    """
+    tag = etag(store, request)
+    headers = {
+        "ETag": tag,
+        "Cache-Control": "no-cache",
+        "X-Data-Version": store.version,
+    }
+    if is_not_modified(request, tag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+@router.get("", response_model=PlayersResponse)
+def list_players(
+    request: Request,
+    response: Response,
+    q: str = "",
+    fuzzy: bool = True,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Players sorted by name, or those matching q: names with a word starting
+    with q, then, with fuzzy, names close to it
+    """
+    store = get_player_store()
+    not_modified = cached_response(store, request, response)
+    if not_modified is not None:
+        return not_modified
+    index = store.player_index
+    positions = index.search(q, fuzzy)
+    return {
+        "total": len(positions),
+        "offset": offset,
+        "limit": limit,
+        "players": index.page(positions, offset, limit),
+    }
+
+
+@router.get("/{player_id}", response_model=Player)
+def get_player(player_id: str, request: Request, response: Response):
+    """A player by id, or by name"""
+    store = get_player_store()
+    player = store.player_index.get(player_id)
+    if player is None:
+        raise HTTPException(status_code=404, detail=f"Unknown player: {player_id}")
+    not_modified = cached_response(store, request, response)
+    if not_modified is not None:
+        return not_modified
+    return player
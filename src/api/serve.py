@@ -0,0 +1,154 @@
+"""
+Pre-fork server for the API: python serve.py
+
+The parent process imports the app, which loads the player store, then
+forks WEB_CONCURRENCY uvicorn workers that accept on one shared socket. The
+workers start with the loaded store in copy-on-write pages instead of each
+loading its own copy. The garbage collector is disabled while loading and
+everything loaded is moved to the permanent generation (gc.freeze) before
+forking, so collections in the workers never write to those objects and
+unshare their pages. The memory-mapped player snapshot is shared through
+the page cache either way.
+
+A reload (/admin/reload or the manifest poll) happens in each worker on its
+own, and its data is no longer shared. /admin/reload only reaches the worker
+that handles the request, so use MANIFEST_POLL_SECONDS to reload every
+worker.
+
+Every MEMORY_REPORT_SECONDS (0 disables) the parent logs each worker's RSS
+and its shared and private parts, from /proc/<pid>/smaps_rollup.
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8000"))
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+MEMORY_REPORT_SECONDS = float(os.environ.get("MEMORY_REPORT_SECONDS", "300"))
+# Seconds a worker has to finish in-flight requests on shutdown
+GRACEFUL_TIMEOUT = float(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+
+
+def memory_usage(pid) -> dict:
+    """
+    RSS of a process, split into pages shared with other processes and
+    private ones, and its proportional share (PSS), in MB
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0)
+        + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def log_memory_usage(workers):
+    for pid in sorted(workers):
+        try:
+            usage = memory_usage(pid)
+        except OSError:
+            continue
+        logging.info(
+            f"Worker {pid}: RSS {usage['rss_mb']:.1f} MB, shared "
+            f"{usage['shared_mb']:.1f} MB, private {usage['private_mb']:.1f} MB, "
+            f"PSS {usage['pss_mb']:.1f} MB"
+        )
+
+
+def bind_socket(host, port) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock):
+    """Serve app on sock in a forked child, until uvicorn exits"""
+    gc.enable()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(
+        app, timeout_graceful_shutdown=GRACEFUL_TIMEOUT, log_level="info"
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def fork_worker(app, sock) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock)
+        except BaseException:
+            logging.exception("Worker failed")
+            code = 1
+        finally:
+            os._exit(code)
+    logging.info(f"Started worker {pid}")
+    return pid
+
+
+def main():
+    sock = bind_socket(HOST, PORT)
+    logging.info(f"Listening on {HOST}:{PORT} with {WEB_CONCURRENCY} worker(s)")
+
+    # Loading with the collector off leaves no freed holes between the
+    # objects the workers will share
+    gc.disable()
+    start_time = time.perf_counter()
+    from app import app
+
+    logging.info(f"Loaded the app in {time.perf_counter() - start_time:.1f}s")
+    gc.freeze()
+
+    workers = {fork_worker(app, sock) for _ in range(WEB_CONCURRENCY)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    next_report = time.monotonic() + min(MEMORY_REPORT_SECONDS, 10)
+    while workers:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            workers.discard(pid)
+            if not stopping:
+                logging.warning(f"Worker {pid} exited ({status}), starting another")
+                workers.add(fork_worker(app, sock))
+            continue
+        if MEMORY_REPORT_SECONDS > 0 and time.monotonic() >= next_report:
+            log_memory_usage(workers)
+            next_report = time.monotonic() + MEMORY_REPORT_SECONDS
+        time.sleep(0.5)
+    logging.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
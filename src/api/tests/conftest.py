@@ -1,5 +1,39 @@
 import sys
 import os
 
+import pandas as pd
+import pytest
+
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def make_player_store():
+    """
+    Build a PlayerStore of the given {id: name} players from one match
+    between each pair of consecutive ids
+    """
+    from external import db_service
+    from external.helper import preprocess_data
+
+    def build(players, pair_matrix=None):
+        ids = sorted(players)
+        pairs = list(zip(ids, ids[1:]))
+        df = pd.DataFrame(
+            {
+                "tourney_date": pd.date_range("2023-01-02", periods=len(pairs)),
+                "winner_id": [winner for winner, _ in pairs],
+                "winner_name": [players[winner] for winner, _ in pairs],
+                "loser_id": [loser for _, loser in pairs],
+                "loser_name": [players[loser] for _, loser in pairs],
+                "w_ace": [10] * len(pairs),
+                "l_ace": [5] * len(pairs),
+            }
+        )
+        player_dfs, feature_cols = preprocess_data(df)
+        return db_service.PlayerStore(
+            player_dfs, feature_cols, db_service.default_source(), pair_matrix
+        )
+
+    return build
@@ -0,0 +1,145 @@
+import sys
+import os
+import time
+from fastapi.testclient import TestClient
+from fastapi import FastAPI
+from unittest.mock import MagicMock, patch
+
+# Adjust the path to properly import the router module
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from admin import router as admin_module  # noqa: E402
+from external import db_service, model_service  # noqa: E402
+from external.prediction_cache import PredictionCache  # noqa: E402
+from model.router import router as model_router  # noqa: E402
+
+app = FastAPI()
+app.include_router(admin_module.router)
+app.include_router(model_router)
+client = TestClient(app)
+
+HEADERS = {"X-Admin-Token": "secret"}
+
+
+def fake_load_data(data_folder, data_file):
+    return {"folder": data_folder}, ["w_ace", "l_ace"]
+
+
+def test_admin_disabled_without_token():
+    with patch.object(admin_module, "ADMIN_TOKEN", None):
+        assert client.post("/admin/reload").status_code == 403
+    with patch.object(admin_module, "ADMIN_TOKEN", "secret"):
+        assert client.get("/admin/version").status_code == 401
+        response = client.get("/admin/version", headers={"X-Admin-Token": "x"})
+        assert response.status_code == 401
+
+
+def test_reload_swaps_player_store():
+    with patch.object(admin_module, "ADMIN_TOKEN", "secret"), patch.object(
+        db_service, "load_data", fake_load_data
+    ), patch.object(db_service, "player_store", None):
+        old_store = db_service.get_player_store()
+        assert old_store.version == "version1/combined_atp_matches.csv"
+
+        response = client.post(
+            "/admin/reload", json={"data_folder": "version2"}, headers=HEADERS
+        )
+        assert response.status_code == 202
+        for _ in range(100):
+            if db_service.player_store is not old_store:
+                break
+            time.sleep(0.05)
+
+        store = db_service.get_player_store()
+        assert store.player_dfs == {"folder": "version2"}
+        # The old store is untouched for requests still using it
+        assert old_store.player_dfs == {"folder": "version1"}
+        version = client.get("/admin/version", headers=HEADERS).json()
+        assert version["data_version"] == "version2/combined_atp_matches.csv"
+        assert version["reload"]["state"] == "idle"
+
+        with db_service.reload_lock:
+            response = client.post("/admin/reload", headers=HEADERS)
+            assert response.status_code == 409
+
+
+def test_reload_if_manifest_changed():
+    store = db_service.PlayerStore({}, [], db_service.default_source())
+    with patch.object(db_service, "player_store", store), patch.object(
+        db_service, "start_reload", return_value=True
+    ) as start_reload:
+        with patch.object(db_service, "read_manifest", return_value=None):
+            assert not db_service.reload_if_manifest_changed()
+        with patch.object(
+            db_service, "read_manifest", return_value={"data_folder": "version1"}
+        ):
+            assert not db_service.reload_if_manifest_changed()
+        with patch.object(
+            db_service, "read_manifest", return_value={"data_folder": "version3"}
+        ):
+            assert db_service.reload_if_manifest_changed()
+        start_reload.assert_called_once_with(
+            {"data_folder": "version3", "data_file": "combined_atp_matches.csv"}
+        )
+
+
+def test_predict_reports_versions(make_player_store):
+    store = make_player_store({1: "A", 2: "B"})
+    model_response = MagicMock(status_code=200)
+    model_response.json.return_value = {"player_a_win_probability": 0.25}
+    model_response.headers = {
+        "X-Model-Version": "version1/prob_model.pt#abcd1234",
+        "X-Data-Version": "version1",
+    }
+    with patch.object(db_service, "player_store", store), patch(
+        "external.model_service.get_match_data", return_value=(None, None, None, [])
+    ), patch(
+        "external.model_service.create_matchup_data",
+        return_value=([], [], [], []),
+    ), patch(
+        "external.model_service.requests.post", return_value=model_response
+    ), patch(
+        "model.router.get_model_versions", return_value={}
+    ), patch(
+        "model.router.prediction_cache", PredictionCache(10)
+    ):
+        response = client.post(
+            "/predict", json={"player_a_id": "B", "player_b_id": "A"}
+        )
+
+    assert response.status_code == 200
+    assert response.json()["player_a_win_probability"] == 0.75
+    assert response.headers["X-Data-Version"] == "version1/combined_atp_matches.csv"
+    assert response.headers["X-Model-Version"] == "version1/prob_model.pt#abcd1234"
+    assert response.headers["X-Model-Data-Version"] == "version1"
+
+
+def test_predict_passes_on_model_service_unavailable(make_player_store):
+    store = make_player_store({1: "A", 2: "B"})
+    model_response = MagicMock(status_code=503)
+    model_response.json.return_value = {"detail": "Model is loading"}
+    model_response.headers = {"Retry-After": "7"}
+    with patch.object(db_service, "player_store", store), patch(
+        "external.model_service.get_match_data", return_value=(None, None, None, [])
+    ), patch(
+        "external.model_service.create_matchup_data",
+        return_value=([], [], [], []),
+    ), patch(
+        "external.model_service.requests.post", return_value=model_response
+    ), patch(
+        "model.router.get_model_versions", return_value={}
+    ), patch(
+        "model.router.prediction_cache", PredictionCache(10)
+    ), patch.object(
+        model_service, "model_versions", {"X-Model-Version": "model#1"}
+    ):
+        response = client.post(
+            "/predict", json={"player_a_id": "A", "player_b_id": "B"}
+        )
+        # The error response says nothing about what the model service serves
+        assert model_service.model_versions == {"X-Model-Version": "model#1"}
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
@@ -9,7 +9,8 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-from chat.router import router  # noqa: E402
+from chat.router import END_MARKER, router  # noqa: E402
+from external import db_service  # noqa: E402
 
 app = FastAPI()
 app.include_router(router)
@@ -70,3 +71,23 @@ def test_chat_post_endpoint_with_history(mock_stream):
 
     assert response.status_code == 200
     assert response.json()["message"] == "test response with history"
+
+
+def test_chat_unknown_player(make_player_store):
+    store = make_player_store({1: "A", 2: "B"})
+    body = {
+        "player_a_id": "A",
+        "player_b_id": 99,
+        "query": "test",
+        "history": [],
+    }
+    with patch.object(db_service, "player_store", store):
+        response = client.post("/chat", json=body)
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Unknown player: 99"
+
+        # The websocket answers with an error and stays open
+        with client.websocket_connect("/chat") as websocket:
+            websocket.send_json(body)
+            assert websocket.receive_text() == "Error: Unknown player: 99"
+            assert websocket.receive_text() == END_MARKER
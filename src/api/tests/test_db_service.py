@@ -0,0 +1,44 @@
+import sys
+import os
+from unittest.mock import patch
+
+# Adjust the path to properly import the service module
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from external import db_service  # noqa: E402
+from external.gcs_cache import GcsCache, LocalBlob, LocalBucket  # noqa: E402
+
+
+def test_read_csv_from_gcs_through_cache(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    bucket.blob("version1/matches.csv").upload_from_string("a,b\n1,2\n")
+    cache_dir = str(tmp_path / "cache")
+
+    with patch.object(db_service, "GCS_CACHE", cache_dir), patch.object(
+        db_service, "gcs_cache", GcsCache(cache_dir)
+    ):
+        df = db_service.read_csv_from_gcs(bucket, "version1/matches.csv")
+        cached_path = os.path.join(cache_dir, bucket.name, "version1/matches.csv")
+        assert os.path.exists(cached_path)
+
+        # Served from the cache while the object is unchanged
+        with patch.object(
+            LocalBlob, "download_to_filename", side_effect=AssertionError
+        ):
+            cached = db_service.read_csv_from_gcs(bucket, "version1/matches.csv")
+    assert cached.equals(df)
+    assert df.to_dict("list") == {"a": [1], "b": [2]}
+
+
+def test_read_csv_from_gcs_without_cache(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    bucket.blob("version1/matches.csv").upload_from_string("a,b\n1,2\n")
+
+    with patch.object(db_service, "GCS_CACHE", None), patch.object(
+        db_service, "gcs_cache", GcsCache()
+    ):
+        df = db_service.read_csv_from_gcs(bucket, "version1/matches.csv")
+    assert df.to_dict("list") == {"a": [1], "b": [2]}
+    assert not os.path.exists(tmp_path / "cache")
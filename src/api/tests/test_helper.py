@@ -22,7 +22,9 @@ def test_preprocess_data():
     df = pd.DataFrame(
         {
             "tourney_date": pd.to_datetime(["2023-01-01", "2023-01-02", "2023-01-03"]),
+            "winner_id": [1, 2, 1],
             "winner_name": ["Player1", "Player2", "Player1"],
+            "loser_id": [2, 3, 3],
             "loser_name": ["Player2", "Player3", "Player3"],
             "w_ace": [10, 8, 12],
             "l_ace": [5, 6, 7],
@@ -34,7 +36,9 @@ def test_preprocess_data():
 
     assert len(player_dfs) == 3  # Player1, Player2, Player3
     assert len(feature_cols) == 2  # w_ace, l_ace
-    assert "is_winner" in player_dfs["Player1"].columns
+    assert "is_winner" in player_dfs[1].columns
+    assert player_dfs[3]["opponent"].tolist() == ["Player2", "Player1"]
+    assert player_dfs[3]["opponent_id"].tolist() == [2, 1]
 
 
 def test_calculate_percentage_difference():
@@ -47,7 +51,9 @@ def test_get_player_matches():
     df = pd.DataFrame(
         {
             "tourney_date": pd.to_datetime(["2023-01-01", "2023-01-02"]),
+            "winner_id": [1, 2],
             "winner_name": ["Player1", "Player2"],
+            "loser_id": [2, 1],
             "loser_name": ["Player2", "Player1"],
             "w_ace": [10, 8],
             "l_ace": [5, 6],
@@ -58,12 +64,12 @@ def test_get_player_matches():
     player_dfs, _ = preprocess_data(df)
 
     # Test get_player_last_nplus1_matches
-    matches = get_player_last_nplus1_matches(player_dfs, "Player1", 1)
+    matches = get_player_last_nplus1_matches(player_dfs, 1, 1)
     assert len(matches) > 0
 
     # Test get_player_last_nplus1_matches_since_date
     matches_since = get_player_last_nplus1_matches_since_date(
-        player_dfs, "Player1", 1, "2023-01-02"
+        player_dfs, 1, 1, "2023-01-02"
     )
     assert isinstance(matches_since, pd.DataFrame)
 
@@ -72,7 +78,9 @@ def test_h2h_functions():
     df = pd.DataFrame(
         {
             "tourney_date": pd.to_datetime(["2023-01-01", "2023-01-02"]),
+            "winner_id": [1, 2],
             "winner_name": ["Player1", "Player2"],
+            "loser_id": [2, 1],
             "loser_name": ["Player2", "Player1"],
             "w_ace": [10, 8],
             "l_ace": [5, 6],
@@ -84,11 +92,11 @@ def test_h2h_functions():
     player_dfs, _ = preprocess_data(df)
 
     # Test h2h match history
-    h2h = get_h2h_match_history(player_dfs, "Player1", "Player2")
+    h2h = get_h2h_match_history(player_dfs, 1, 2)
     assert isinstance(h2h, pd.DataFrame)
+    assert len(h2h) == 2
 
     # Test h2h match history since date
-    h2h_since = get_h2h_match_history_since_date(
-        player_dfs, "Player1", "Player2", "2023-01-02"
-    )
+    h2h_since = get_h2h_match_history_since_date(player_dfs, 1, 2, "2023-01-02")
     assert isinstance(h2h_since, pd.DataFrame)
+    assert len(h2h_since) == 1
@@ -48,7 +48,7 @@ def test_make_rag_system_message():
 
         # Call the function
         result = make_rag_system_message_from_match_data(
-            "Player A", "Player B", lookback=10
+            {"id": 1, "name": "Player A"}, {"id": 2, "name": "Player B"}, lookback=10
         )
 
         # Basic assertions
@@ -57,6 +57,7 @@ def test_make_rag_system_message():
         assert "US Open (Hard) vs Player D: Lost" in result
         assert "Australian Open (Hard): Player A won" in result
         assert "last 10 matches" in result
+        mock_get_data.assert_called_once_with(1, 2, 10, None)
 
 
 def test_make_rag_system_message_no_h2h():
@@ -99,7 +100,7 @@ def test_make_rag_system_message_no_h2h():
 
         # Call the function
         result = make_rag_system_message_from_match_data(
-            "Player A", "Player B", lookback=10
+            {"id": 1, "name": "Player A"}, {"id": 2, "name": "Player B"}, lookback=10
         )
 
         # Basic assertions
@@ -0,0 +1,93 @@
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Adjust the path to properly import the router module
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from external import db_service  # noqa: E402
+from external.gcs_cache import GcsCache, LocalBucket  # noqa: E402
+from external.pair_matrix import PairMatrix, save_pair_matrix  # noqa: E402
+from external.prediction_cache import PredictionCache  # noqa: E402
+from model.router import router as model_router  # noqa: E402
+
+app = FastAPI()
+app.include_router(model_router)
+client = TestClient(app)
+
+DATA_VERSION = "version1/combined_atp_matches.csv"
+METADATA = {"lookback": 10, "data_version": DATA_VERSION, "model_version": "model#1"}
+
+
+def save_sample_matrix(directory):
+    matrix = np.array([[0.5, 0.75, 0.9], [0.25, 0.5, 0.6], [0.1, 0.4, 0.5]])
+    return save_pair_matrix(matrix, [1, 2, 3], directory, METADATA)
+
+
+def test_pair_matrix_only_serves_matching_versions(tmp_path):
+    schema = save_sample_matrix(str(tmp_path))
+    pair_matrix = PairMatrix(str(tmp_path))
+
+    assert np.load(tmp_path / schema["matrix_file"]).dtype == np.float32
+    assert pair_matrix.get(1, 2, 10, DATA_VERSION, "model#1") == 0.75
+    assert pair_matrix.get(3, 2, 10, DATA_VERSION, "model#1") == pytest.approx(0.4)
+    assert pair_matrix.get(1, 4, 10, DATA_VERSION, "model#1") is None
+    assert pair_matrix.get(1, 2, 5, DATA_VERSION, "model#1") is None
+    assert pair_matrix.get(1, 2, 10, "version2/x.csv", "model#1") is None
+    assert pair_matrix.get(1, 2, 10, DATA_VERSION, "model#2") is None
+    assert pair_matrix.get(1, 2, 10, DATA_VERSION, None) is None
+
+
+def test_load_pair_matrix_from_bucket(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    save_sample_matrix(str(tmp_path / "bucket" / "version1" / "pair_matrix"))
+
+    with patch.object(db_service, "gcs_cache", GcsCache(str(tmp_path / "cache"))):
+        pair_matrix = db_service.load_pair_matrix(bucket, "version1")
+        missing = db_service.load_pair_matrix(bucket, "version2")
+
+    assert missing is None
+    assert len(pair_matrix) == 3
+    assert pair_matrix.get(2, 3, 10, DATA_VERSION, "model#1") == pytest.approx(0.6)
+
+
+def test_predict_serves_top_pairs_from_pair_matrix(tmp_path, make_player_store):
+    save_sample_matrix(str(tmp_path))
+    store = make_player_store({1: "A", 2: "B", 4: "D"}, PairMatrix(str(tmp_path)))
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"player_a_win_probability": 0.3}
+    response.headers = {"X-Model-Version": "model#1"}
+    post = MagicMock(return_value=response)
+    with patch.object(db_service, "player_store", store), patch(
+        "external.model_service.get_match_data", return_value=(None, None, None, [])
+    ), patch(
+        "external.model_service.create_matchup_data", return_value=([], [], [], [])
+    ), patch(
+        "external.model_service.requests.post", post
+    ), patch(
+        "model.router.prediction_cache", PredictionCache(10)
+    ), patch(
+        "model.router.get_model_versions", return_value={"X-Model-Version": "model#1"}
+    ) as get_model_versions:
+        swapped = client.post("/predict", json={"player_a_id": "B", "player_b_id": "A"})
+        assert swapped.headers["X-Cache"] == "PRECOMPUTED"
+        assert swapped.headers["X-Model-Version"] == "model#1"
+        assert swapped.json()["player_a_win_probability"] == 0.25
+
+        # Players outside the matrix fall back to the model service
+        other = client.post("/predict", json={"player_a_id": "A", "player_b_id": "D"})
+        assert other.headers["X-Cache"] == "MISS"
+        assert other.json()["player_a_win_probability"] == 0.3
+
+        # So does every pair once the model service serves another model
+        get_model_versions.return_value = {"X-Model-Version": "model#2"}
+        stale = client.post("/predict", json={"player_a_id": "A", "player_b_id": "B"})
+        assert stale.headers["X-Cache"] == "MISS"
+    assert post.call_count == 2
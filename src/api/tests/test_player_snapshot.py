@@ -0,0 +1,87 @@
+import json
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+# Adjust the path to properly import the service modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from external import db_service  # noqa: E402
+from external.gcs_cache import GcsCache, LocalBucket  # noqa: E402
+from external.helper import preprocess_data  # noqa: E402
+from external.player_snapshot import (  # noqa: E402
+    SCHEMA_FILE,
+    PlayerSnapshot,
+    save_player_snapshot,
+)
+
+
+def sample_matches():
+    return pd.DataFrame(
+        {
+            "tourney_date": pd.to_datetime(
+                ["2023-01-03", "2023-01-01", "2023-01-02", "2023-01-04"]
+            ),
+            "surface": ["Hard", None, "Clay", "Hard"],
+            "winner_id": [1, 2, 1, 3],
+            "winner_name": ["Player1", "Player2", "Player1", "Player3"],
+            "loser_id": [2, 3, 3, 1],
+            "loser_name": ["Player2", "Player3", "Player3", "Player1"],
+            "w_ace": [10.0, np.nan, 12.0, 3.0],
+            "l_ace": [5, 6, 7, 8],
+            "draw_size": [32, 32, 64, 128],
+        }
+    )
+
+
+def test_snapshot_frames_match_preprocess_data(tmp_path):
+    df = sample_matches()
+    player_dfs, feature_cols = preprocess_data(df)
+
+    save_player_snapshot(df, str(tmp_path))
+    snapshot = PlayerSnapshot(str(tmp_path))
+
+    assert snapshot.feature_cols == feature_cols
+    assert set(snapshot) == set(player_dfs) and len(snapshot) == 3
+    for player in player_dfs:
+        pd.testing.assert_frame_equal(snapshot[player], player_dfs[player])
+    assert 4 not in snapshot
+    assert snapshot.summaries()[3][:2] == ("Player3", 3)
+
+
+def test_load_player_snapshot_from_bucket(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    prefix = "version1/combined_atp_matches.snapshot"
+    save_player_snapshot(sample_matches(), str(tmp_path / "bucket" / prefix))
+
+    with patch.object(db_service, "gcs_cache", GcsCache(str(tmp_path / "cache"))):
+        snapshot = db_service.load_player_snapshot(
+            bucket, "version1", "combined_atp_matches.csv"
+        )
+        missing = db_service.load_player_snapshot(
+            bucket, "version2", "combined_atp_matches.csv"
+        )
+
+    assert missing is None
+    assert snapshot[1]["opponent"].tolist() == ["Player3", "Player2", "Player3"]
+    assert snapshot[1]["opponent_id"].tolist() == [3, 2, 3]
+
+
+def test_older_snapshot_formats_are_not_loaded(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    directory = tmp_path / "bucket" / "version1" / "combined_atp_matches.snapshot"
+    schema = save_player_snapshot(sample_matches(), str(directory))
+    schema["format_version"] = 1
+    (directory / SCHEMA_FILE).write_text(json.dumps(schema))
+
+    with patch.object(db_service, "gcs_cache", GcsCache(str(tmp_path / "cache"))):
+        snapshot = db_service.load_player_snapshot(
+            bucket, "version1", "combined_atp_matches.csv"
+        )
+
+    assert snapshot is None
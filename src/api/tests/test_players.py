@@ -0,0 +1,142 @@
+import sys
+import os
+from unittest.mock import patch
+
+import pandas as pd
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Adjust the path to properly import the router module
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from external import db_service  # noqa: E402
+from external.helper import preprocess_data  # noqa: E402
+from external.player_index import PlayerIndex  # noqa: E402
+from external.player_snapshot import PlayerSnapshot, save_player_snapshot  # noqa: E402
+from model.router import router as model_router  # noqa: E402
+from players.router import router as players_router  # noqa: E402
+
+app = FastAPI()
+app.include_router(players_router)
+app.include_router(model_router)
+client = TestClient(app)
+
+
+def sample_matches():
+    return pd.DataFrame(
+        {
+            "tourney_date": pd.to_datetime(
+                ["2023-01-02", "2023-01-09", "2023-01-16", "2023-01-23"]
+            ),
+            "winner_id": [1, 2, 1, 3],
+            "winner_name": [
+                "Roger Federer",
+                "Rafael Nadal",
+                "Roger Federer",
+                "Novak Djokovic",
+            ],
+            "loser_id": [2, 4, 3, 4],
+            "loser_name": ["Rafael Nadal", "Rafa Mir", "Novak Djokovic", "Rafa Mir"],
+            "w_ace": [10, 3, 7, 5],
+            "l_ace": [5, 6, 7, 8],
+        }
+    )
+
+
+def sample_store():
+    player_dfs, feature_cols = preprocess_data(sample_matches())
+    return db_service.PlayerStore(player_dfs, feature_cols, db_service.default_source())
+
+
+def test_search_by_prefix_of_any_word_then_fuzzy():
+    index = sample_store().player_index
+
+    assert index.names == [
+        "Novak Djokovic",
+        "Rafa Mir",
+        "Rafael Nadal",
+        "Roger Federer",
+    ]
+    assert index.ids == [3, 4, 2, 1]
+    assert index.get("Roger Federer") == {
+        "id": 1,
+        "name": "Roger Federer",
+        "matches": 2,
+        "last_active": "2023-01-16",
+    }
+    assert index.get("Roger") is None
+    assert index.get(1) == index.get("1") == index.get("Roger Federer")
+    assert index.resolve("Rafa Mir") == 4
+    assert index.resolve(5) is None and index.resolve("5") is None
+    names = [index.names[i] for i in index.search("RAF", fuzzy=False)]
+    assert names == ["Rafa Mir", "Rafael Nadal"]
+    assert [index.names[i] for i in index.search("fed")] == ["Roger Federer"]
+    # A misspelt surname
+    assert [index.names[i] for i in index.search("djokovich")] == ["Novak Djokovic"]
+    assert index.search("djokovich", fuzzy=False) == ()
+    assert len(index.search("")) == 4
+
+
+def test_snapshot_index_matches_frames(tmp_path):
+    save_player_snapshot(sample_matches(), str(tmp_path))
+    from_snapshot = PlayerIndex(PlayerSnapshot(str(tmp_path)))
+    from_frames = sample_store().player_index
+
+    assert from_snapshot.ids == from_frames.ids
+    assert from_snapshot.names == from_frames.names
+    assert from_snapshot.matches == from_frames.matches
+    assert from_snapshot.last_active == from_frames.last_active
+
+
+def test_players_are_paginated_and_revalidated_with_etags():
+    with patch.object(db_service, "player_store", sample_store()):
+        response = client.get("/players", params={"q": "r", "limit": 2})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["total"] == 3 and body["limit"] == 2
+        assert [p["id"] for p in body["players"]] == [4, 2]
+        assert [p["name"] for p in body["players"]] == ["Rafa Mir", "Rafael Nadal"]
+        following = client.get("/players", params={"q": "r", "offset": 2, "limit": 2})
+        assert [p["id"] for p in following.json()["players"]] == [1]
+
+        etag = response.headers["ETag"]
+        assert etag != following.headers["ETag"]
+        assert response.headers["Cache-Control"] == "no-cache"
+        again = client.get(
+            "/players",
+            params={"q": "r", "limit": 2},
+            headers={"If-None-Match": etag},
+        )
+        assert again.status_code == 304 and again.content == b""
+        assert again.headers["ETag"] == etag
+
+        player = client.get("/players/Rafa Mir")
+        assert player.json()["matches"] == 2
+        assert client.get("/players/4").json() == player.json()
+        assert client.get("/players/Nobody").status_code == 404
+        assert client.get("/players", params={"limit": 0}).status_code == 422
+
+    # New player data gets new tags
+    store = sample_store()
+    store.version = "version2/combined_atp_matches.csv"
+    with patch.object(db_service, "player_store", store):
+        response = client.get(
+            "/players",
+            params={"q": "r", "limit": 2},
+            headers={"If-None-Match": etag},
+        )
+        assert response.status_code == 200
+
+
+def test_predict_rejects_unknown_players():
+    with patch.object(db_service, "player_store", sample_store()):
+        response = client.post(
+            "/predict",
+            json={"player_a_id": "Roger Federer", "player_b_id": "Roger Fed"},
+        )
+        unknown_id = client.post("/predict", json={"player_a_id": 1, "player_b_id": 5})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Unknown player: Roger Fed"
+    assert unknown_id.json()["detail"] == "Unknown player: 5"
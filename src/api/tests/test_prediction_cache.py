@@ -0,0 +1,168 @@
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Adjust the path to properly import the router module
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from external import db_service, model_service  # noqa: E402
+from external.prediction_cache import PredictionCache  # noqa: E402
+from model.router import router as model_router  # noqa: E402
+
+app = FastAPI()
+app.include_router(model_router)
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PredictionCache(2)
+    cache.put("a", "v1", 1)
+    cache.put("b", "v1", 2)
+    assert cache.get("a", "v1") == 1
+    cache.put("c", "v1", 3)
+
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") == 1 and cache.get("c", "v1") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+    assert stats["hit_rate"] == 0.75
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(10, ttl_seconds=60, clock=clock)
+    cache.put("a", "v1", 1)
+    clock.now = 60
+    assert cache.get("a", "v1") == 1
+    clock.now = 61
+    assert cache.get("a", "v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_new_version_invalidates_entries():
+    cache = PredictionCache(10)
+    cache.put("a", "v1", 1)
+    assert cache.get("a", "v2") is None
+    # The old version's entries are gone, not just hidden
+    assert cache.get("a", "v1") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_disabled_cache():
+    cache = PredictionCache(0)
+    cache.put("a", "v1", 1)
+    assert cache.get("a", "v1") is None
+    assert cache.stats()["hit_rate"] is None
+
+
+def model_response(probability, model_version):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"player_a_win_probability": probability}
+    response.headers = {"X-Model-Version": model_version, "X-Data-Version": "v1"}
+    return response
+
+
+def test_predict_serves_swapped_pairs_from_cache(make_player_store):
+    store = make_player_store({1: "A", 2: "B"})
+    post = MagicMock(return_value=model_response(0.25, "model#1"))
+    versions = {"X-Model-Version": "model#1", "X-Model-Data-Version": "v1"}
+    with patch.object(db_service, "player_store", store), patch(
+        "external.model_service.get_match_data", return_value=(None, None, None, [])
+    ), patch(
+        "external.model_service.create_matchup_data", return_value=([], [], [], [])
+    ), patch(
+        "external.model_service.requests.post", post
+    ), patch(
+        "model.router.prediction_cache", PredictionCache(10)
+    ), patch(
+        "model.router.get_model_versions", return_value=versions
+    ) as get_model_versions:
+        first = client.post("/predict", json={"player_a_id": "A", "player_b_id": "B"})
+        # Players may be given by name or by id
+        second = client.post("/predict", json={"player_a_id": 2, "player_b_id": "A"})
+        assert post.call_count == 1
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.headers["X-Model-Version"] == "model#1"
+        assert second.json()["player_a_win_probability"] == 0.75
+
+        # A new model version is a miss
+        post.return_value = model_response(0.4, "model#2")
+        get_model_versions.return_value = {
+            **versions,
+            "X-Model-Version": "model#2",
+        }
+        third = client.post("/predict", json={"player_a_id": "A", "player_b_id": "B"})
+        assert third.headers["X-Cache"] == "MISS"
+        assert third.json()["player_a_win_probability"] == 0.4
+
+        metrics = client.get("/metrics/prediction-cache").json()
+    assert metrics["hits"] == 1 and metrics["misses"] == 2
+    assert metrics["invalidations"] == 1
+
+
+def test_predict_does_not_cache_model_service_errors(make_player_store):
+    store = make_player_store({1: "A", 2: "B"})
+    unavailable = MagicMock(status_code=503)
+    unavailable.headers = {"Retry-After": "1"}
+    post = MagicMock(return_value=unavailable)
+    cache = PredictionCache(10)
+    with patch.object(db_service, "player_store", store), patch(
+        "external.model_service.get_match_data", return_value=(None, None, None, [])
+    ), patch(
+        "external.model_service.create_matchup_data", return_value=([], [], [], [])
+    ), patch(
+        "external.model_service.requests.post", post
+    ), patch(
+        "model.router.prediction_cache", cache
+    ), patch(
+        "model.router.get_model_versions", return_value={}
+    ):
+        failed = client.post("/predict", json={"player_a_id": "A", "player_b_id": "B"})
+        assert failed.status_code == 503
+        assert cache.stats()["entries"] == 0
+
+        # The retry goes to the model service again
+        post.return_value = model_response(0.25, "model#1")
+        retried = client.post("/predict", json={"player_a_id": "A", "player_b_id": "B"})
+        assert retried.headers["X-Cache"] == "MISS"
+        assert retried.json()["player_a_win_probability"] == 0.25
+    assert post.call_count == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_get_model_versions_checks_ready_at_most_every_interval():
+    ready = MagicMock(status_code=200)
+    ready.json.return_value = {
+        "status": "ready",
+        "model_version": "model#1",
+        "data_version": "v1",
+    }
+    with patch.object(model_service, "model_versions", {}), patch.object(
+        model_service, "model_versions_checked", None
+    ), patch("external.model_service.requests.get", return_value=ready) as get:
+        assert model_service.get_model_versions() == {
+            "X-Model-Version": "model#1",
+            "X-Model-Data-Version": "v1",
+        }
+        model_service.get_model_versions()
+        assert get.call_count == 1
+
+        # The last known versions are kept while the model service is down
+        model_service.model_versions_checked = -1e9
+        get.side_effect = model_service.requests.ConnectionError("down")
+        assert model_service.get_model_versions()["X-Model-Version"] == "model#1"
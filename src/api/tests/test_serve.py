@@ -0,0 +1,48 @@
+import sys
+import os
+import signal
+import time
+
+import fastapi
+import requests
+
+# Adjust the path to properly import the server module
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import serve  # noqa: E402
+
+
+def test_memory_usage_of_this_process():
+    usage = serve.memory_usage(os.getpid())
+    assert usage["rss_mb"] > 0
+    assert usage["shared_mb"] + usage["private_mb"] == usage["rss_mb"]
+
+
+def test_forked_worker_serves_on_shared_socket():
+    app = fastapi.FastAPI()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "pid": os.getpid()}
+
+    sock = serve.bind_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    pid = serve.fork_worker(app, sock)
+    try:
+        for _ in range(100):
+            try:
+                response = requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        assert response.json() == {"status": "ok", "pid": pid}
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        _, status = os.waitpid(pid, 0)
+        sock.close()
+    # uvicorn shuts down gracefully, then re-raises the signal it caught
+    assert (os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0) or (
+        os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGTERM
+    )
@@ -0,0 +1,176 @@
+import json
+import os
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 2
+SCHEMA_FILE = "schema.json"
+INDEX_COLUMN = "index"
+OFFSETS_FILE = "player_offsets.npy"
+ROWS_FILE = "player_rows.npy"
+
+
+def column_file(position: int) -> str:
+    # Column names may not be valid file names
+    return f"column_{position}.npy"
+
+
+def save_player_snapshot(df: pd.DataFrame, directory: str) -> dict:
+    """
+    Write the API's player store for matches df as memory-mappable .npy
+    files plus a JSON schema, so the API can map it instead of parsing the
+    CSV and rebuilding per-player frames at every start.
+
+    df must be the matches as the API reads them: parsed from the combined
+    CSV with tourney_date as datetimes. Matches are sorted by date as in
+    the API's preprocess_data. Numeric and date columns are stored as they
+    are; other columns as int32 codes into a list of values in the schema.
+    Players are their integer winner_id/loser_id, with the name of their
+    latest match. Each player's matches are the rows
+    player_rows[offsets[i]:offsets[i + 1]] for the i-th player. The schema
+    is written last and marks the snapshot as complete.
+
+    Returns:
+    the schema
+    """
+    os.makedirs(directory, exist_ok=True)
+    df = df.astype({"winner_id": np.int64, "loser_id": np.int64})
+    df = df.sort_values("tourney_date")
+
+    columns = []
+    data = {INDEX_COLUMN: df.index.to_numpy()}
+    data.update({name: df[name] for name in df.columns})
+    for position, (name, series) in enumerate(data.items()):
+        spec = {"name": name, "file": column_file(position)}
+        series = pd.Series(series)
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_dtype(
+            series
+        ):
+            values = series.to_numpy()
+        else:
+            codes, uniques = pd.factorize(series)
+            values = codes.astype(np.int32)
+            spec["values"] = uniques.tolist()
+        np.save(os.path.join(directory, spec["file"]), values)
+        columns.append(spec)
+
+    # Player ids shared by winners and losers, and a CSR index of the rows
+    # each player appears in, in date order
+    codes, players = pd.factorize(
+        np.concatenate([df["winner_id"].to_numpy(), df["loser_id"].to_numpy()])
+    )
+    names = np.concatenate([df["winner_name"].to_numpy(), df["loser_name"].to_numpy()])
+    n = len(df)
+    rows = np.tile(np.arange(n), 2)
+    # Drop the loser entry of a player who beat themselves
+    keep = np.ones(len(codes), dtype=bool)
+    keep[n:] = codes[n:] != codes[:n]
+    codes, rows, names = codes[keep], rows[keep], names[keep]
+    order = np.lexsort((rows, codes))
+    offsets = np.zeros(len(players) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(players)))
+    np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+    np.save(os.path.join(directory, ROWS_FILE), rows[order].astype(np.int32))
+    # Each player's name in their latest match
+    latest_names = names[order][offsets[1:] - 1]
+
+    schema = {
+        "format_version": FORMAT_VERSION,
+        "rows": len(df),
+        "columns": columns,
+        "players": players.tolist(),
+        "names": latest_names.tolist(),
+        "feature_cols": [
+            col for col in df.columns if col.startswith("w_") or col.startswith("l_")
+        ],
+    }
+    with open(os.path.join(directory, SCHEMA_FILE), "w") as f:
+        json.dump(schema, f)
+    return schema
+
+
+def snapshot_files(schema: dict) -> List[str]:
+    """Every file of a snapshot besides the schema"""
+    return [spec["file"] for spec in schema["columns"]] + [OFFSETS_FILE, ROWS_FILE]
+
+
+class PlayerSnapshot:
+    """
+    Read-only mapping of player id to match history, backed by a
+    memory-mapped snapshot from save_player_snapshot. Frames are built on
+    access and equal those of the API's preprocess_data; the columns stay
+    in the page cache, shared by every process that maps the same files.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, SCHEMA_FILE)) as f:
+            schema = json.load(f)
+        if schema["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot format version: {schema['format_version']}"
+            )
+        self.feature_cols = schema["feature_cols"]
+        self.players = {player: i for i, player in enumerate(schema["players"])}
+        self.names = schema["names"]
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        self.rows = np.load(os.path.join(directory, ROWS_FILE), mmap_mode="r")
+        self.columns = []
+        for spec in schema["columns"]:
+            values = np.load(os.path.join(directory, spec["file"]), mmap_mode="r")
+            if len(values) != schema["rows"]:
+                raise ValueError(f"{spec['file']} has {len(values)} rows")
+            # Code -1 (a missing value) picks the trailing NaN
+            labels = (
+                np.array(spec["values"] + [np.nan], dtype=object)
+                if "values" in spec
+                else None
+            )
+            self.columns.append((spec["name"], values, labels))
+
+    def __getitem__(self, player: int) -> pd.DataFrame:
+        i = self.players[player]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        rows = np.asarray(self.rows[start:end])
+        columns: Dict[str, np.ndarray] = {}
+        for name, values, labels in self.columns:
+            columns[name] = values[rows] if labels is None else labels[values[rows]]
+        frame = pd.DataFrame(columns)
+        is_winner = frame["winner_id"] == player
+        frame["is_winner"] = is_winner.astype(int)
+        frame["opponent"] = np.where(
+            is_winner, frame["loser_name"], frame["winner_name"]
+        )
+        frame["opponent_id"] = np.where(
+            is_winner, frame["loser_id"], frame["winner_id"]
+        )
+        return frame
+
+    def summaries(self) -> Dict[int, Tuple[str, int, np.datetime64]]:
+        """
+        (name, number of matches, date of the latest match) of every player,
+        read from the index without building their frames
+        """
+        dates = next(
+            values for name, values, _ in self.columns if name == "tourney_date"
+        )
+        # A player's rows are in date order, so the last one is the latest
+        last_rows = np.asarray(self.rows)[np.asarray(self.offsets[1:]) - 1]
+        counts = np.diff(self.offsets)
+        return {
+            player: (self.names[i], int(counts[i]), dates[last_rows[i]])
+            for player, i in self.players.items()
+        }
+
+    def __contains__(self, player) -> bool:
+        return player in self.players
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.players)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def keys(self):
+        return self.players.keys()
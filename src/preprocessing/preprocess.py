@@ -1,9 +1,12 @@
 import os
 import logging
+import tempfile
 from google.cloud import storage
 import pandas as pd
 from io import StringIO
 
+from player_snapshot import SCHEMA_FILE, save_player_snapshot, snapshot_files
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -13,6 +16,8 @@ logging.basicConfig(
 BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "default-bucket-name")
 GOOGLE_APPLICATION_CREDENTIALS = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
 RAW_DATA_FOLDER = os.environ.get("RAW_DATA_FOLDER", "raw_data")
+# The API maps <data file name>.snapshot/ instead of parsing the CSV
+SNAPSHOT_SUFFIX = ".snapshot"
 
 logging.info(f"Using GCS bucket: {BUCKET_NAME}")
 logging.info(f"Using GCS credentials: {GOOGLE_APPLICATION_CREDENTIALS}")
@@ -53,6 +58,26 @@ def get_next_version(bucket):
     return next_version
 
 
+def upload_player_snapshot(bucket, csv_content, prefix):
+    """
+    Write the API's player store for the combined CSV to prefix in the
+    bucket. The CSV is read back the way the API reads it, so the snapshot
+    holds the same values and dtypes. The schema goes last, so the API only
+    sees complete snapshots.
+    """
+    df = pd.read_csv(StringIO(csv_content))
+    df["tourney_date"] = pd.to_datetime(df["tourney_date"], format="mixed")
+    with tempfile.TemporaryDirectory() as directory:
+        schema = save_player_snapshot(df, directory)
+        for name in snapshot_files(schema) + [SCHEMA_FILE]:
+            bucket.blob(f"{prefix}/{name}").upload_from_filename(
+                os.path.join(directory, name)
+            )
+    logging.info(
+        f"Player snapshot of {len(schema['players'])} players written to {prefix}"
+    )
+
+
 def main():
     logging.info("Starting preprocessing script")
 
@@ -102,9 +127,13 @@ def main():
     # Write the combined data to a new CSV in the next version folder
     output_file = f"{next_version}/combined_atp_matches.csv"
     logging.info(f"Writing combined data to {output_file}")
-    bucket.blob(output_file).upload_from_string(df.to_csv(index=False), "text/csv")
+    csv_content = df.to_csv(index=False)
+    bucket.blob(output_file).upload_from_string(csv_content, "text/csv")
 
     logging.info(f"Combined data successfully written to {output_file}")
+    upload_player_snapshot(
+        bucket, csv_content, f"{os.path.splitext(output_file)[0]}{SNAPSHOT_SUFFIX}"
+    )
     logging.info("Preprocessing completed")
 
 
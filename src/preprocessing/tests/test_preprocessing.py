@@ -1,7 +1,14 @@
+import os
 from unittest.mock import Mock
 
 import pandas as pd
-from preprocess import get_next_version, list_csv_files, read_csv_from_gcs
+from player_snapshot import SCHEMA_FILE, PlayerSnapshot
+from preprocess import (
+    get_next_version,
+    list_csv_files,
+    read_csv_from_gcs,
+    upload_player_snapshot,
+)
 
 
 def safe_date_parse(date_str):
@@ -79,3 +86,36 @@ def test_safe_date_parse():
     invalid_date = "invalid"
     result = safe_date_parse(invalid_date)
     assert pd.isna(result)
+
+
+def test_upload_player_snapshot(tmp_path):
+    uploads = {}
+    mock_bucket = Mock()
+
+    def blob(name):
+        mock_blob = Mock()
+        mock_blob.upload_from_filename.side_effect = lambda path: uploads.update(
+            {name: open(path, "rb").read()}
+        )
+        return mock_blob
+
+    mock_bucket.blob.side_effect = blob
+    csv_content = (
+        "tourney_date,winner_id,winner_name,loser_id,loser_name,w_ace,l_ace\n"
+        "2023-01-02,1,Player1,2,Player2,10,5\n"
+        "2023-01-01,2,Player2,3,Player3,8,6\n"
+    )
+
+    upload_player_snapshot(mock_bucket, csv_content, "version1/matches.snapshot")
+
+    # The schema marks a complete snapshot, so it is uploaded last
+    names = list(uploads)
+    assert names[-1] == f"version1/matches.snapshot/{SCHEMA_FILE}"
+    for name in names:
+        (tmp_path / os.path.basename(name)).write_bytes(uploads[name])
+    snapshot = PlayerSnapshot(str(tmp_path))
+    player = snapshot[2]
+    assert player["opponent"].tolist() == ["Player3", "Player1"]
+    assert player["opponent_id"].tolist() == [3, 1]
+    assert player["is_winner"].tolist() == [1, 0]
+    assert snapshot.summaries()[2][:2] == ("Player2", 2)
@@ -0,0 +1,160 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from helper import (
+    build_player_index,
+    create_training_data,
+    create_training_data_iterrows,
+    create_training_data_multi,
+    create_training_data_sharded,
+    preprocess_data,
+)
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark training data generation against the iterrows reference"
+    )
+    parser.add_argument(
+        "--data-file",
+        type=str,
+        required=True,
+        help="Local copy of combined_atp_matches.csv",
+    )
+    parser.add_argument("--lookback", type=int, default=10, help="Lookback window")
+    parser.add_argument(
+        "--reference-matches",
+        type=int,
+        default=0,
+        help="Only run the iterrows reference on the first N matches (0 = all)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="*",
+        default=[],
+        help="Also time sharded preprocessing and generation for these worker counts",
+    )
+    parser.add_argument(
+        "--lookbacks",
+        type=int,
+        nargs="*",
+        default=[],
+        help="Also time a single multi-lookback pass against one run per lookback",
+    )
+    return parser.parse_args()
+
+
+def assert_same_training_data(expected, actual):
+    for key in ["X1", "X2", "M1", "M2", "y"]:
+        if len(expected[key]) == 0 and len(actual[key]) == 0:
+            continue
+        if not np.array_equal(expected[key], actual[key], equal_nan=True):
+            raise AssertionError(f"Mismatch in {key}")
+
+
+def timed(label, fn, *args):
+    start_time = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start_time
+    logging.info(f"{label}: {elapsed:.2f}s")
+    return result, elapsed
+
+
+def main():
+    args = parse_args()
+
+    df = pd.read_csv(args.data_file, low_memory=False)
+    df["tourney_date"] = pd.to_datetime(df["tourney_date"], format="%Y-%m-%d")
+    logging.info(f"Data shape: {df.shape}")
+
+    (player_dfs, feature_cols), preprocess_time = timed(
+        "preprocess_data", preprocess_data, df
+    )
+    player_index, index_time = timed(
+        "build_player_index", build_player_index, player_dfs, feature_cols
+    )
+    data, fast_time = timed(
+        "create_training_data", create_training_data, df, player_index, args.lookback
+    )
+    logging.info(f"Samples: {len(data['y'])}, X1 shape: {data['X1'].shape}")
+
+    if args.lookbacks:
+        _, multi_time = timed(
+            f"create_training_data_multi ({args.lookbacks})",
+            lambda: [
+                len(data["y"])
+                for _, data in create_training_data_multi(
+                    df, player_index, args.lookbacks
+                )
+            ],
+        )
+        # Without multi-lookback support a sweep repeats preprocessing per lookback
+        single_time = 0.0
+        for lookback in args.lookbacks:
+            _, elapsed = timed(
+                f"create_training_data (lookback={lookback})",
+                create_training_data,
+                df,
+                player_index,
+                lookback,
+            )
+            single_time += elapsed + preprocess_time + index_time
+        logging.info(
+            f"Lookback sweep: {single_time:.1f}s as separate runs vs "
+            f"{preprocess_time + index_time + multi_time:.1f}s in one pass"
+        )
+
+    for workers in args.workers:
+        timed(f"preprocess_data (workers={workers})", preprocess_data, df, workers)
+        sharded, _ = timed(
+            f"create_training_data_sharded (workers={workers})",
+            lambda: dict(
+                create_training_data_sharded(df, player_index, [args.lookback], workers)
+            ),
+        )
+        assert_same_training_data(data, sharded[args.lookback])
+
+    reference_df = df
+    if args.reference_matches:
+        reference_df = df.iloc[: args.reference_matches]
+        data, _ = timed(
+            f"create_training_data ({len(reference_df)} matches)",
+            create_training_data,
+            reference_df,
+            player_index,
+            args.lookback,
+        )
+
+    reference, reference_time = timed(
+        f"create_training_data_iterrows ({len(reference_df)} matches)",
+        create_training_data_iterrows,
+        reference_df,
+        player_dfs,
+        feature_cols,
+        args.lookback,
+    )
+    assert_same_training_data(reference, data)
+    logging.info("Outputs are identical")
+
+    # Extrapolate the reference to the full dataset when only a prefix was run
+    reference_full_time = reference_time * len(df) / len(reference_df)
+    logging.info(
+        f"Speedup over iterrows: {reference_full_time / (index_time + fast_time):.0f}x "
+        f"({reference_full_time:.1f}s vs {index_time + fast_time:.2f}s "
+        f"for {len(df)} matches)"
+    )
+
+
+if __name__ == "__main__":
+    main()
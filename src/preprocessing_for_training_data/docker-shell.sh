@@ -12,6 +12,8 @@ export GCS_BUCKET_NAME=${GCS_BUCKET_NAME:-"msmballstars-data"}
 export DATA_FOLDER=${DATA_FOLDER:-"version3"}
 export DATA_FILE=${DATA_FILE:-"combined_atp_matches.csv"}
 export LOOKBACK=${LOOKBACK:-10}
+export LOOKBACKS=${LOOKBACKS:-$LOOKBACK}
+export WORKERS=${WORKERS:-1}
 export GOOGLE_APPLICATION_CREDENTIALS=${GOOGLE_APPLICATION_CREDENTIALS:-"/secrets/data-service-account.json"}
 
 # Check to see if path to secrets is correct
@@ -36,4 +38,6 @@ docker run --rm -it \
 -e DATA_FOLDER=$DATA_FOLDER \
 -e DATA_FILE=$DATA_FILE \
 -e LOOKBACK=$LOOKBACK \
+-e LOOKBACKS=$LOOKBACKS \
+-e WORKERS=$WORKERS \
 -e DEV=1 $IMAGE_NAME
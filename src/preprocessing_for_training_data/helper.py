@@ -1,37 +1,82 @@
-from typing import Any, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator
 
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
+# Read-only state handed to pool workers once through the initializer. With the
+# default fork start method this is inherited rather than pickled per task.
+_worker_state: Dict[str, Any] = {}
 
-def preprocess_data(df):
-    # Sort by date
-    df = df.sort_values("tourney_date")
 
-    # Select relevant features
-    feature_cols = [
-        col for col in df.columns if col.startswith("w_") or col.startswith("l_")
-    ]
+def _init_worker(state):
+    _worker_state.update(state)
 
-    # Create player-specific dataframes
+
+def _build_player_dfs(df, players):
     player_dfs = {}
-    for player in set(df["winner_name"].unique()) | set(df["loser_name"].unique()):
+    for player in players:
         player_matches = df[
-            (df["winner_name"] == player) | (df["loser_name"] == player)
+            (df["winner_id"] == player) | (df["loser_id"] == player)
         ].copy()
-        player_matches["is_winner"] = (player_matches["winner_name"] == player).astype(
-            int
-        )
+        is_winner = player_matches["winner_id"] == player
+        player_matches["is_winner"] = is_winner.astype(int)
         player_matches["opponent"] = np.where(
-            player_matches["winner_name"] == player,
-            player_matches["loser_name"],
-            player_matches["winner_name"],
+            is_winner, player_matches["loser_name"], player_matches["winner_name"]
+        )
+        player_matches["opponent_id"] = np.where(
+            is_winner, player_matches["loser_id"], player_matches["winner_id"]
         )
         player_matches = player_matches.sort_values("tourney_date").reset_index(
             drop=True
         )
         player_dfs[player] = player_matches
+    return player_dfs
+
+
+def _build_player_dfs_shard(players):
+    return _build_player_dfs(_worker_state["df"], players)
+
+
+def with_player_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """df with its winner_id and loser_id, the ATP player ids, as int64"""
+    return df.astype({"winner_id": np.int64, "loser_id": np.int64})
+
+
+def player_id(history: pd.DataFrame) -> int:
+    """The id of the player whose history this is"""
+    match = history.iloc[0]
+    return match["winner_id"] if match["is_winner"] == 1 else match["loser_id"]
+
+
+def preprocess_data(df, workers=1):
+    """
+    Per-player match histories, keyed by player id. Each match gets is_winner
+    from the player's side, and the opponent's name and id.
+    """
+    # Sort by date
+    df = with_player_ids(df).sort_values("tourney_date")
+
+    # Select relevant features
+    feature_cols = [
+        col for col in df.columns if col.startswith("w_") or col.startswith("l_")
+    ]
+
+    # Create player-specific dataframes
+    players = np.union1d(df["winner_id"].unique(), df["loser_id"].unique())
+    if workers <= 1:
+        return _build_player_dfs(df, players), feature_cols
 
+    # Each player's frame only depends on the sorted df, so players can be
+    # split into independent shards
+    shards = np.array_split(players, workers * 4)
+    player_dfs = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=({"df": df},)
+    ) as executor:
+        for shard_dfs in executor.map(_build_player_dfs_shard, shards):
+            player_dfs.update(shard_dfs)
     return player_dfs, feature_cols
 
 
@@ -42,13 +87,13 @@ def calculate_percentage_difference(val1, val2):
 
 
 def get_player_last_nplus1_matches(
-    player_dfs: Dict[str, Any], player_id: str, n: int
+    player_dfs: Dict[int, Any], player_id: int, n: int
 ) -> pd.DataFrame:
     return player_dfs[player_id].tail(n + 1).reset_index()
 
 
 def get_player_last_nplus1_matches_since_date(
-    player_dfs: Dict[str, Any], player_id: str, n: int, date: str
+    player_dfs: Dict[int, Any], player_id: int, n: int, date: str
 ) -> pd.DataFrame:
     return (
         player_dfs[player_id][player_dfs[player_id]["tourney_date"] < date]
@@ -74,7 +119,7 @@ def create_matchup_data(
                 continue
 
             # Store opponent ID for this match
-            opponents.append(matchup["opponent"])
+            opponents.append(matchup["opponent_id"])
 
             # Extract match features
             match_features = [
@@ -107,14 +152,257 @@ def create_matchup_data(
                     )  # Include raw value and difference
             features.append(match_features)
 
-    # Get player names by counting occurrences in their histories
-    p1_names = pd.concat([p1_history["winner_name"], p1_history["loser_name"]])
-    p2_names = pd.concat([p2_history["winner_name"], p2_history["loser_name"]])
-    p1_name = p1_names.value_counts().index[0]  # Most frequent name is the player
-    p2_name = p2_names.value_counts().index[0]
-
     # Create opponent masks - mark matches where players played each other
-    p1_mask = [1 if opp == p2_name else 0 for opp in p1_opponents]
-    p2_mask = [1 if opp == p1_name else 0 for opp in p2_opponents]
+    p1_id, p2_id = player_id(p1_history), player_id(p2_history)
+    p1_mask = [1 if opp == p2_id else 0 for opp in p1_opponents]
+    p2_mask = [1 if opp == p1_id else 0 for opp in p2_opponents]
 
     return p1_features, p2_features, p1_mask, p2_mask
+
+
+def build_player_index(
+    player_dfs: Dict[int, pd.DataFrame], feature_cols: list[str]
+) -> Dict[str, Any]:
+    """
+    Flatten every player's sorted match history into contiguous arrays.
+
+    Row i of a player's block holds the features create_matchup_data would emit
+    for that player's i-th match, so a lookback window becomes a positional slice
+    instead of a date filter plus iterrows. The first row of each block has no
+    previous match and is never part of a window.
+
+    Returns:
+    dict with "features" (rows x features), "opponents" (opponent ids),
+    "dates" and "offsets" (player id -> (start, end) row range)
+    """
+    players = list(player_dfs.keys())
+    history = pd.concat([player_dfs[player] for player in players], ignore_index=True)
+
+    is_winner = (history["is_winner"] == 1).to_numpy()
+    dates = history["tourney_date"].to_numpy()
+    days_since_last = np.zeros(len(history), dtype=np.float64)
+    days_since_last[1:] = (dates[1:] - dates[:-1]) / np.timedelta64(1, "D")
+
+    columns = [
+        is_winner.astype(np.float64),  # player_is_winner
+        np.floor(days_since_last),  # time_since_last_match
+        history["draw_size"].to_numpy(dtype=np.float64),  # draw_size
+        (history["surface"] == "clay").to_numpy(dtype=np.float64),  # surface_clay
+        (history["surface"] == "grass").to_numpy(dtype=np.float64),  # surface_grass
+        (history["surface"] == "hard").to_numpy(dtype=np.float64),  # surface_hard
+    ]
+
+    # Add player stats and differences
+    for col in feature_cols:
+        if col.startswith("w_"):
+            w_vals = history[col].to_numpy(dtype=np.float64)
+            l_vals = history[col.replace("w_", "l_")].to_numpy(dtype=np.float64)
+            player_val = np.where(is_winner, w_vals, l_vals)
+            opponent_val = np.where(is_winner, l_vals, w_vals)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                diff = np.where(
+                    opponent_val == 0, 3, (player_val - opponent_val) / opponent_val
+                )
+            columns.extend([player_val, diff])
+
+    offsets = {}
+    start = 0
+    for player in players:
+        end = start + len(player_dfs[player])
+        offsets[player] = (start, end)
+        start = end
+
+    return {
+        "features": np.column_stack(columns),
+        "opponents": history["opponent_id"].to_numpy(dtype=np.int64),
+        "dates": dates,
+        "offsets": offsets,
+    }
+
+
+def get_history_positions(
+    player_index: Dict[str, Any], players: np.ndarray, dates: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For each (player, date) pair, return the flattened row where the player's
+    history block starts and how many of their matches were played before date.
+    """
+    starts = np.zeros(len(players), dtype=np.int64)
+    counts = np.zeros(len(players), dtype=np.int64)
+    for player, rows in pd.Series(players).groupby(players, sort=False).indices.items():
+        start, end = player_index["offsets"][player]
+        starts[rows] = start
+        counts[rows] = np.searchsorted(
+            player_index["dates"][start:end], dates[rows], side="left"
+        )
+    return starts, counts
+
+
+def _gather_training_data(windows, opponents, winner_ends, loser_ends, winners, losers):
+    winner_features = windows[winner_ends]
+    loser_features = windows[loser_ends]
+    winner_mask = (opponents[winner_ends] == losers[:, None]).astype(np.int64)
+    loser_mask = (opponents[loser_ends] == winners[:, None]).astype(np.int64)
+
+    # Interleave each winning sample with its swapped losing sample
+    def interleave(a, b):
+        return np.stack([a, b], axis=1).reshape(-1, *a.shape[1:])
+
+    return {
+        "X1": interleave(winner_features, loser_features),
+        "X2": interleave(loser_features, winner_features),
+        "M1": interleave(winner_mask, loser_mask),
+        "M2": interleave(loser_mask, winner_mask),
+        "y": np.tile(np.array([1, 0], dtype=np.int64), len(winners)),
+    }
+
+
+def create_training_data_multi(
+    df: pd.DataFrame, player_index: Dict[str, Any], lookbacks: list[int]
+) -> Iterator[tuple[int, Dict[str, np.ndarray]]]:
+    """
+    Build the training data for several lookbacks from one pass over df.
+
+    History positions are looked up once, and a single sliding view of the
+    longest window is taken; each shorter lookback is a suffix view of it.
+    Yields (lookback, data) in ascending lookback order so each dataset can be
+    written and released before the next one is gathered.
+    """
+    winners = df["winner_id"].to_numpy(dtype=np.int64)
+    losers = df["loser_id"].to_numpy(dtype=np.int64)
+    dates = df["tourney_date"].to_numpy()
+
+    winner_starts, winner_counts = get_history_positions(player_index, winners, dates)
+    loser_starts, loser_counts = get_history_positions(player_index, losers, dates)
+    winner_ends = winner_starts + winner_counts
+    loser_ends = loser_starts + loser_counts
+
+    # Pad the front so windows[e] is the (max_lookback, features) block of rows
+    # e - max_lookback .. e - 1 for every history end e
+    max_lookback = max(lookbacks)
+    features = player_index["features"]
+    features = np.concatenate([np.zeros((max_lookback, features.shape[1])), features])
+    opponents = np.concatenate(
+        [np.full(max_lookback, -1, dtype=np.int64), player_index["opponents"]]
+    )
+    windows = sliding_window_view(features, (max_lookback, features.shape[1]))[:, 0]
+    opponent_windows = sliding_window_view(opponents, max_lookback)
+
+    for lookback in sorted(set(lookbacks)):
+        # Skip if either player has fewer matches than lookback
+        valid = (winner_counts >= lookback + 1) & (loser_counts >= lookback + 1)
+        yield lookback, _gather_training_data(
+            windows[:, -lookback:],
+            opponent_windows[:, -lookback:],
+            winner_ends[valid],
+            loser_ends[valid],
+            winners[valid],
+            losers[valid],
+        )
+
+
+def create_training_data(
+    df: pd.DataFrame, player_index: Dict[str, Any], lookback: int
+) -> Dict[str, np.ndarray]:
+    """
+    Build X1, X2, M1, M2 and y for every match in df using a player index.
+
+    Produces the same samples, in the same order, as running
+    create_matchup_data on each match's get_player_last_nplus1_matches_since_date
+    histories: a winner sample (y=1) followed by its swapped loser sample (y=0),
+    skipping matches where either player has fewer than lookback + 1 prior matches.
+    Opponent masks compare integer player ids.
+    """
+    _, data = next(create_training_data_multi(df, player_index, [lookback]))
+    return data
+
+
+def _create_training_data_shard(task):
+    start, end, lookback = task
+    return create_training_data(
+        _worker_state["df"].iloc[start:end], _worker_state["player_index"], lookback
+    )
+
+
+def create_training_data_sharded(
+    df: pd.DataFrame, player_index: Dict[str, Any], lookbacks: list[int], workers: int
+) -> Iterator[tuple[int, Dict[str, np.ndarray]]]:
+    """
+    Run create_training_data over contiguous shards of df in a process pool.
+
+    The match files are concatenated year by year, so contiguous row ranges are
+    effectively year ranges. Shards are merged in row order, which gives exactly
+    the single-process output.
+
+    Lookbacks are generated one at a time, in ascending order: each is yielded
+    as soon as its shards are merged, so the parent holds only one dataset at a
+    time, as in create_training_data_multi. Workers look up history positions
+    again for every lookback.
+    """
+    if workers <= 1:
+        yield from create_training_data_multi(df, player_index, lookbacks)
+        return
+
+    edges = np.linspace(0, len(df), workers + 1).astype(int)
+    state = {"df": df, "player_index": player_index}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(state,)
+    ) as executor:
+        for lookback in sorted(set(lookbacks)):
+            tasks = [
+                (start, end, lookback) for start, end in zip(edges[:-1], edges[1:])
+            ]
+            parts = list(executor.map(_create_training_data_shard, tasks))
+            data = {
+                key: np.concatenate([part[key] for part in parts]) for key in parts[0]
+            }
+            del parts
+            yield lookback, data
+            del data
+
+
+def create_training_data_iterrows(
+    df: pd.DataFrame,
+    player_dfs: Dict[int, pd.DataFrame],
+    feature_cols: list[str],
+    lookback: int,
+) -> Dict[str, np.ndarray]:
+    """
+    Reference per-match implementation of create_training_data, kept for parity
+    checks and benchmarks. Filters each player's dataframe by date for every match.
+    """
+    X1, X2, M1, M2, y = [], [], [], [], []  # M1, M2 are opponent masks
+
+    for _, matchup in df.iterrows():
+        winner = matchup["winner_id"]
+        loser = matchup["loser_id"]
+        date = matchup["tourney_date"]
+
+        winner_history = get_player_last_nplus1_matches_since_date(
+            player_dfs, winner, lookback, date
+        )
+        loser_history = get_player_last_nplus1_matches_since_date(
+            player_dfs, loser, lookback, date
+        )
+
+        # Skip if either player has fewer matches than lookback
+        if len(winner_history) < lookback + 1 or len(loser_history) < lookback + 1:
+            continue
+
+        winner_features, loser_features, winner_mask, loser_mask = create_matchup_data(
+            winner_history, loser_history, feature_cols
+        )
+
+        X1.extend([winner_features, loser_features])
+        X2.extend([loser_features, winner_features])
+        M1.extend([winner_mask, loser_mask])
+        M2.extend([loser_mask, winner_mask])
+        y.extend([1, 0])
+
+    return {
+        "X1": np.array(X1),
+        "X2": np.array(X2),
+        "M1": np.array(M1),
+        "M2": np.array(M2),
+        "y": np.array(y),
+    }
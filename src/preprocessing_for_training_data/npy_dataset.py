@@ -0,0 +1,147 @@
+import base64
+import hashlib
+import json
+import os
+import resource
+import sys
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from tqdm import tqdm
+
+FORMAT_VERSION = 1
+SCHEMA_FILE = "schema.json"
+ARRAY_NAMES = ["X1", "X2", "M1", "M2", "y"]
+# GCS resumable uploads send chunks in multiples of 256 KiB
+CHUNK_BYTES = 32 * 256 * 1024
+
+
+class ChecksumWriter:
+    """File-like wrapper that hashes and counts bytes on their way to fileobj"""
+
+    def __init__(self, fileobj, progress=None):
+        self.fileobj = fileobj
+        self.progress = progress
+        self.md5 = hashlib.md5()
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.md5.update(data)
+        self.bytes_written += len(data)
+        if self.progress is not None:
+            self.progress.update(len(data))
+        return self.fileobj.write(data)
+
+    @property
+    def md5_base64(self):
+        # Same encoding as the md5_hash GCS reports for a blob
+        return base64.b64encode(self.md5.digest()).decode()
+
+
+def write_npy(
+    array: np.ndarray, fileobj, chunk_bytes: int = CHUNK_BYTES, progress=None
+) -> Dict[str, Any]:
+    """
+    Serialize array in .npy format to fileobj, chunk_bytes at a time, without
+    building the serialized file in memory.
+
+    Returns:
+    dict with the dtype, shape, size in bytes and base64 md5 of the written file
+    """
+    array = np.ascontiguousarray(array)
+    writer = ChecksumWriter(fileobj, progress)
+    np.lib.format.write_array_header_1_0(
+        writer, np.lib.format.header_data_from_array_1_0(array)
+    )
+    buffer = memoryview(array.reshape(-1)).cast("B")
+    for start in range(0, len(buffer), chunk_bytes):
+        end = min(start + chunk_bytes, len(buffer))
+        writer.write(buffer[start:end])
+    return {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "bytes": writer.bytes_written,
+        "md5": writer.md5_base64,
+    }
+
+
+def stream_npy_dataset(
+    data: Dict[str, np.ndarray],
+    open_file: Callable[[str], Any],
+    metadata: Optional[Dict[str, Any]] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> Dict[str, Any]:
+    """
+    Write training data as one uncompressed .npy file per array plus a JSON
+    schema header, so readers can memory-map each array.
+
+    open_file(file_name) must return a writable binary file context manager,
+    e.g. a local file or a GCS resumable upload from blob.open("wb"). The
+    schema is written last and marks the dataset as complete.
+
+    Returns:
+    the schema, including each array's md5 checksum
+    """
+    arrays = {}
+    total_bytes = sum(np.asarray(data[name]).nbytes for name in ARRAY_NAMES)
+    with tqdm(total=total_bytes, unit="B", unit_scale=True, unit_divisor=1024) as bar:
+        for name in ARRAY_NAMES:
+            with open_file(f"{name}.npy") as f:
+                arrays[name] = {
+                    "file": f"{name}.npy",
+                    **write_npy(data[name], f, chunk_bytes, bar),
+                }
+
+    schema = {
+        "format_version": FORMAT_VERSION,
+        "arrays": arrays,
+        "metadata": metadata or {},
+    }
+    with open_file(SCHEMA_FILE) as f:
+        f.write(json.dumps(schema, indent=2).encode())
+    return schema
+
+
+def save_npy_dataset(
+    data: Dict[str, np.ndarray],
+    directory: str,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Write training data to a local directory with stream_npy_dataset"""
+    os.makedirs(directory, exist_ok=True)
+    return stream_npy_dataset(
+        data, lambda file_name: open(os.path.join(directory, file_name), "wb"), metadata
+    )
+
+
+def get_peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def load_npy_dataset(
+    directory: str, mmap_mode: Optional[str] = "r"
+) -> Dict[str, np.ndarray]:
+    """
+    Open a dataset written by save_npy_dataset. Arrays are memory-mapped by
+    default so pages are only read when they are used.
+    """
+    with open(os.path.join(directory, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    if schema["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported dataset format version: {schema['format_version']}"
+        )
+
+    data = {}
+    for name, spec in schema["arrays"].items():
+        array = np.load(os.path.join(directory, spec["file"]), mmap_mode=mmap_mode)
+        if array.dtype.str != spec["dtype"] or list(array.shape) != spec["shape"]:
+            raise ValueError(
+                f"{name} does not match schema: got {array.dtype.str} {array.shape}, "
+                f"expected {spec['dtype']} {tuple(spec['shape'])}"
+            )
+        data[name] = array
+    return data
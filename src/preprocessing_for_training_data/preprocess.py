@@ -1,17 +1,24 @@
 import os
-import pickle
 import logging
+import time
+import argparse
 from google.cloud import storage
+from google.cloud.storage.retry import DEFAULT_RETRY
 import pandas as pd
-import numpy as np
-from tqdm import tqdm
-from io import BytesIO, StringIO
+from io import StringIO
 
 from helper import (
-    create_matchup_data,
-    get_player_last_nplus1_matches_since_date,
+    build_player_index,
+    create_training_data_sharded,
     preprocess_data,
 )
+from npy_dataset import (
+    CHUNK_BYTES,
+    SCHEMA_FILE,
+    get_peak_rss_mb,
+    save_npy_dataset,
+    stream_npy_dataset,
+)
 
 # Set up logging
 logging.basicConfig(
@@ -24,6 +31,9 @@ GOOGLE_APPLICATION_CREDENTIALS = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"
 DATA_FOLDER = os.environ.get("DATA_FOLDER")
 DATA_FILE = os.environ.get("DATA_FILE")
 LOOKBACK = int(os.environ.get("LOOKBACK"))
+# Optional comma-separated list (e.g. "5,10,20") to build several lookbacks in one pass
+LOOKBACKS = [int(x) for x in os.environ.get("LOOKBACKS", str(LOOKBACK)).split(",")]
+WORKERS = int(os.environ.get("WORKERS", "1"))
 
 
 logging.info(f"Using GCS bucket: {BUCKET_NAME}")
@@ -37,94 +47,114 @@ def read_csv_from_gcs(bucket, file_name):
     return pd.read_csv(StringIO(content))
 
 
-def main():
-    logging.info("Starting preprocessing script")
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Create LSTM training data")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS,
+        help="Worker processes for sharded generation (1 runs in a single process)",
+    )
+    parser.add_argument(
+        "--lookbacks",
+        type=int,
+        nargs="+",
+        default=LOOKBACKS,
+        help="Lookback windows to generate datasets for",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default=None,
+        help="Write datasets to this local directory instead of GCS",
+    )
+    return parser.parse_args()
 
-    # Initialize GCS client
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    logging.info(f"Connected to GCS bucket: {BUCKET_NAME}")
 
-    local_output_file = f"./training_data_lookback={LOOKBACK}.pkl"
-    if not os.path.exists(local_output_file):
+def get_dataset_name(lookback):
+    return f"training_data_lookback={lookback}"
 
-        # Read data file
-        df = read_csv_from_gcs(bucket, os.path.join(DATA_FOLDER, DATA_FILE))
-        logging.info(f"Data shape: {df.shape}")
 
-        # Create dataset
-        df["tourney_date"] = pd.to_datetime(df["tourney_date"], format="%Y-%m-%d")
-        player_dfs, feature_cols = preprocess_data(df)
-        X1, X2, M1, M2, y = [], [], [], [], []  # M1, M2 are opponent masks
+def open_gcs_file(bucket, output_dir):
+    """
+    Return an open_file callable for stream_npy_dataset that writes each file as
+    a chunked, resumable upload, so the dataset is never serialized in memory.
+    """
 
-        for _, matchup in tqdm(df.iterrows()):
-            winner = matchup["winner_name"]
-            loser = matchup["loser_name"]
-            date = matchup["tourney_date"]
+    def open_file(file_name):
+        return bucket.blob(f"{output_dir}/{file_name}").open(
+            "wb",
+            chunk_size=CHUNK_BYTES,
+            content_type=(
+                "application/json"
+                if file_name == SCHEMA_FILE
+                else "application/octet-stream"
+            ),
+            retry=DEFAULT_RETRY,
+        )
 
-            winner_history = get_player_last_nplus1_matches_since_date(
-                player_dfs, winner, LOOKBACK, date
-            )
-            loser_history = get_player_last_nplus1_matches_since_date(
-                player_dfs, loser, LOOKBACK, date
-            )
+    return open_file
 
-            # Skip if either player has fewer matches than LOOKBACK
-            if len(winner_history) < LOOKBACK + 1 or len(loser_history) < LOOKBACK + 1:
-                continue
 
-            # Create matchup data with opponent masks
-            winner_features, loser_features, winner_mask, loser_mask = (
-                create_matchup_data(
-                    winner_history, loser_history, feature_cols, LOOKBACK
-                )
+def verify_upload(bucket, output_dir, schema):
+    """Compare the md5 GCS computed for each uploaded array with the streamed one"""
+    for name, spec in schema["arrays"].items():
+        blob = bucket.get_blob(f"{output_dir}/{spec['file']}")
+        if blob is None or blob.md5_hash != spec["md5"]:
+            raise ValueError(f"Checksum mismatch for uploaded {name} in {output_dir}")
+    logging.info(f"Verified checksums of {len(schema['arrays'])} arrays")
+
+
+def main():
+    args = parse_args()
+    logging.info("Starting preprocessing script")
+    logging.info(f"Using {args.workers} worker process(es)")
+
+    # Initialize GCS client
+    client = storage.Client()
+    bucket = client.bucket(BUCKET_NAME)
+    logging.info(f"Connected to GCS bucket: {BUCKET_NAME}")
+
+    # Read data file
+    df = read_csv_from_gcs(bucket, os.path.join(DATA_FOLDER, DATA_FILE))
+    logging.info(f"Data shape: {df.shape}")
+
+    # Create dataset
+    df["tourney_date"] = pd.to_datetime(df["tourney_date"], format="%Y-%m-%d")
+    player_dfs, feature_cols = preprocess_data(df, workers=args.workers)
+    player_index = build_player_index(player_dfs, feature_cols)
+
+    # Each match yields a winning sample (y=1) followed by the same matchup
+    # with players swapped (y=0). Even though model architecture ensures
+    # P(B beats A) = 1 - P(A beats B), we need both samples during training
+    # for the loss function to learn properly and place the decision boundary
+    start_time = time.perf_counter()
+    for lookback, data in create_training_data_sharded(
+        df, player_index, args.lookbacks, workers=args.workers
+    ):
+        logging.info(
+            f"Created {len(data['y'])} training samples for lookback={lookback} "
+            f"after {time.perf_counter() - start_time:.1f}s"
+        )
+        metadata = {"lookback": lookback, "source": f"{DATA_FOLDER}/{DATA_FILE}"}
+
+        if args.output_dir:
+            local_dir = os.path.join(args.output_dir, get_dataset_name(lookback))
+            logging.info(f"Writing training data to {local_dir}")
+            save_npy_dataset(data, local_dir, metadata)
+        else:
+            output_dir = f"{DATA_FOLDER}/{get_dataset_name(lookback)}"
+            logging.info(f"Streaming training data to {output_dir}")
+            schema = stream_npy_dataset(
+                data, open_gcs_file(bucket, output_dir), metadata
             )
+            verify_upload(bucket, output_dir, schema)
+            logging.info(f"Training data successfully written to {output_dir}")
 
-            # Add winning match
-            X1.append(winner_features)
-            X2.append(loser_features)
-            M1.append(winner_mask)
-            M2.append(loser_mask)
-            y.append(1)  # Winner (X1) beats Loser (X2)
-
-            # Add losing match by swapping players
-            # Even though model architecture ensures P(B beats A) = 1 - P(A beats B),
-            # we need both y=0 and y=1 samples during training for the loss function
-            # to learn properly and place the decision boundary correctly
-            X1.append(loser_features.copy())
-            X2.append(winner_features.copy())
-            M1.append(loser_mask.copy())
-            M2.append(winner_mask.copy())
-            y.append(0)  # Loser (X1) loses to Winner (X2)
-
-        data = {
-            "X1": np.array(X1),
-            "X2": np.array(X2),
-            "M1": np.array(M1),
-            "M2": np.array(M2),
-            "y": np.array(y),
-        }
-
-        with open(local_output_file, "wb") as f:
-            pickle.dump(data, f)
-
-    # Read local pkl data file
-    local_output_file = f"./training_data_lookback={LOOKBACK}.pkl"
-    with open(local_output_file, "rb") as f:
-        data = pickle.load(f)
-
-    serialized_data = pickle.dumps(data)
-    file_obj = BytesIO(serialized_data)
-
-    # Write the combined data to a new CSV in the next version folder
-    print("writing to GCS")
-    output_file = f"{DATA_FOLDER}/training_data_lookback={LOOKBACK}.pkl"
-    logging.info(f"Writing combined data to {output_file}")
-    bucket.blob(output_file).upload_from_file(
-        file_obj, content_type="application/octet-stream"
-    )
+        logging.info(f"Peak RSS so far: {get_peak_rss_mb():.0f} MB")
+        del data
 
-    logging.info(f"Combined data successfully written to {output_file}")
     logging.info("Preprocessing completed")
 
 
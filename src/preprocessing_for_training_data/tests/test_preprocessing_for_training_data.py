@@ -1,4 +1,8 @@
+import base64
+import hashlib
+import io
 import pytest
+import numpy as np
 import pandas as pd
 import sys
 import os
@@ -7,11 +11,21 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from helper import (  # noqa: E402
+    build_player_index,
+    create_training_data,
+    create_training_data_iterrows,
+    create_training_data_multi,
+    create_training_data_sharded,
     preprocess_data,
     calculate_percentage_difference,
     get_player_last_nplus1_matches_since_date,
     create_matchup_data,
 )
+from npy_dataset import (  # noqa: E402
+    load_npy_dataset,
+    save_npy_dataset,
+    stream_npy_dataset,
+)
 
 
 @pytest.fixture
@@ -23,6 +37,8 @@ def sample_df():
             ),
             "winner_name": ["Player1", "Player2", "Player1", "Player2"],
             "loser_name": ["Player2", "Player3", "Player3", "Player1"],
+            "winner_id": [101, 102, 101, 102],
+            "loser_id": [102, 103, 103, 101],
             "w_stat1": [100, 200, 150, 180],
             "l_stat1": [90, 180, 140, 170],
             "draw_size": [32, 32, 64, 64],
@@ -36,9 +52,10 @@ def test_preprocess_data(sample_df):
 
     assert len(player_dfs) == 3  # Player1, Player2, Player3
     assert len(feature_cols) == 2  # w_stat1, l_stat1
-    assert "Player1" in player_dfs
-    assert "is_winner" in player_dfs["Player1"].columns
-    assert "opponent" in player_dfs["Player1"].columns
+    assert 101 in player_dfs
+    assert "is_winner" in player_dfs[101].columns
+    assert player_dfs[101]["opponent"].tolist() == ["Player2", "Player3", "Player2"]
+    assert player_dfs[101]["opponent_id"].tolist() == [102, 103, 102]
 
 
 def test_calculate_percentage_difference():
@@ -50,7 +67,7 @@ def test_calculate_percentage_difference():
 def test_get_player_last_nplus1_matches_since_date(sample_df):
     player_dfs, _ = preprocess_data(sample_df)
     matches = get_player_last_nplus1_matches_since_date(
-        player_dfs, "Player1", 2, "2023-01-04"
+        player_dfs, 101, 2, "2023-01-04"
     )
     assert len(matches) <= 2
 
@@ -58,10 +75,10 @@ def test_get_player_last_nplus1_matches_since_date(sample_df):
 def test_create_matchup_data(sample_df):
     player_dfs, feature_cols = preprocess_data(sample_df)
     p1_history = get_player_last_nplus1_matches_since_date(
-        player_dfs, "Player1", 2, "2023-01-04"
+        player_dfs, 101, 2, "2023-01-04"
     )
     p2_history = get_player_last_nplus1_matches_since_date(
-        player_dfs, "Player2", 2, "2023-01-04"
+        player_dfs, 102, 2, "2023-01-04"
     )
 
     p1_features, p2_features, p1_mask, p2_mask = create_matchup_data(
@@ -103,8 +120,8 @@ def test_data_preprocessing_pipeline(sample_df):
     # Test data transformation for one matchup
     # Use the last match (2023-01-04) to ensure we have some history
     matchup = sample_df.iloc[-1]  # Changed from iloc[0] to iloc[-1]
-    winner = matchup["winner_name"]  # Player2
-    loser = matchup["loser_name"]  # Player1
+    winner = matchup["winner_id"]  # Player2
+    loser = matchup["loser_id"]  # Player1
     date = matchup["tourney_date"]  # 2023-01-04
 
     # Get player histories
@@ -137,3 +154,147 @@ def test_data_preprocessing_pipeline(sample_df):
         )  # Check feature types
     if len(loser_features) > 0:
         assert all(isinstance(x, (int, float)) for x in loser_features[0])
+
+
+@pytest.fixture
+def history_df():
+    """Round-robin matches with repeated dates so histories exceed the lookback"""
+    rng = np.random.default_rng(0)
+    players = ["Player1", "Player2", "Player3", "Player4"]
+    rows = []
+    for i in range(60):
+        winner, loser = rng.choice(players, size=2, replace=False)
+        rows.append(
+            {
+                "tourney_date": pd.Timestamp("2023-01-01")
+                + pd.Timedelta(days=7 * (i // 3)),
+                "winner_name": winner,
+                "loser_name": loser,
+                "winner_id": 100 + players.index(winner),
+                "loser_id": 100 + players.index(loser),
+                "w_stat1": float(rng.integers(0, 20)),
+                "l_stat1": float(rng.integers(0, 20)),
+                "draw_size": 32,
+                "surface": rng.choice(["hard", "clay", "grass"]),
+            }
+        )
+    return pd.DataFrame(rows).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("lookback", [3, 5])
+def test_create_training_data_matches_iterrows(history_df, lookback):
+    player_dfs, feature_cols = preprocess_data(history_df)
+    player_index = build_player_index(player_dfs, feature_cols)
+
+    expected = create_training_data_iterrows(
+        history_df, player_dfs, feature_cols, lookback
+    )
+    actual = create_training_data(history_df, player_index, lookback)
+
+    assert len(expected["y"]) > 0
+    for key in ["X1", "X2", "M1", "M2", "y"]:
+        assert actual[key].shape == expected[key].shape
+        np.testing.assert_array_equal(actual[key], expected[key])
+
+
+def test_build_player_index(sample_df):
+    player_dfs, feature_cols = preprocess_data(sample_df)
+    player_index = build_player_index(player_dfs, feature_cols)
+
+    start, end = player_index["offsets"][101]
+    assert end - start == len(player_dfs[101])
+    # 6 match features + raw value and difference for each w_ column
+    assert player_index["features"].shape == (8, 8)
+    assert list(player_index["opponents"][start:end]) == list(
+        player_dfs[101]["opponent_id"]
+    )
+
+
+def test_sharded_generation_matches_single_process(history_df):
+    player_dfs, feature_cols = preprocess_data(history_df)
+    sharded_dfs, _ = preprocess_data(history_df, workers=2)
+
+    assert sharded_dfs.keys() == player_dfs.keys()
+    for player, player_df in player_dfs.items():
+        pd.testing.assert_frame_equal(sharded_dfs[player], player_df)
+
+    player_index = build_player_index(player_dfs, feature_cols)
+    actual = dict(
+        create_training_data_sharded(history_df, player_index, [5, 3], workers=3)
+    )
+
+    assert list(actual) == [3, 5]
+    for lookback in [3, 5]:
+        expected = create_training_data(history_df, player_index, lookback)
+        for key in ["X1", "X2", "M1", "M2", "y"]:
+            np.testing.assert_array_equal(actual[lookback][key], expected[key])
+
+
+def test_npy_dataset_roundtrip(history_df, tmp_path):
+    player_dfs, feature_cols = preprocess_data(history_df)
+    data = create_training_data(
+        history_df, build_player_index(player_dfs, feature_cols), 3
+    )
+
+    save_npy_dataset(data, str(tmp_path), metadata={"lookback": 3})
+    loaded = load_npy_dataset(str(tmp_path))
+
+    for key in ["X1", "X2", "M1", "M2", "y"]:
+        assert isinstance(loaded[key], np.memmap)
+        np.testing.assert_array_equal(loaded[key], data[key])
+
+
+def test_npy_dataset_rejects_schema_mismatch(tmp_path):
+    data = {key: np.zeros((4, 2)) for key in ["X1", "X2", "M1", "M2"]}
+    data["y"] = np.zeros(4)
+    save_npy_dataset(data, str(tmp_path))
+    np.save(str(tmp_path / "y.npy"), np.zeros(3))
+
+    with pytest.raises(ValueError, match="does not match schema"):
+        load_npy_dataset(str(tmp_path))
+
+
+def test_stream_npy_dataset_checksums(tmp_path):
+    data = {key: np.arange(40.0).reshape(4, 10) for key in ["X1", "X2", "M1", "M2"]}
+    data["y"] = np.array([1, 0, 1, 0])
+    files = {}
+
+    class UploadTarget(io.BytesIO):
+        def __init__(self, file_name):
+            super().__init__()
+            files[file_name] = self
+
+        def close(self):
+            self.contents = self.getvalue()
+            super().close()
+
+    # A tiny chunk size makes every array span several writes
+    schema = stream_npy_dataset(data, UploadTarget, {"lookback": 3}, chunk_bytes=64)
+
+    assert list(files) == [f"{key}.npy" for key in data] + ["schema.json"]
+    for key, spec in schema["arrays"].items():
+        contents = files[spec["file"]].contents
+        expected = base64.b64encode(hashlib.md5(contents).digest()).decode()
+        assert spec["md5"] == expected
+        assert spec["bytes"] == len(contents)
+        (tmp_path / spec["file"]).write_bytes(contents)
+    (tmp_path / "schema.json").write_bytes(files["schema.json"].contents)
+
+    loaded = load_npy_dataset(str(tmp_path))
+    for key in data:
+        np.testing.assert_array_equal(loaded[key], data[key])
+
+
+def test_create_training_data_multi_matches_iterrows(history_df):
+    player_dfs, feature_cols = preprocess_data(history_df)
+    player_index = build_player_index(player_dfs, feature_cols)
+
+    multi = create_training_data_multi(history_df, player_index, [5, 3])
+
+    for lookback, data in multi:
+        expected = create_training_data_iterrows(
+            history_df, player_dfs, feature_cols, lookback
+        )
+        for key in ["X1", "X2", "M1", "M2", "y"]:
+            assert data[key].shape == expected[key].shape
+            np.testing.assert_array_equal(data[key], expected[key])
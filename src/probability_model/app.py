@@ -1,19 +1,44 @@
+import asyncio
+import contextlib
+import hashlib
+import hmac
+from concurrent import futures
 from io import BytesIO
+import json
 import os
 import pickle
-from typing import List
+import queue
+import threading
+import time
+from typing import List, Optional
 import logging
 import torch
 
 import fastapi
 
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 from pydantic import BaseModel, field_validator, model_validator
 from sklearn.preprocessing import StandardScaler
 
 if os.environ.get("ENV") != "test":
-    from .model import TennisLSTM
+    from .model import TennisLSTM, fit_scaler, scaler_from_dict
+    from .inference import (
+        INT8_VERSION_SUFFIX,
+        InferenceWorker,
+        OnnxModel,
+        TorchScriptModel,
+        WorkerClosed,
+        check_quantization_report,
+        configure_torch_threads,
+        quantize_dynamic_int8,
+    )
+    from .npy_dataset import ARRAY_NAMES, SCHEMA_FILE, load_npy_dataset
+    from .gcs_cache import GcsCache
 else:
+    from inference import INT8_VERSION_SUFFIX, InferenceWorker, WorkerClosed
+    from gcs_cache import GcsCache
+
     # Mock TennisLSTM for non-prod environments
     class TennisLSTM:
         def __init__(self, *args, **kwargs):
@@ -53,120 +78,406 @@ GOOGLE_APPLICATION_CREDENTIALS = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"
 DATA_FOLDER = os.environ.get("DATA_FOLDER", "version1")
 DATA_FILE = os.environ.get("DATA_FILE", "combined_atp_matches.csv")
 WEIGHTS_FILE = os.environ.get("WEIGHTS_FILE", "prob_model.pt")
+SCALERS_FILE = os.environ.get("SCALERS_FILE", "prob_model_scalers.json")
+# eager (TennisLSTM + state_dict), torchscript or onnx (ONNX Runtime on CPU)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "eager")
+TORCHSCRIPT_FILE = os.environ.get("TORCHSCRIPT_FILE", "prob_model.ts")
+ONNX_FILE = os.environ.get("ONNX_FILE", "prob_model.onnx")
+# Dynamic int8 quantization of the eager model, only served if the trainer's
+# held-out AUC/F1 for int8 are within these drops of fp32
+QUANTIZE_INT8 = os.environ.get("QUANTIZE_INT8", "0") == "1"
+QUANTIZATION_FILE = os.environ.get("QUANTIZATION_FILE", "prob_model_quantization.json")
+QUANTIZATION_MAX_AUC_DROP = float(os.environ.get("QUANTIZATION_MAX_AUC_DROP", "0.005"))
+QUANTIZATION_MAX_F1_DROP = float(os.environ.get("QUANTIZATION_MAX_F1_DROP", "0.01"))
+# CPU execution profile: torch thread pools (0 keeps torch's default) and
+# the queue in front of the single inference worker thread
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.environ.get("TORCH_INTEROP_THREADS", "1"))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", "64"))
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", "10"))
+# Retry-After for requests that arrive while the model is loading
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "5"))
+# Admin reloads: endpoints are disabled unless ADMIN_TOKEN is set. The old
+# model is closed RELOAD_GRACE_SECONDS after a swap, once in-flight requests
+# on it are done. With MANIFEST_POLL_SECONDS > 0, the service reloads when the
+# "probability_model" section of MANIFEST_FILE (in the bucket) changes.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+RELOAD_GRACE_SECONDS = float(os.environ.get("RELOAD_GRACE_SECONDS", "30"))
+MANIFEST_FILE = os.environ.get("MANIFEST_FILE", "serving_manifest.json")
+MANIFEST_POLL_SECONDS = float(os.environ.get("MANIFEST_POLL_SECONDS", "0"))
 HIDDEN_SIZE = int(os.environ.get("HIDDEN_SIZE", "256"))
 NUM_LAYERS = int(os.environ.get("NUM_LAYERS", "2"))
 GCS_CACHE = os.environ.get("GCS_CACHE")
+# Least recently used files are evicted past this size; 0 for no limit
+GCS_CACHE_MAX_MB = int(os.environ.get("GCS_CACHE_MAX_MB", "4096"))
+# Files larger than GCS_CHUNK_MB download as concurrent byte ranges
+GCS_DOWNLOAD_WORKERS = int(os.environ.get("GCS_DOWNLOAD_WORKERS", "8"))
+GCS_CHUNK_MB = int(os.environ.get("GCS_CHUNK_MB", "32"))
+gcs_cache = GcsCache(
+    GCS_CACHE,
+    GCS_CACHE_MAX_MB * 1024 * 1024 or None,
+    workers=GCS_DOWNLOAD_WORKERS,
+    chunk_bytes=GCS_CHUNK_MB * 1024 * 1024,
+)
 
 
 def read_file_from_gcs_or_cache(bucket: storage.Bucket, file_name: str) -> bytes:
     """
-    Read a file from GCS or local cache if it exists.
-    /gcs_cache/msmballstars-data is where the data may be cached.
+    Read a file from GCS, through the local cache under GCS_CACHE if it is set.
+    Raises NotFound if the file does not exist.
     """
     logging.info(f"Loading file: {file_name}")
-    if GCS_CACHE:
-        cache_dir = os.path.join(GCS_CACHE, BUCKET_NAME)
-        local_file_path = os.path.join(cache_dir, file_name)
+    return gcs_cache.read_bytes(bucket, file_name)
 
-        # Create the cache directory structure if it doesn't exist
-        try:
-            os.makedirs(cache_dir, exist_ok=True)
-            logging.info(f"Cache directory ensured: {cache_dir}")
-        except Exception as e:
-            logging.error(f"Failed to create cache directory: {e}")
-
-        if os.path.exists(local_file_path):
-            logging.info(f"File found in local cache: {local_file_path}")
-            with open(local_file_path, "rb") as f:
-                return f.read()
-        else:
-            logging.info(f"File not found in local cache: {local_file_path}")
-    else:
-        logging.info("GCS_CACHE is not set, skipping local cache check")
 
-    blob = bucket.blob(file_name)
-    pickle_data = blob.download_as_bytes()
-    if GCS_CACHE:
-        try:
-            # Ensure the full directory path exists
-            os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-            with open(local_file_path, "wb") as f:
-                f.write(pickle_data)
-            logging.info(f"Successfully cached file to: {local_file_path}")
-            logging.info(f"Cache file size: {os.path.getsize(local_file_path)} bytes")
-        except Exception as e:
-            logging.error(f"Failed to write to cache: {e}")
+def read_pkl_file_from_gcs(bucket, file_name):
+    file_content = read_file_from_gcs_or_cache(bucket, file_name)
+    return pickle.loads(file_content)
 
-    return pickle_data
 
+def read_training_data_from_gcs(bucket, file_name):
+    """
+    Read training data written by preprocessing_for_training_data.
 
-def read_pt_file_from_gcs(bucket, file_name):
-    file_content = read_file_from_gcs_or_cache(bucket, file_name)
-    return torch.load(BytesIO(file_content), map_location=torch.device("cpu"))
+    Legacy datasets are a single .pkl file. Newer ones are a folder of .npy files,
+    which are downloaded to the local cache and memory-mapped.
+    """
+    if file_name.endswith(".pkl"):
+        return read_pkl_file_from_gcs(bucket, file_name)
 
+    names = [f"{name}.npy" for name in ARRAY_NAMES] + [SCHEMA_FILE]
+    local_paths = gcs_cache.get_paths(bucket, [f"{file_name}/{name}" for name in names])
+    return load_npy_dataset(os.path.dirname(local_paths[0]))
 
-def read_pkl_file_from_gcs(bucket, file_name):
+
+def load_quantized_model(bucket, model, data_folder):
+    """
+    Quantize the fp32 model to int8 if the trainer's quantization report shows
+    an acceptable held-out AUC/F1 drop, otherwise keep serving fp32.
+
+    Returns:
+    the model, and whether it was quantized
+    """
+    try:
+        report = json.loads(
+            read_file_from_gcs_or_cache(
+                bucket, os.path.join(data_folder, QUANTIZATION_FILE)
+            )
+        )
+    except NotFound:
+        logging.warning(f"No {QUANTIZATION_FILE} to check int8 accuracy, serving fp32")
+        return model, False
+
+    reasons = check_quantization_report(
+        report, QUANTIZATION_MAX_AUC_DROP, QUANTIZATION_MAX_F1_DROP
+    )
+    if reasons:
+        logging.warning(
+            f"Refusing int8 quantization, serving fp32: {'; '.join(reasons)}"
+        )
+        return model, False
+    logging.info(f"Serving dynamic int8 quantized model, held-out metrics: {report}")
+    return quantize_dynamic_int8(model), True
+
+
+class ServingState:
+    """
+    Everything /predict needs, built together so it can be published as a
+    single reference once loading completes
+    """
+
+    def __init__(
+        self,
+        model,
+        scaler_X1,
+        scaler_X2,
+        device,
+        source=None,
+        model_version="unknown",
+        startup_seconds=None,
+    ):
+        self.model = model
+        self.scaler_X1 = scaler_X1
+        self.scaler_X2 = scaler_X2
+        self.device = device
+        # Files the state was built from, and what responses report
+        self.source = source or default_source()
+        self.data_version = self.source["data_folder"]
+        self.model_version = model_version
+        self.startup_seconds = startup_seconds or {}
+        # All model calls go through one thread that owns the model
+        model.eval()
+        self.worker = InferenceWorker(model, INFERENCE_QUEUE_SIZE, TORCH_NUM_THREADS)
+
+    def close(self):
+        self.worker.close()
+
+
+class StartupTimer:
+    """Time and log named startup phases, so cold starts are measurable"""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start_time = time.perf_counter()
+        yield
+        self.seconds[name] = round(time.perf_counter() - start_time, 3)
+        logging.info(f"Startup phase {name} took {self.seconds[name]:.2f}s")
+
+
+def default_source():
+    """Files to serve from, as configured by environment variables"""
+    return {
+        "data_folder": DATA_FOLDER,
+        "data_file": DATA_FILE,
+        "weights_file": WEIGHTS_FILE,
+        "torchscript_file": TORCHSCRIPT_FILE,
+        "onnx_file": ONNX_FILE,
+    }
+
+
+def get_bucket():
+    global bucket
+    if bucket is None:
+        bucket = storage.Client().bucket(BUCKET_NAME)
+    return bucket
+
+
+def load_scalers(bucket, source):
+    """
+    Scale inputs with the training-set statistics the trainer saved with the
+    model. Models trained before those were saved used full-data scalers.
+
+    Returns:
+    scaler_X1, scaler_X2 and the number of input features
+    """
+    try:
+        scalers = json.loads(
+            read_file_from_gcs_or_cache(
+                bucket, os.path.join(source["data_folder"], SCALERS_FILE)
+            )
+        )
+        logging.info(f"Loaded scaler statistics from {SCALERS_FILE}")
+        return (
+            scaler_from_dict(scalers["X1"], StandardScaler()),
+            scaler_from_dict(scalers["X2"], StandardScaler()),
+            len(scalers["X1"]["mean"]),
+        )
+    except NotFound:
+        # Read data file
+        data = read_training_data_from_gcs(
+            bucket, os.path.join(source["data_folder"], source["data_file"])
+        )
+        X1 = data["X1"]
+        X2 = data["X2"]
+
+        # Fit scalers in chunks so memory-mapped data is paged in incrementally
+        return (
+            fit_scaler(X1, StandardScaler()),
+            fit_scaler(X2, StandardScaler()),
+            X1.shape[-1],
+        )
+
+
+def load_model(bucket, source, input_size, device):
+    """
+    Returns:
+    the model for INFERENCE_BACKEND, and its version: the model file, the
+    start of its md5, and INT8_VERSION_SUFFIX if it was quantized
+    """
+    logging.info(f"Using inference backend: {INFERENCE_BACKEND}")
+    file_key = {"onnx": "onnx_file", "torchscript": "torchscript_file"}.get(
+        INFERENCE_BACKEND, "weights_file"
+    )
+    file_name = os.path.join(source["data_folder"], source[file_key])
     file_content = read_file_from_gcs_or_cache(bucket, file_name)
-    return pickle.loads(BytesIO(file_content).getvalue())
+    version = f"{file_name}#{hashlib.md5(file_content).hexdigest()[:8]}"
 
+    if INFERENCE_BACKEND == "onnx":
+        model = OnnxModel(file_content)
+    elif INFERENCE_BACKEND == "torchscript":
+        model = TorchScriptModel(file_content)
+    else:
+        weights = torch.load(BytesIO(file_content), map_location=torch.device("cpu"))
+        model = TennisLSTM(input_size, HIDDEN_SIZE, NUM_LAYERS)
+        model.load_state_dict(weights)
+        if QUANTIZE_INT8:
+            model, quantized = load_quantized_model(
+                bucket, model, source["data_folder"]
+            )
+            if quantized:
+                version += INT8_VERSION_SUFFIX
+    return model.to(device), version
 
-logging.info(f"Using GCS bucket: {BUCKET_NAME}")
-logging.info(f"Using GCS credentials: {GOOGLE_APPLICATION_CREDENTIALS}")
 
-if os.environ.get("ENV") != "test":
+def load_serving_state(source=None):
+    """Download and build the scalers and model, timing each startup phase"""
+    source = source or default_source()
+    logging.info(f"Loading from {source}")
+    timer = StartupTimer()
+    with timer.phase("torch_threads"):
+        configure_torch_threads(TORCH_NUM_THREADS, TORCH_INTEROP_THREADS)
+
     # Check if GPU is available
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     logging.info(f"Using device: {device}")
 
-    # Initialize GCS client
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-
-    # Read data file
-    data = read_pkl_file_from_gcs(bucket, os.path.join(DATA_FOLDER, DATA_FILE))
-    X1 = data["X1"]
-    X2 = data["X2"]
-    M1 = data["M1"]
-    M2 = data["M2"]
-
-    # Assuming X1 and X2 are 3D arrays with shape (samples, time_steps, features)
-    samples, time_steps, features = X1.shape
-
-    # Reshape X1 and X2 to 2D
-    X1_reshaped = X1.reshape(-1, features)
-    X2_reshaped = X2.reshape(-1, features)
+    with timer.phase("gcs_client"):
+        bucket = get_bucket()
+    with timer.phase("scalers"):
+        scaler_X1, scaler_X2, input_size = load_scalers(bucket, source)
+    with timer.phase("model"):
+        model, model_version = load_model(bucket, source, input_size, device)
+    with timer.phase("worker"):
+        state = ServingState(
+            model,
+            scaler_X1,
+            scaler_X2,
+            device,
+            source,
+            model_version,
+            timer.seconds,
+        )
 
-    # Initialize scalers
-    scaler_X1 = StandardScaler()
-    scaler_X2 = StandardScaler()
+    logging.info(
+        f"Loaded in {sum(timer.seconds.values()):.2f}s, startup phases: {timer.seconds}"
+    )
+    return state
 
-    # Fit and transform X1 and X2
-    scaler_X1.fit(X1_reshaped)
-    scaler_X2.fit(X2_reshaped)
 
-    # Initialize model
-    input_size = X1.shape[-1]
+logging.info(f"Using GCS bucket: {BUCKET_NAME}")
+logging.info(f"Using GCS credentials: {GOOGLE_APPLICATION_CREDENTIALS}")
 
-    # Load the model weights from GCS
-    weights = read_pt_file_from_gcs(bucket, os.path.join(DATA_FOLDER, WEIGHTS_FILE))
-    model = TennisLSTM(input_size, HIDDEN_SIZE, NUM_LAYERS)
-    model.load_state_dict(weights)
-    model.to(device)
-else:
-    device = torch.device("cpu")
-    # use our mock model
-    model = TennisLSTM(None, HIDDEN_SIZE, NUM_LAYERS)
+# Set by the lifespan background task once loading completes, and replaced
+# as a whole by reloads
+serving_state = None
+loading_error = None
+bucket = None
+reload_lock = threading.Lock()
+reload_status = {"state": "idle", "source": None, "error": None}
 
+if os.environ.get("ENV") == "test":
     # mock scalers to have a function called transform that returns the input
     class MockScaler:
         def transform(self, x):
             return x
 
-    scaler_X1 = MockScaler()
-    scaler_X2 = MockScaler()
+    # use our mock model, ready right away
+    serving_state = ServingState(
+        TennisLSTM(None, HIDDEN_SIZE, NUM_LAYERS),
+        MockScaler(),
+        MockScaler(),
+        torch.device("cpu"),
+        model_version="mock",
+    )
+
+
+def publish_initial_state(state) -> bool:
+    """
+    Serve the state loaded at startup, unless a reload installed a newer one
+    while it loaded; then the startup state is closed instead
+    """
+    global serving_state
+    with reload_lock:
+        if serving_state is None:
+            serving_state = state
+            return True
+    state.close()
+    return False
+
+
+async def load_in_background():
+    global loading_error
+    try:
+        state = await asyncio.to_thread(load_serving_state)
+        # Waits for a running reload, off the event loop
+        if not await asyncio.to_thread(publish_initial_state, state):
+            logging.info("A reload finished first, discarding the startup model")
+    except Exception as e:
+        loading_error = str(e)
+        logging.error(f"Loading the model failed: {loading_error}", exc_info=True)
+
+
+def run_reload(source):
+    global serving_state
+    try:
+        state = load_serving_state(source)
+        # Requests that already hold the old state finish on it
+        old_state, serving_state = serving_state, state
+        reload_status.update(state="idle", error=None)
+        logging.info(f"Now serving model {state.model_version}")
+        if old_state is not None:
+            threading.Timer(RELOAD_GRACE_SECONDS, old_state.close).start()
+    except Exception as e:
+        reload_status.update(state="failed", error=str(e))
+        logging.error(f"Reloading from {source} failed: {e}", exc_info=True)
+    finally:
+        reload_lock.release()
+
+
+def start_reload(source) -> bool:
+    """Build a state from source in a background thread, unless a reload is running"""
+    if not reload_lock.acquire(blocking=False):
+        return False
+    reload_status.update(state="reloading", source=source, error=None)
+    threading.Thread(
+        target=run_reload, args=(source,), name="model-reload", daemon=True
+    ).start()
+    return True
+
+
+def read_manifest():
+    """This service's section of the version manifest, or None if there is none"""
+    try:
+        manifest = json.loads(get_bucket().blob(MANIFEST_FILE).download_as_bytes())
+    except NotFound:
+        return None
+    return manifest.get("probability_model")
+
+
+async def poll_manifest():
+    """
+    Reload whenever the manifest points at different files than are served.
+    If the startup load failed and nothing is served, any manifest is loaded.
+    """
+    while True:
+        await asyncio.sleep(MANIFEST_POLL_SECONDS)
+        state = serving_state
+        if state is None and loading_error is None:
+            # The startup load is still running
+            continue
+        try:
+            manifest = await asyncio.to_thread(read_manifest)
+        except Exception as e:
+            logging.warning(f"Reading {MANIFEST_FILE} failed: {e}")
+            continue
+        if not manifest:
+            continue
+        current = state.source if state is not None else None
+        source = {**(current or default_source()), **manifest}
+        failed_before = (
+            reload_status["state"] == "failed" and reload_status["source"] == source
+        )
+        if source != current and not failed_before and start_reload(source):
+            logging.info(f"{MANIFEST_FILE} changed, reloading from {source}")
+
 
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Load in the background, so uvicorn binds and answers probes right away
+    tasks = []
+    if serving_state is None:
+        tasks.append(asyncio.create_task(load_in_background()))
+    if MANIFEST_POLL_SECONDS > 0:
+        tasks.append(asyncio.create_task(poll_manifest()))
+    yield
+    for task in tasks:
+        task.cancel()
 
-app = fastapi.FastAPI()
+
+app = fastapi.FastAPI(lifespan=lifespan)
 
 
 class PredictionResponse(BaseModel):
@@ -198,7 +509,18 @@ class PredictionRequest(BaseModel):
 
 
 @app.post("/predict", response_model=PredictionResponse)
-def predict(request: PredictionRequest):
+def predict(request: PredictionRequest, response: fastapi.Response):
+    # Requests keep the state they started with
+    state = serving_state
+    if state is None:
+        raise fastapi.HTTPException(
+            status_code=503,
+            detail="Model is still loading",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    device = state.device
+    response.headers["X-Model-Version"] = state.model_version
+    response.headers["X-Data-Version"] = state.data_version
     try:
         logging.info(f"Received prediction request: {request}")
 
@@ -214,20 +536,22 @@ def predict(request: PredictionRequest):
 
         # Scale the inputs and add batch dimension
         X1_scaled = (
-            torch.tensor(scaler_X1.transform(X1.cpu().numpy()), dtype=torch.float32)
+            torch.tensor(
+                state.scaler_X1.transform(X1.cpu().numpy()), dtype=torch.float32
+            )
             .unsqueeze(0)
             .to(device)
         )
         X2_scaled = (
-            torch.tensor(scaler_X2.transform(X2.cpu().numpy()), dtype=torch.float32)
+            torch.tensor(
+                state.scaler_X2.transform(X2.cpu().numpy()), dtype=torch.float32
+            )
             .unsqueeze(0)
             .to(device)
         )
-        # Ensure model is in eval mode
-        model.eval()
-
-        with torch.no_grad():
-            output, _ = model(X1_scaled, X2_scaled, M1, M2)
+        output, _ = state.worker.predict(
+            X1_scaled, X2_scaled, M1, M2, timeout=INFERENCE_TIMEOUT
+        )
 
         logging.info(f"Model output: {output}")
 
@@ -235,6 +559,21 @@ def predict(request: PredictionRequest):
         logging.info(f"Returning prediction: {result}")
 
         return result
+    except WorkerClosed:
+        # This request held a state that a reload has since retired
+        logging.warning("Inference worker was closed, rejecting request")
+        raise fastapi.HTTPException(
+            status_code=503,
+            detail="Model is being replaced, retry later",
+            headers={"Retry-After": "1"},
+        )
+    except (queue.Full, futures.TimeoutError):
+        logging.warning("Inference worker is overloaded, rejecting request")
+        raise fastapi.HTTPException(
+            status_code=503,
+            detail="Model service is overloaded, retry later",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         logging.error(f"Error during prediction: {str(e)}", exc_info=True)
         raise fastapi.HTTPException(
@@ -244,4 +583,74 @@ def predict(request: PredictionRequest):
 
 @app.get("/health")
 def health():
+    """Liveness: the process is up, whether or not the model has loaded"""
     return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness: /predict can serve requests. Also reports what it serves, the
+    same versions /predict puts in its headers.
+    """
+    if serving_state is None:
+        detail = "failed" if loading_error else "loading"
+        return fastapi.responses.JSONResponse(
+            status_code=503,
+            content={"status": detail, "error": loading_error},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    state = serving_state
+    return {
+        "status": "ready",
+        "startup_seconds": state.startup_seconds,
+        "model_version": state.model_version,
+        "data_version": state.data_version,
+    }
+
+
+class ReloadRequest(BaseModel):
+    """Files to reload from; unset fields keep their currently served values"""
+
+    data_folder: Optional[str] = None
+    data_file: Optional[str] = None
+    weights_file: Optional[str] = None
+    torchscript_file: Optional[str] = None
+    onnx_file: Optional[str] = None
+
+
+def check_admin_token(token):
+    if not ADMIN_TOKEN:
+        raise fastapi.HTTPException(
+            status_code=403, detail="Admin endpoints are disabled"
+        )
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise fastapi.HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.post("/admin/reload", status_code=202)
+def admin_reload(
+    request: Optional[ReloadRequest] = None,
+    x_admin_token: Optional[str] = fastapi.Header(None),
+):
+    """Build a new model and scalers in the background, then swap them in"""
+    check_admin_token(x_admin_token)
+    state = serving_state
+    current = state.source if state is not None else default_source()
+    overrides = request.model_dump(exclude_none=True) if request else {}
+    source = {**current, **overrides}
+    if not start_reload(source):
+        raise fastapi.HTTPException(status_code=409, detail="A reload is in progress")
+    return {"status": "reloading", "source": source}
+
+
+@app.get("/admin/version")
+def admin_version(x_admin_token: Optional[str] = fastapi.Header(None)):
+    check_admin_token(x_admin_token)
+    state = serving_state
+    return {
+        "model_version": state.model_version if state else None,
+        "data_version": state.data_version if state else None,
+        "source": state.source if state else None,
+        "reload": reload_status,
+    }
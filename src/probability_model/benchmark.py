@@ -0,0 +1,98 @@
+import argparse
+import copy
+import logging
+import time
+
+import numpy as np
+import torch
+
+from inference import OnnxModel, TorchScriptModel, quantize_dynamic_int8
+from model import TennisLSTM
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Compare inference backend latency")
+    parser.add_argument("--weights", type=str, required=True, help="prob_model.pt")
+    parser.add_argument(
+        "--torchscript", type=str, required=True, help="prob_model.ts export"
+    )
+    parser.add_argument(
+        "--onnx", type=str, required=True, help="prob_model.onnx export"
+    )
+    parser.add_argument("--input-size", type=int, default=30, help="Input features")
+    parser.add_argument("--hidden-size", type=int, default=32, help="LSTM hidden size")
+    parser.add_argument("--num-layers", type=int, default=2, help="LSTM layers")
+    parser.add_argument("--lookback", type=int, default=10, help="Lookback window")
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 32, 256], help="Batch sizes"
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=200, help="Calls per batch size"
+    )
+    return parser.parse_args()
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def time_calls(model, inputs, iterations):
+    """Per-call latencies in milliseconds, after a few warmup calls"""
+    with torch.no_grad():
+        for _ in range(10):
+            model(*inputs)
+        latencies = []
+        for _ in range(iterations):
+            start_time = time.perf_counter()
+            model(*inputs)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    args = parse_args()
+    logging.info(f"Torch threads: {torch.get_num_threads()}")
+
+    eager = TennisLSTM(args.input_size, args.hidden_size, args.num_layers)
+    eager.load_state_dict(torch.load(args.weights, map_location="cpu"))
+    eager.eval()
+    backends = {
+        "eager": eager,
+        "torchscript": TorchScriptModel(read_bytes(args.torchscript)),
+        "onnx": OnnxModel(read_bytes(args.onnx)),
+        "int8": quantize_dynamic_int8(copy.deepcopy(eager)),
+    }
+
+    for batch_size in args.batch_sizes:
+        inputs = (
+            torch.randn(batch_size, args.lookback, args.input_size),
+            torch.randn(batch_size, args.lookback, args.input_size),
+            (torch.rand(batch_size, args.lookback) < 0.2).float(),
+            (torch.rand(batch_size, args.lookback) < 0.2).float(),
+        )
+        with torch.no_grad():
+            expected, _ = eager(*inputs)
+
+        baseline = None
+        for name, model in backends.items():
+            with torch.no_grad():
+                output, _ = model(*inputs)
+            max_diff = (output.reshape(-1) - expected.reshape(-1)).abs().max().item()
+            latencies = time_calls(model, inputs, args.iterations)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            baseline = baseline or p50
+            logging.info(
+                f"batch {batch_size:>4} {name:>11}: p50 {p50:.3f}ms, p99 {p99:.3f}ms, "
+                f"{baseline / p50:.2f}x eager, max diff {max_diff:.1e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import base64
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gcs_cache import GcsCache
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+MB = 1024 * 1024
+# Size of the writes a throttled connection paces
+PACE_BYTES = 64 * 1024
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark single-stream vs concurrent byte-range downloads "
+        "against a local HTTP server that serves ranges like GCS, with per-"
+        "connection bandwidth and first-byte latency"
+    )
+    parser.add_argument("--size-mb", type=int, default=256, help="Object size")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[4, 8, 16], help="Range workers"
+    )
+    parser.add_argument("--chunk-mb", type=int, default=8, help="Range size")
+    parser.add_argument(
+        "--stream-mbps",
+        type=float,
+        default=50,
+        help="Bandwidth of one connection in MB/s (0 for unthrottled)",
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=30, help="Time to first byte"
+    )
+    return parser.parse_args()
+
+
+def make_handler(path, stream_mbps, latency_ms):
+    size = os.path.getsize(path)
+
+    class RangeRequestHandler(BaseHTTPRequestHandler):
+        """Serves path whole or as a single "Range: bytes=start-end" request"""
+
+        def do_GET(self):
+            start, end = 0, size - 1
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), size - 1)
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+
+            time.sleep(latency_ms / 1000)
+            remaining = end - start + 1
+            with open(path, "rb") as f:
+                f.seek(start)
+                began = time.perf_counter()
+                sent = 0
+                while remaining:
+                    data = f.read(min(PACE_BYTES, remaining))
+                    self.wfile.write(data)
+                    sent += len(data)
+                    remaining -= len(data)
+                    if stream_mbps:
+                        ahead = sent / (stream_mbps * MB) - (
+                            time.perf_counter() - began
+                        )
+                        if ahead > 0:
+                            time.sleep(ahead)
+
+        def log_message(self, *args):
+            pass
+
+    return RangeRequestHandler
+
+
+class HttpBlob:
+    """The parts of storage.Blob GcsCache uses, backed by an HTTP URL"""
+
+    def __init__(self, name, url, size, md5_hash):
+        self.name = name
+        self.url = url
+        self.size = size
+        self.md5_hash = md5_hash
+        self.generation = 1
+
+    def download_as_bytes(
+        self, start=None, end=None, checksum="md5", if_generation_match=None
+    ):
+        request = urllib.request.Request(self.url)
+        if start is not None:
+            request.add_header("Range", f"bytes={start}-{'' if end is None else end}")
+        with urllib.request.urlopen(request) as response:
+            return response.read()
+
+    def download_to_filename(self, filename):
+        with urllib.request.urlopen(self.url) as response, open(filename, "wb") as f:
+            shutil.copyfileobj(response, f, 1 * MB)
+
+
+class HttpBucket:
+    def __init__(self, blob):
+        self.name = "http-bucket"
+        self.blob = blob
+
+    def get_blob(self, name):
+        return self.blob
+
+
+def main():
+    args = parse_args()
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, "object.bin")
+        md5 = hashlib.md5()
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                data = os.urandom(MB)
+                md5.update(data)
+                f.write(data)
+
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), make_handler(path, args.stream_mbps, args.latency_ms)
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        blob = HttpBlob(
+            "object.bin",
+            f"http://127.0.0.1:{server.server_port}/object.bin",
+            args.size_mb * MB,
+            base64.b64encode(md5.digest()).decode(),
+        )
+        bucket = HttpBucket(blob)
+        logging.info(
+            f"{args.size_mb} MB object, {args.stream_mbps} MB/s per connection, "
+            f"{args.latency_ms} ms to first byte, {args.chunk_mb} MB ranges"
+        )
+
+        runs = [("single stream", 1)] + [
+            (f"{workers} workers", workers) for workers in args.workers
+        ]
+        for label, workers in runs:
+            for target in ["file", "memory"]:
+                cache_dir = os.path.join(work_dir, "cache")
+                cache = GcsCache(
+                    cache_dir if target == "file" else None,
+                    workers=workers,
+                    chunk_bytes=args.chunk_mb * MB,
+                )
+                start_time = time.perf_counter()
+                if target == "file":
+                    cache.get_path(bucket, blob.name)
+                else:
+                    cache.read_bytes(bucket, blob.name)
+                elapsed = time.perf_counter() - start_time
+                logging.info(
+                    f"{label:>13} to {target:<6}: {elapsed:6.2f}s, "
+                    f"{args.size_mb / elapsed:7.1f} MB/s (md5 checked)"
+                )
+                shutil.rmtree(cache_dir, ignore_errors=True)
+        server.shutdown()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from inference import InferenceWorker, configure_torch_threads
+from model import TennisLSTM
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark torch threads x request concurrency, calling the "
+        "model from every request thread (direct) or through the inference worker"
+    )
+    parser.add_argument("--weights", type=str, help="prob_model.pt (random if unset)")
+    parser.add_argument("--input-size", type=int, default=30, help="Input features")
+    parser.add_argument("--hidden-size", type=int, default=32, help="LSTM hidden size")
+    parser.add_argument("--num-layers", type=int, default=2, help="LSTM layers")
+    parser.add_argument("--lookback", type=int, default=10, help="Lookback window")
+    parser.add_argument(
+        "--threads", type=int, nargs="+", default=[1, 2, 4], help="Intra-op threads"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16],
+        help="Concurrent requests",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=400, help="Requests per configuration"
+    )
+    return parser.parse_args()
+
+
+def run_requests(call, inputs, concurrency, requests):
+    """
+    Send requests from concurrency threads, as uvicorn's threadpool does.
+
+    Returns:
+    requests per second and per-request latencies in milliseconds
+    """
+
+    def request(_):
+        start_time = time.perf_counter()
+        call(*inputs)
+        return (time.perf_counter() - start_time) * 1000
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        # Warm up every thread
+        list(pool.map(request, range(concurrency * 2)))
+        start_time = time.perf_counter()
+        latencies = list(pool.map(request, range(requests)))
+        elapsed = time.perf_counter() - start_time
+    return requests / elapsed, np.array(latencies)
+
+
+def main():
+    args = parse_args()
+    configure_torch_threads(interop_threads=1)
+    logging.info(f"CPU cores: {os.cpu_count()}")
+
+    model = TennisLSTM(args.input_size, args.hidden_size, args.num_layers)
+    if args.weights:
+        model.load_state_dict(torch.load(args.weights, map_location="cpu"))
+    model.eval()
+
+    # One match per request, as the /predict endpoint receives
+    inputs = (
+        torch.randn(1, args.lookback, args.input_size),
+        torch.randn(1, args.lookback, args.input_size),
+        torch.zeros(args.lookback),
+        torch.zeros(args.lookback),
+    )
+
+    def direct(*inputs):
+        with torch.no_grad():
+            return model(*inputs)
+
+    results = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        for concurrency in args.concurrency:
+            worker = InferenceWorker(model, max_queue=concurrency, num_threads=threads)
+            for mode, call in [("direct", direct), ("worker", worker.predict)]:
+                throughput, latencies = run_requests(
+                    call, inputs, concurrency, args.requests
+                )
+                p50, p99 = np.percentile(latencies, [50, 99])
+                results.append((throughput, p99, threads, concurrency, mode))
+                logging.info(
+                    f"threads {threads} concurrency {concurrency:>3} {mode:>6}: "
+                    f"{throughput:7.1f} req/s, p50 {p50:.2f}ms, p99 {p99:.2f}ms"
+                )
+            worker.close()
+
+    for concurrency in args.concurrency:
+        runs = [r for r in results if r[3] == concurrency]
+        fastest = max(runs, key=lambda r: r[0])
+        steadiest = min(runs, key=lambda r: r[1])
+        for label, (throughput, p99, threads, _, mode) in [
+            ("throughput", fastest),
+            ("p99", steadiest),
+        ]:
+            logging.info(
+                f"Best {label} at concurrency {concurrency}: {mode} with "
+                f"{threads} thread(s), {throughput:.1f} req/s, p99 {p99:.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
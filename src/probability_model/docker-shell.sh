@@ -13,8 +13,15 @@ export GOOGLE_APPLICATION_CREDENTIALS=/secrets/data-service-account.json
 export DATA_FOLDER="version1"
 export DATA_FILE="training_data_lookback=10.pkl"
 export WEIGHTS_FILE="prob_model.pt"
+export INFERENCE_BACKEND=${INFERENCE_BACKEND:-"eager"}
+export QUANTIZE_INT8=${QUANTIZE_INT8:-0}
+# e2-medium: 2 vCPUs sharing one physical core, see benchmark_threads.py
+export TORCH_NUM_THREADS=${TORCH_NUM_THREADS:-1}
 export HIDDEN_SIZE=32
 export NUM_LAYERS=2
+# Admin reloads are disabled unless ADMIN_TOKEN is set
+export ADMIN_TOKEN=${ADMIN_TOKEN:-""}
+export MANIFEST_POLL_SECONDS=${MANIFEST_POLL_SECONDS:-0}
 export MODEL_PORT=8001
 
 # Check to see if path to secrets is correct
@@ -43,7 +50,12 @@ docker run --rm -it \
 -e GCS_BUCKET_NAME=$GCS_BUCKET_NAME \
 -e DATA_FOLDER=$DATA_FOLDER \
 -e DATA_FILE=$DATA_FILE \
+-e ADMIN_TOKEN=$ADMIN_TOKEN \
+-e MANIFEST_POLL_SECONDS=$MANIFEST_POLL_SECONDS \
 -e WEIGHTS_FILE=$WEIGHTS_FILE \
+-e INFERENCE_BACKEND=$INFERENCE_BACKEND \
+-e QUANTIZE_INT8=$QUANTIZE_INT8 \
+-e TORCH_NUM_THREADS=$TORCH_NUM_THREADS \
 -e HIDDEN_SIZE=$HIDDEN_SIZE \
 -e NUM_LAYERS=$NUM_LAYERS \
 -e PORT=$MODEL_PORT \
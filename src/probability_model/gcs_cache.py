@@ -0,0 +1,378 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+META_SUFFIX = ".gcsmeta"
+TMP_SUFFIX = ".gcstmp"
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+# Temporary files this old are left over from a crashed download
+STALE_TMP_SECONDS = 3600
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+RANGE_RETRIES = 3
+RANGE_RETRY_SECONDS = 1.0
+
+
+def file_md5(path: str) -> str:
+    """Base64 md5 of a file, in the format of GCS blob.md5_hash"""
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode()
+
+
+def blob_metadata(blob) -> dict:
+    return {"generation": blob.generation, "md5": blob.md5_hash, "size": blob.size}
+
+
+def temporary_path(path: str) -> str:
+    """
+    Unique sibling of path to write before renaming into place. Unique across
+    processes and containers sharing the cache, where pids can collide.
+    """
+    return f"{path}.{uuid.uuid4().hex}{TMP_SUFFIX}"
+
+
+def chunk_ranges(size: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """[start, end) byte ranges of at most chunk_bytes covering size bytes"""
+    return [
+        (start, min(start + chunk_bytes, size)) for start in range(0, size, chunk_bytes)
+    ]
+
+
+def download_ranges(
+    blob,
+    size: int,
+    write: Callable[[int, bytes], None],
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    workers: int = 8,
+    retries: int = RANGE_RETRIES,
+):
+    """
+    Download blob as concurrent byte-range requests on workers threads, and
+    write(offset, data) each range as it arrives.
+
+    A range that fails or comes back short is retried on its own, up to
+    retries times with backoff; ranges already written are kept, so a
+    dropped connection late in a large download only costs one chunk. Every
+    range is pinned to the blob's generation, so an object overwritten
+    mid-download fails with PreconditionFailed instead of mixing versions.
+    """
+
+    def fetch(byte_range):
+        start, end = byte_range
+        # end is inclusive in GCS range requests. Ranged responses carry no
+        # whole-object checksum, the caller checks the md5 of the result.
+        data = blob.download_as_bytes(
+            start=start,
+            end=end - 1,
+            checksum=None,
+            if_generation_match=blob.generation,
+        )
+        if len(data) != end - start:
+            raise IOError(f"got {len(data)} of {end - start} bytes at {start}")
+        write(start, data)
+
+    pending = chunk_ranges(size, chunk_bytes)
+    for attempt in range(retries + 1):
+        with ThreadPoolExecutor(min(workers, len(pending))) as pool:
+            futures = [(pool.submit(fetch, r), r) for r in pending]
+        failed = []
+        for future, byte_range in futures:
+            if future.exception() is not None:
+                failed.append(byte_range)
+                error = future.exception()
+        if not failed:
+            return
+        if attempt == retries or isinstance(error, PreconditionFailed):
+            raise error
+        logging.warning(
+            f"Retrying {len(failed)} of {len(pending)} ranges of {blob.name} "
+            f"after: {error}"
+        )
+        time.sleep(RANGE_RETRY_SECONDS * 2**attempt)
+        pending = failed
+
+
+def write_json_atomic(path: str, content: dict):
+    tmp_path = temporary_path(path)
+    with open(tmp_path, "w") as f:
+        json.dump(content, f)
+    os.replace(tmp_path, path)
+
+
+class GcsCache:
+    """
+    Local disk cache of GCS objects, laid out as root/<bucket>/<object name>.
+
+    A cached file is only used while its sidecar metadata (generation, md5,
+    size) matches the blob's current metadata, so overwritten objects are
+    downloaded again. Downloads go to a temporary file that is checked
+    against the blob's md5 before it is renamed into place, so a crash never
+    leaves a partial file that looks complete.
+
+    When the cache grows past max_bytes, the least recently used files are
+    evicted. With root=None, read_bytes downloads straight into memory and
+    get_path caches under the system temporary directory.
+
+    Blobs larger than chunk_bytes are downloaded as concurrent byte ranges on
+    workers threads, into a preallocated file or buffer, since a single
+    stream is limited to one connection's throughput.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        workers: int = 8,
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    ):
+        self.root = root
+        self.local_root = root or os.path.join(tempfile.gettempdir(), "gcs_cache")
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.chunk_bytes = chunk_bytes
+
+    def use_ranges(self, size) -> bool:
+        return self.workers > 1 and size is not None and size > self.chunk_bytes
+
+    def download_to_file(self, blob, path: str):
+        if not self.use_ranges(blob.size):
+            blob.download_to_filename(path)
+            return
+        with open(path, "wb") as f:
+            f.truncate(blob.size)
+            fd = f.fileno()
+            download_ranges(
+                blob,
+                blob.size,
+                lambda offset, data: os.pwrite(fd, data, offset),
+                self.chunk_bytes,
+                self.workers,
+            )
+
+    def download_to_memory(self, blob) -> Union[bytes, bytearray]:
+        """
+        Contents of blob. Range downloads return the preallocated bytearray
+        itself, since converting it to bytes would hold two copies at once.
+        """
+        if not self.use_ranges(blob.size):
+            return blob.download_as_bytes()
+        buffer = bytearray(blob.size)
+        view = memoryview(buffer)
+
+        def write(offset, data):
+            end = offset + len(data)
+            view[offset:end] = data
+
+        download_ranges(blob, blob.size, write, self.chunk_bytes, self.workers)
+        view.release()
+        return buffer
+
+    def local_path(self, bucket, name: str) -> str:
+        return os.path.join(self.local_root, bucket.name, name)
+
+    def get_blob(self, bucket, name: str):
+        blob = bucket.get_blob(name)
+        if blob is None:
+            raise NotFound(f"gs://{bucket.name}/{name} not found")
+        return blob
+
+    def is_valid(self, path: str, metadata: dict) -> bool:
+        try:
+            with open(f"{path}{META_SUFFIX}") as f:
+                cached = json.load(f)
+            return cached == metadata and os.path.getsize(path) == metadata["size"]
+        except (OSError, ValueError):
+            return False
+
+    def download(self, blob, path: str, metadata: dict):
+        """Download blob to path via a verified temporary file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = temporary_path(path)
+        try:
+            self.download_to_file(blob, tmp_path)
+            if metadata["md5"] and file_md5(tmp_path) != metadata["md5"]:
+                raise ValueError(f"md5 mismatch downloading gs://{blob.name}")
+            # Drop the sidecar first: data without a matching sidecar is a miss
+            if os.path.exists(f"{path}{META_SUFFIX}"):
+                os.remove(f"{path}{META_SUFFIX}")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        write_json_atomic(f"{path}{META_SUFFIX}", metadata)
+
+    def fetch(self, bucket, name: str) -> str:
+        """Download gs://<bucket>/<name> unless the cached copy is up to date"""
+        blob = self.get_blob(bucket, name)
+        metadata = blob_metadata(blob)
+        path = self.local_path(bucket, name)
+        if self.is_valid(path, metadata):
+            logging.info(f"File found in local cache: {path}")
+            # The sidecar's mtime is the last use for LRU eviction
+            os.utime(f"{path}{META_SUFFIX}")
+            return path
+
+        logging.info(f"Downloading gs://{bucket.name}/{name} to {path}")
+        self.download(blob, path, metadata)
+        return path
+
+    def get_paths(self, bucket, names: Iterable[str]) -> List[str]:
+        """
+        Local paths of up-to-date copies of several objects that are read
+        together, such as the files of one dataset. Eviction runs once all of
+        them are in place and never removes any of them, so a multi-file
+        artifact larger than max_bytes is still complete on disk.
+        """
+        paths = [self.fetch(bucket, name) for name in names]
+        self.evict(keep=paths)
+        return paths
+
+    def get_path(self, bucket, name: str) -> str:
+        """Local path of an up-to-date copy of gs://<bucket>/<name>"""
+        return self.get_paths(bucket, [name])[0]
+
+    def read_bytes(self, bucket, name: str) -> Union[bytes, bytearray]:
+        """Contents of gs://<bucket>/<name>, a bytearray if downloaded in ranges"""
+        if self.root is None:
+            blob = self.get_blob(bucket, name)
+            content = self.download_to_memory(blob)
+            md5 = base64.b64encode(hashlib.md5(content).digest()).decode()
+            if blob.md5_hash and md5 != blob.md5_hash:
+                raise ValueError(f"md5 mismatch downloading gs://{bucket.name}/{name}")
+            return content
+        with open(self.get_path(bucket, name), "rb") as f:
+            return f.read()
+
+    def entries(self):
+        """
+        (last use, size, path) of every cached file. Other files under the
+        cache root, such as the trainer's split cache, are left alone.
+        """
+        entries = []
+        for directory, _, files in os.walk(self.local_root):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                if file_name.endswith(TMP_SUFFIX):
+                    if time.time() - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                        os.remove(path)
+                    continue
+                meta_path = f"{path}{META_SUFFIX}"
+                if file_name.endswith(META_SUFFIX) or not os.path.exists(meta_path):
+                    continue
+                entries.append(
+                    (os.path.getmtime(meta_path), os.path.getsize(path), path)
+                )
+        return entries
+
+    def evict(self, keep: Iterable[str] = ()):
+        """
+        Remove least recently used files until the cache fits in max_bytes,
+        except the paths in keep
+        """
+        if self.max_bytes is None:
+            return
+        keep = set(keep)
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            logging.info(f"Evicting {path} from the local cache")
+            if os.path.exists(f"{path}{META_SUFFIX}"):
+                os.remove(f"{path}{META_SUFFIX}")
+            os.remove(path)
+            total -= size
+
+
+class LocalBlob:
+    """Filesystem-backed stand-in for storage.Blob"""
+
+    def __init__(self, bucket, name: str):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.root, name)
+        self.generation = None
+        self.md5_hash = None
+        self.size = None
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def check_exists(self):
+        if not self.exists():
+            raise NotFound(f"gs://{self.bucket.name}/{self.name} not found")
+
+    def reload(self):
+        self.check_exists()
+        self.generation = os.stat(self.path).st_mtime_ns
+        self.md5_hash = file_md5(self.path)
+        self.size = os.path.getsize(self.path)
+
+    def download_to_filename(self, filename: str):
+        self.check_exists()
+        shutil.copyfile(self.path, filename)
+
+    def download_as_bytes(
+        self, start=None, end=None, checksum="md5", if_generation_match=None
+    ) -> bytes:
+        """Whole object, or bytes start to end inclusive as in GCS"""
+        self.check_exists()
+        generation = os.stat(self.path).st_mtime_ns
+        if if_generation_match is not None and generation != if_generation_match:
+            raise PreconditionFailed(f"gs://{self.bucket.name}/{self.name} changed")
+        with open(self.path, "rb") as f:
+            if start is None:
+                return f.read()
+            f.seek(start)
+            return f.read(-1 if end is None else end - start + 1)
+
+    def download_as_text(self) -> str:
+        return self.download_as_bytes().decode()
+
+    def upload_from_string(self, data, content_type=None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode()
+        tmp_path = temporary_path(self.path)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def upload_from_file(self, file_obj, content_type=None):
+        self.upload_from_string(file_obj.read(), content_type)
+
+
+class LocalBucket:
+    """
+    Filesystem-backed stand-in for storage.Bucket, for tests and offline runs:
+    objects are files under root. Generations change whenever a file is
+    rewritten, as they do in GCS.
+    """
+
+    def __init__(self, root: str, name: str = "local-bucket"):
+        self.root = root
+        self.name = name
+
+    def blob(self, name: str) -> LocalBlob:
+        return LocalBlob(self, name)
+
+    def get_blob(self, name: str) -> Optional[LocalBlob]:
+        blob = self.blob(name)
+        if not blob.exists():
+            return None
+        blob.reload()
+        return blob
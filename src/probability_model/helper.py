@@ -0,0 +1,73 @@
+# Matchup features as the API computes them (api/external/helper.py), so
+# precomputed probabilities match live ones
+import pandas as pd
+
+
+def calculate_percentage_difference(val1, val2):
+    if val2 == 0:
+        return 3  # To avoid division by zero, we just give an outsized 300% to val1
+    return (val1 - val2) / val2
+
+
+def player_id(history: pd.DataFrame) -> int:
+    """The id of the player whose history this is"""
+    match = history.iloc[0]
+    return match["winner_id"] if match["is_winner"] == 1 else match["loser_id"]
+
+
+def create_matchup_data(
+    p1_history: pd.DataFrame,
+    p2_history: pd.DataFrame,
+    feature_cols: list[str],
+):
+    p1_features, p2_features = [], []
+    p1_opponents, p2_opponents = [], []
+
+    for df, features, opponents in [
+        (p1_history, p1_features, p1_opponents),
+        (p2_history, p2_features, p2_opponents),
+    ]:
+        for i, matchup in df.iterrows():
+            if i == 0:
+                continue
+
+            # Store opponent ID for this match
+            opponents.append(matchup["opponent_id"])
+
+            # Extract match features
+            match_features = [
+                1 if matchup["is_winner"] == 1 else 0,  # player_is_winner
+                (
+                    df.iloc[i]["tourney_date"] - df.iloc[i - 1]["tourney_date"]
+                ).days,  # time_since_last_match
+                matchup["draw_size"],  # draw_size
+                1 if matchup["surface"] == "clay" else 0,  # surface_clay
+                1 if matchup["surface"] == "grass" else 0,  # surface_grass
+                1 if matchup["surface"] == "hard" else 0,  # surface_hard
+            ]
+
+            # Add player stats and differences
+            for col in feature_cols:
+                if col.startswith("w_"):
+                    player_val = (
+                        matchup[col]
+                        if matchup["is_winner"] == 1
+                        else matchup[col.replace("w_", "l_")]
+                    )
+                    opponent_val = (
+                        matchup[col.replace("w_", "l_")]
+                        if matchup["is_winner"] == 1
+                        else matchup[col]
+                    )
+                    diff = calculate_percentage_difference(player_val, opponent_val)
+                    match_features.extend(
+                        [player_val, diff]
+                    )  # Include raw value and difference
+            features.append(match_features)
+
+    # Create opponent masks - mark matches where players played each other
+    p1_id, p2_id = player_id(p1_history), player_id(p2_history)
+    p1_mask = [1 if opp == p2_id else 0 for opp in p1_opponents]
+    p2_mask = [1 if opp == p1_id else 0 for opp in p2_opponents]
+
+    return p1_features, p2_features, p1_mask, p2_mask
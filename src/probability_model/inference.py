@@ -0,0 +1,216 @@
+import logging
+import queue
+import threading
+from concurrent import futures
+from io import BytesIO
+
+import torch
+from torch import nn
+
+# Input names used by the trainer's ONNX export (trainer/export.py)
+ONNX_INPUT_NAMES = ["x1", "x2", "opponent_mask1", "opponent_mask2"]
+# Appended to the model version of a dynamic int8 model, so outputs of the
+# fp32 and int8 models of one weights file are never mixed up
+INT8_VERSION_SUFFIX = "+int8"
+
+
+def batch_masks(x1, opponent_mask1, opponent_mask2):
+    """Give opponent masks the (batch, seq_len) shape of x1, as exports expect"""
+    return (
+        opponent_mask1.reshape(x1.shape[:2]),
+        opponent_mask2.reshape(x1.shape[:2]),
+    )
+
+
+def configure_torch_threads(num_threads=0, interop_threads=0):
+    """
+    Set torch's intra-op (per-operator) and inter-op thread pools; 0 keeps the
+    default. The inter-op pool can only be sized before torch first uses it.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            logging.warning(f"Could not set inter-op threads: {e}")
+    logging.info(
+        f"Torch threads: intra-op {torch.get_num_threads()}, "
+        f"inter-op {torch.get_num_interop_threads()}"
+    )
+
+
+class WorkerClosed(RuntimeError):
+    """A request reached an InferenceWorker that was closed, e.g. by a reload"""
+
+
+class InferenceWorker:
+    """
+    Run every model call on a single thread that owns the model, behind a
+    bounded request queue.
+
+    Request handler threads only enqueue inputs and wait on a Future, so
+    concurrent requests take turns on the intra-op thread pool instead of
+    each running their own and oversubscribing the CPU cores. submit raises
+    queue.Full once max_queue requests are waiting, and WorkerClosed once the
+    worker is closed.
+    """
+
+    def __init__(self, model, max_queue=64, num_threads=0):
+        self.model = model
+        self.num_threads = num_threads
+        self.requests = queue.Queue(maxsize=max_queue)
+        self.closed = False
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(
+            target=self._run, name="inference-worker", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, *inputs) -> futures.Future:
+        future = futures.Future()
+        with self.lock:
+            if self.closed:
+                raise WorkerClosed("Inference worker is closed")
+            self.requests.put_nowait((inputs, future))
+        return future
+
+    def predict(self, *inputs, timeout=None):
+        """Model output for inputs, waiting up to timeout seconds for the worker"""
+        future = self.submit(*inputs)
+        try:
+            return future.result(timeout)
+        except futures.TimeoutError:
+            # Still queued requests are skipped by the worker
+            future.cancel()
+            raise
+
+    def close(self):
+        """
+        Stop the worker after the request it is running. Requests still queued
+        fail with WorkerClosed, so their callers can retry elsewhere.
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        # Nothing is enqueued once closed, so draining makes room for the
+        # sentinel without blocking
+        while True:
+            try:
+                _, future = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(WorkerClosed("Inference worker is closed"))
+        self.requests.put_nowait(None)
+        self.thread.join()
+
+    def _run(self):
+        # OpenMP thread counts are per calling thread, so set them here too
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            inputs, future = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with torch.no_grad():
+                    future.set_result(self.model(*inputs))
+            except Exception as e:
+                future.set_exception(e)
+
+
+def quantize_dynamic_int8(model):
+    """
+    Dynamic int8 quantization of a TennisLSTM's LSTM and Linear layers:
+    int8 weights, activations quantized on the fly. CPU only.
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model.cpu().eval(), {nn.LSTM, nn.Linear}, dtype=torch.qint8
+    )
+
+
+def check_quantization_report(report, max_auc_drop, max_f1_drop):
+    """
+    Reasons int8 should not be served, from the held-out fp32 vs int8 metrics
+    the trainer saves as prob_model_quantization.json. Empty if int8 is safe.
+    A metric that was undefined on the held-out data (None, e.g. the AUC of a
+    single-class split) leaves int8 accuracy unknown, so int8 is refused.
+    """
+    reasons = []
+    for metric, max_drop in [("auc", max_auc_drop), ("f1", max_f1_drop)]:
+        if report["fp32"][metric] is None or report["int8"][metric] is None:
+            reasons.append(f"{metric} is undefined on the held-out data")
+            continue
+        drop = report["fp32"][metric] - report["int8"][metric]
+        if drop > max_drop:
+            reasons.append(
+                f"{metric} drops by {drop:.4f} "
+                f"({report['fp32'][metric]:.4f} -> {report['int8'][metric]:.4f}), "
+                f"more than {max_drop}"
+            )
+    return reasons
+
+
+class TorchScriptModel:
+    """
+    Runs the trainer's TorchScript export (BatchNorm folded, dropout removed)
+    with the same call signature as TennisLSTM.
+    """
+
+    def __init__(self, file_content: bytes):
+        self.module = torch.jit.load(BytesIO(file_content), map_location="cpu")
+        self.module.eval()
+
+    def to(self, device):
+        self.module.to(device)
+        return self
+
+    def eval(self):
+        return self
+
+    def __call__(self, x1, x2, opponent_mask1, opponent_mask2):
+        opponent_mask1, opponent_mask2 = batch_masks(x1, opponent_mask1, opponent_mask2)
+        return self.module(x1, x2, opponent_mask1, opponent_mask2), None
+
+
+class OnnxModel:
+    """
+    Runs the trainer's ONNX export with ONNX Runtime on the CPU, with the same
+    call signature as TennisLSTM.
+    """
+
+    def __init__(self, file_content: bytes, threads: int = 0):
+        import onnxruntime
+
+        # ONNX Runtime only takes bytes, GcsCache may return a bytearray
+        file_content = bytes(file_content)
+        options = onnxruntime.SessionOptions()
+        # 0 lets ONNX Runtime pick the number of threads
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            file_content, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def to(self, device):
+        # ONNX Runtime's CPU provider ignores the torch device
+        return self
+
+    def eval(self):
+        return self
+
+    def __call__(self, x1, x2, opponent_mask1, opponent_mask2):
+        opponent_mask1, opponent_mask2 = batch_masks(x1, opponent_mask1, opponent_mask2)
+        inputs = [x1, x2, opponent_mask1, opponent_mask2]
+        (output,) = self.session.run(
+            None,
+            {
+                name: tensor.detach().cpu().numpy()
+                for name, tensor in zip(ONNX_INPUT_NAMES, inputs)
+            },
+        )
+        return torch.from_numpy(output), None
@@ -1,5 +1,7 @@
 import os
 
+import numpy as np
+
 if os.environ.get("ENV") != "test":
     import torch
     import torch.nn as nn
@@ -49,6 +51,44 @@ def scale_data(X1, X2, scaler_X1, scaler_X2):
     return X1_scaled, X2_scaled
 
 
+def fit_scaler(X, scaler, chunk_rows=65536):
+    """
+    Fit a scaler on the per-timestep features of X in chunks of rows.
+
+    Args:
+    X (np.array): Array of shape (samples, time_steps, features), may be memory-mapped
+    scaler (StandardScaler): Scaler to fit
+    chunk_rows (int): Number of (sample, time_step) rows per partial_fit call
+
+    Returns:
+    scaler (StandardScaler): The fitted scaler
+    """
+    X_reshaped = X.reshape(-1, X.shape[-1])
+    for start in range(0, len(X_reshaped), chunk_rows):
+        end = min(start + chunk_rows, len(X_reshaped))
+        scaler.partial_fit(X_reshaped[start:end])
+    return scaler
+
+
+def scaler_from_dict(stats, scaler):
+    """
+    Restore scaler statistics saved by the trainer (prob_model_scalers.json).
+
+    Args:
+    stats (dict): mean, var, scale and n_samples_seen of a fitted StandardScaler
+    scaler (StandardScaler): Scaler to restore into
+
+    Returns:
+    scaler (StandardScaler): The fitted scaler
+    """
+    scaler.mean_ = np.array(stats["mean"])
+    scaler.var_ = np.array(stats["var"])
+    scaler.scale_ = np.array(stats["scale"])
+    scaler.n_samples_seen_ = stats["n_samples_seen"]
+    scaler.n_features_in_ = len(stats["mean"])
+    return scaler
+
+
 class TennisLSTM(nn.Module):
     def __init__(self, input_size, hidden_size, num_layers):
         super(TennisLSTM, self).__init__()
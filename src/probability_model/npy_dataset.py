@@ -0,0 +1,35 @@
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+SCHEMA_FILE = "schema.json"
+ARRAY_NAMES = ["X1", "X2", "M1", "M2", "y"]
+
+
+def load_npy_dataset(
+    directory: str, mmap_mode: Optional[str] = "r"
+) -> Dict[str, np.ndarray]:
+    """
+    Open a dataset written by preprocessing_for_training_data. Arrays are
+    memory-mapped by default so pages are only read when they are used.
+    """
+    with open(os.path.join(directory, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    if schema["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported dataset format version: {schema['format_version']}"
+        )
+
+    data = {}
+    for name, spec in schema["arrays"].items():
+        array = np.load(os.path.join(directory, spec["file"]), mmap_mode=mmap_mode)
+        if array.dtype.str != spec["dtype"] or list(array.shape) != spec["shape"]:
+            raise ValueError(
+                f"{name} does not match schema: got {array.dtype.str} {array.shape}, "
+                f"expected {spec['dtype']} {tuple(spec['shape'])}"
+            )
+        data[name] = array
+    return data
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+SCHEMA_FILE = "pair_matrix.json"
+
+
+def save_pair_matrix(
+    matrix: np.ndarray, players: List[int], directory: str, metadata: dict
+) -> dict:
+    """
+    Write an all-pairs probability matrix as a float32 .npy file plus a JSON
+    schema. players are integer player ids, and matrix[i, j] is the
+    probability that players[i] beats players[j]. metadata must name the
+    lookback and the data and model versions the matrix was computed with;
+    readers ignore a matrix whose versions differ from what they serve.
+
+    The matrix file is named after its content, so a reader that still has
+    the previous schema never pairs it with the new matrix. The schema is
+    written last and marks the matrix as complete.
+
+    Returns:
+    the schema
+    """
+    if matrix.shape != (len(players), len(players)):
+        raise ValueError(f"{matrix.shape} matrix for {len(players)} players")
+    os.makedirs(directory, exist_ok=True)
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    matrix_file = f"pairs_{hashlib.md5(matrix.tobytes()).hexdigest()[:12]}.npy"
+    np.save(os.path.join(directory, matrix_file), matrix)
+
+    schema = {
+        **metadata,
+        "format_version": FORMAT_VERSION,
+        "matrix_file": matrix_file,
+        "players": [int(player) for player in players],
+    }
+    with open(os.path.join(directory, SCHEMA_FILE), "w") as f:
+        json.dump(schema, f)
+    return schema
+
+
+class PairMatrix:
+    """
+    Precomputed win probabilities for every pair of a fixed set of players,
+    keyed by player id, memory-mapped from a directory written by
+    save_pair_matrix
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, SCHEMA_FILE)) as f:
+            schema = json.load(f)
+        if schema["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported pair matrix format version: {schema['format_version']}"
+            )
+        self.lookback = schema["lookback"]
+        self.data_version = schema["data_version"]
+        self.model_version = schema["model_version"]
+        self.players = {player: i for i, player in enumerate(schema["players"])}
+        self.matrix = np.load(
+            os.path.join(directory, schema["matrix_file"]), mmap_mode="r"
+        )
+        if self.matrix.shape != (len(self.players), len(self.players)):
+            raise ValueError(
+                f"{schema['matrix_file']} is {self.matrix.shape} for "
+                f"{len(self.players)} players"
+            )
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def get(
+        self,
+        player_a: int,
+        player_b: int,
+        lookback: int,
+        data_version: str,
+        model_version: Optional[str],
+    ) -> Optional[float]:
+        """
+        Probability that player id player_a beats player_b, or None unless
+        both are in the matrix and it was computed with this lookback and
+        these versions
+        """
+        if (
+            lookback != self.lookback
+            or data_version != self.data_version
+            or model_version != self.model_version
+        ):
+            return None
+        i, j = self.players.get(player_a), self.players.get(player_b)
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
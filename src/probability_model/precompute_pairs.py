@@ -0,0 +1,364 @@
+"""
+Batch job: score every pair of the top-N active players in batched forward
+passes, and write the N x N probability matrix the API serves those pairs
+from. Run from this directory with the model service's environment:
+
+    python precompute_pairs.py --top-n 500
+
+Players are those who played in the ACTIVE_DAYS before the latest match in
+the data, ranked by the ATP rank of their latest match, plus any --players.
+Each player's lookback window is built once, as the API builds it; only the
+opponent masks depend on the pair. Players are their integer ids, sorted,
+and matrix[i, j] is scored with players[i] as player A, for the player with
+the smaller id of each pair like the API's /predict, and matrix[j, i] is its
+complement.
+
+The matrix is written to DATA_FOLDER/PAIR_MATRIX_DIR in the bucket with the
+data and model versions it was computed from. The API picks it up when it
+(re)loads its player data and only serves from it while both versions match
+what it serves, so rerun this job after every data or model release.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import torch
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from sklearn.preprocessing import StandardScaler
+
+from gcs_cache import GcsCache, LocalBucket
+from helper import create_matchup_data
+from inference import (
+    INT8_VERSION_SUFFIX,
+    OnnxModel,
+    TorchScriptModel,
+    check_quantization_report,
+    quantize_dynamic_int8,
+)
+from model import TennisLSTM, scaler_from_dict
+from pair_matrix import SCHEMA_FILE, save_pair_matrix
+from player_snapshot import PlayerSnapshot, save_player_snapshot, snapshot_files
+from player_snapshot import FORMAT_VERSION as SNAPSHOT_FORMAT_VERSION
+from player_snapshot import SCHEMA_FILE as SNAPSHOT_SCHEMA_FILE
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "msmballstars-data")
+DATA_FOLDER = os.environ.get("DATA_FOLDER", "version1")
+# The matches CSV the API serves, not the model service's training data
+MATCHES_FILE = os.environ.get("MATCHES_FILE", "combined_atp_matches.csv")
+WEIGHTS_FILE = os.environ.get("WEIGHTS_FILE", "prob_model.pt")
+SCALERS_FILE = os.environ.get("SCALERS_FILE", "prob_model_scalers.json")
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "eager")
+TORCHSCRIPT_FILE = os.environ.get("TORCHSCRIPT_FILE", "prob_model.ts")
+ONNX_FILE = os.environ.get("ONNX_FILE", "prob_model.onnx")
+# The model service's int8 settings, so the matrix comes from the model it serves
+QUANTIZE_INT8 = os.environ.get("QUANTIZE_INT8", "0") == "1"
+QUANTIZATION_FILE = os.environ.get("QUANTIZATION_FILE", "prob_model_quantization.json")
+QUANTIZATION_MAX_AUC_DROP = float(os.environ.get("QUANTIZATION_MAX_AUC_DROP", "0.005"))
+QUANTIZATION_MAX_F1_DROP = float(os.environ.get("QUANTIZATION_MAX_F1_DROP", "0.01"))
+HIDDEN_SIZE = int(os.environ.get("HIDDEN_SIZE", "256"))
+NUM_LAYERS = int(os.environ.get("NUM_LAYERS", "2"))
+PAIR_MATRIX_DIR = os.environ.get("PAIR_MATRIX_DIR", "pair_matrix")
+SNAPSHOT_SUFFIX = ".snapshot"
+GCS_CACHE = os.environ.get("GCS_CACHE")
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Precompute win probabilities for every pair of top players"
+    )
+    parser.add_argument("--top-n", type=int, default=500, help="Players to score")
+    parser.add_argument("--lookback", type=int, default=10, help="Lookback window")
+    parser.add_argument(
+        "--active-days",
+        type=int,
+        default=365,
+        help="Only players with a match this many days before the latest one",
+    )
+    parser.add_argument(
+        "--players",
+        nargs="*",
+        type=int,
+        default=[],
+        help="Player ids to include besides the top N",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=4096, help="Pairs per forward pass"
+    )
+    parser.add_argument(
+        "--local-bucket",
+        type=str,
+        default=None,
+        help="Read and write a directory laid out like the bucket instead of GCS",
+    )
+    return parser.parse_args()
+
+
+def load_player_dfs(bucket, cache, data_folder, data_file):
+    """
+    The API's per-player match histories: the player snapshot preprocessing
+    wrote next to data_file, or one built here from the CSV if there is none
+    in this format
+    """
+    prefix = os.path.join(
+        data_folder, f"{os.path.splitext(data_file)[0]}{SNAPSHOT_SUFFIX}"
+    )
+    try:
+        schema_path = cache.get_path(bucket, f"{prefix}/{SNAPSHOT_SCHEMA_FILE}")
+        with open(schema_path) as f:
+            schema = json.load(f)
+        if schema.get("format_version") == SNAPSHOT_FORMAT_VERSION:
+            names = [SNAPSHOT_SCHEMA_FILE] + snapshot_files(schema)
+            cache.get_paths(bucket, [f"{prefix}/{name}" for name in names])
+            return PlayerSnapshot(os.path.dirname(schema_path))
+        logging.info(f"Player snapshot at {prefix} is in an older format")
+    except NotFound:
+        logging.info(f"No player snapshot at {prefix}")
+    logging.info(f"Reading {data_file}")
+
+    df = pd.read_csv(
+        BytesIO(cache.read_bytes(bucket, os.path.join(data_folder, data_file)))
+    )
+    df["tourney_date"] = pd.to_datetime(df["tourney_date"], format="mixed")
+    directory = tempfile.mkdtemp()
+    save_player_snapshot(df, directory)
+    return PlayerSnapshot(directory)
+
+
+def select_players(player_dfs, top_n, lookback, active_days, extra_players=()):
+    """
+    Ids, sorted, of the top_n best ranked players whose latest match is at
+    most active_days before the latest match of anyone, plus extra_players.
+    Players with fewer than lookback + 1 matches have no full window to score
+    and are left out.
+    """
+    latest = []
+    for player in player_dfs:
+        history = player_dfs[player]
+        if len(history) < lookback + 1:
+            continue
+        match = history.iloc[-1]
+        rank_col = "w_rank" if match["is_winner"] == 1 else "l_rank"
+        latest.append((player, match["tourney_date"], match.get(rank_col, np.nan)))
+    latest = pd.DataFrame(latest, columns=["player", "date", "rank"])
+
+    active = latest[
+        latest["date"] >= latest["date"].max() - pd.Timedelta(days=active_days)
+    ]
+    # Unranked players go last
+    top = active.sort_values(["rank", "player"], na_position="last").head(top_n)
+    players = set(top["player"])
+    missing = [p for p in extra_players if p not in set(latest["player"])]
+    if missing:
+        logging.warning(f"Not enough matches to score: {missing}")
+    players.update(p for p in extra_players if p not in missing)
+    return sorted(int(player) for player in players)
+
+
+def player_windows(player_dfs, players, feature_cols, lookback):
+    """
+    Each player's features for their last lookback matches, built with the
+    API's create_matchup_data, and the index in players of the opponent of
+    each of those matches (-1 for opponents not in players)
+
+    Returns:
+    features (players, lookback, features) and opponents (players, lookback)
+    """
+    index = {player: i for i, player in enumerate(players)}
+    features, opponents = [], []
+    for player in players:
+        history = player_dfs[player].tail(lookback + 1).reset_index()
+        player_features, _, _, _ = create_matchup_data(history, history, feature_cols)
+        features.append(player_features)
+        opponents.append(
+            [index.get(opponent, -1) for opponent in history["opponent_id"].iloc[1:]]
+        )
+    return np.array(features, dtype=np.float64), np.array(opponents, dtype=np.int64)
+
+
+def scale_windows(features, scaler):
+    players, lookback, size = features.shape
+    scaled = scaler.transform(features.reshape(-1, size))
+    return np.asarray(scaled, dtype=np.float32).reshape(players, lookback, size)
+
+
+def upper_pairs(n, batch_size):
+    """(i, j) index arrays of every pair i < j, batch_size pairs at a time"""
+    rows, cols = np.triu_indices(n, k=1)
+    for start in range(0, len(rows), batch_size):
+        end = start + batch_size
+        yield rows[start:end], cols[start:end]
+
+
+def compute_pair_matrix(model, x1, x2, opponents, batch_size):
+    """
+    Score every pair in batched forward passes.
+
+    x1 and x2 are every player's window scaled as player A and as player B,
+    and opponents the player index of each window match's opponent.
+    matrix[i, j] for i < j is the model's probability that player i beats
+    player j, matrix[j, i] its complement, and the diagonal 0.5 as the API
+    answers for a player against themselves.
+    """
+    n = len(x1)
+    matrix = np.full((n, n), 0.5, dtype=np.float32)
+    with torch.no_grad():
+        for rows, cols in upper_pairs(n, batch_size):
+            # Opponent masks: the matches each player played against the other
+            mask1 = (opponents[rows] == cols[:, None]).astype(np.float32)
+            mask2 = (opponents[cols] == rows[:, None]).astype(np.float32)
+            output, _ = model(
+                torch.from_numpy(x1[rows]),
+                torch.from_numpy(x2[cols]),
+                torch.from_numpy(mask1),
+                torch.from_numpy(mask2),
+            )
+            probabilities = output.reshape(-1).numpy()
+            matrix[rows, cols] = probabilities
+            matrix[cols, rows] = 1 - probabilities
+    return matrix
+
+
+def load_scalers(bucket, cache, data_folder):
+    scalers = json.loads(
+        cache.read_bytes(bucket, os.path.join(data_folder, SCALERS_FILE))
+    )
+    return (
+        scaler_from_dict(scalers["X1"], StandardScaler()),
+        scaler_from_dict(scalers["X2"], StandardScaler()),
+        len(scalers["X1"]["mean"]),
+    )
+
+
+def load_quantized_model(bucket, cache, model, data_folder):
+    """
+    Quantize the eager model to int8 exactly when the model service would
+    (app.load_quantized_model)
+
+    Returns:
+    the model, and whether it was quantized
+    """
+    try:
+        report = json.loads(
+            cache.read_bytes(bucket, os.path.join(data_folder, QUANTIZATION_FILE))
+        )
+    except NotFound:
+        logging.warning(f"No {QUANTIZATION_FILE}, scoring with the fp32 model")
+        return model, False
+    reasons = check_quantization_report(
+        report, QUANTIZATION_MAX_AUC_DROP, QUANTIZATION_MAX_F1_DROP
+    )
+    if reasons:
+        logging.warning(f"int8 is not served, scoring fp32: {'; '.join(reasons)}")
+        return model, False
+    logging.info("Scoring with the dynamic int8 quantized model")
+    return quantize_dynamic_int8(model), True
+
+
+def load_model(bucket, cache, data_folder, input_size):
+    """
+    The model for INFERENCE_BACKEND, quantized if QUANTIZE_INT8 is set and the
+    model service would serve int8, and its version in the format the model
+    service reports (app.load_model), which the API matches against
+    """
+    file_name = {"onnx": ONNX_FILE, "torchscript": TORCHSCRIPT_FILE}.get(
+        INFERENCE_BACKEND, WEIGHTS_FILE
+    )
+    file_name = os.path.join(data_folder, file_name)
+    file_content = cache.read_bytes(bucket, file_name)
+    version = f"{file_name}#{hashlib.md5(file_content).hexdigest()[:8]}"
+
+    if INFERENCE_BACKEND == "onnx":
+        model = OnnxModel(file_content)
+    elif INFERENCE_BACKEND == "torchscript":
+        model = TorchScriptModel(file_content)
+    else:
+        weights = torch.load(BytesIO(file_content), map_location=torch.device("cpu"))
+        model = TennisLSTM(input_size, HIDDEN_SIZE, NUM_LAYERS)
+        model.load_state_dict(weights)
+        if QUANTIZE_INT8:
+            model, quantized = load_quantized_model(bucket, cache, model, data_folder)
+            if quantized:
+                version += INT8_VERSION_SUFFIX
+    model.eval()
+    return model, version
+
+
+def upload_pair_matrix(bucket, directory, prefix, schema):
+    """Upload the matrix, then the schema that makes it visible to the API"""
+    for name in [schema["matrix_file"], SCHEMA_FILE]:
+        with open(os.path.join(directory, name), "rb") as f:
+            bucket.blob(f"{prefix}/{name}").upload_from_file(f)
+
+
+def main():
+    args = parse_args()
+    if args.local_bucket:
+        bucket = LocalBucket(args.local_bucket, BUCKET_NAME)
+    else:
+        bucket = storage.Client().bucket(BUCKET_NAME)
+    cache = GcsCache(GCS_CACHE)
+    start_time = time.perf_counter()
+
+    player_dfs = load_player_dfs(bucket, cache, DATA_FOLDER, MATCHES_FILE)
+    players = select_players(
+        player_dfs, args.top_n, args.lookback, args.active_days, args.players
+    )
+    logging.info(f"Scoring {len(players)} of {len(player_dfs)} players")
+    features, opponents = player_windows(
+        player_dfs, players, player_dfs.feature_cols, args.lookback
+    )
+
+    scaler_X1, scaler_X2, input_size = load_scalers(bucket, cache, DATA_FOLDER)
+    model, model_version = load_model(bucket, cache, DATA_FOLDER, input_size)
+    load_seconds = time.perf_counter() - start_time
+
+    inference_start = time.perf_counter()
+    matrix = compute_pair_matrix(
+        model,
+        scale_windows(features, scaler_X1),
+        scale_windows(features, scaler_X2),
+        opponents,
+        args.batch_size,
+    )
+    inference_seconds = time.perf_counter() - inference_start
+    pairs = len(players) * (len(players) - 1) // 2
+
+    metadata = {
+        "lookback": args.lookback,
+        "data_version": f"{DATA_FOLDER}/{MATCHES_FILE}",
+        "model_version": model_version,
+        "pairs": pairs,
+        "inference_seconds": round(inference_seconds, 3),
+    }
+    prefix = os.path.join(DATA_FOLDER, PAIR_MATRIX_DIR)
+    with tempfile.TemporaryDirectory() as directory:
+        schema = save_pair_matrix(matrix, players, directory, metadata)
+        upload_pair_matrix(bucket, directory, prefix, schema)
+
+    logging.info(
+        f"{len(players)}x{len(players)} matrix ({matrix.nbytes / 1024 / 1024:.1f} MB "
+        f"float32) of {pairs} pairs for {model_version} written to {prefix}"
+    )
+    logging.info(
+        f"Runtime {time.perf_counter() - start_time:.1f}s: loading {load_seconds:.1f}s, "
+        f"inference {inference_seconds:.1f}s ({pairs / inference_seconds:.0f} pairs/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
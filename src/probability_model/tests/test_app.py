@@ -1,5 +1,12 @@
-import sys
+import io
+import json
 import os
+import pickle
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pytest
 
 # Add the parent directory to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -11,3 +18,141 @@ def test_import_app():
     from probability_model import app  # Use absolute import
 
     assert app is not None
+
+
+def local_bucket(root, files):
+    """LocalBucket holding files, a dict of object name to content"""
+    from gcs_cache import LocalBucket
+
+    bucket = LocalBucket(str(root))
+    for name, content in files.items():
+        bucket.blob(name).upload_from_string(content)
+    return bucket
+
+
+def scaler_stats(features):
+    return {
+        "mean": [0.0] * features,
+        "var": [1.0] * features,
+        "scale": [1.0] * features,
+        "n_samples_seen": 10,
+    }
+
+
+def saved_weights():
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save({}, buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def app_module():
+    os.environ["ENV"] = "test"
+    import app
+
+    return app
+
+
+@pytest.fixture
+def loading_patches(app_module, tmp_path):
+    """Stand in for the helpers app.py only imports outside of tests"""
+    import inference
+    import model
+    from gcs_cache import GcsCache
+
+    with patch.object(
+        app_module, "scaler_from_dict", model.scaler_from_dict, create=True
+    ), patch.object(
+        app_module, "fit_scaler", model.fit_scaler, create=True
+    ), patch.object(
+        app_module,
+        "configure_torch_threads",
+        inference.configure_torch_threads,
+        create=True,
+    ), patch.object(
+        app_module,
+        "check_quantization_report",
+        inference.check_quantization_report,
+        create=True,
+    ), patch.object(
+        app_module, "gcs_cache", GcsCache(str(tmp_path / "cache"))
+    ):
+        yield
+
+
+def test_load_serving_state(app_module, loading_patches, tmp_path):
+    bucket = local_bucket(
+        tmp_path / "bucket",
+        {
+            "version1/prob_model_scalers.json": json.dumps(
+                {"X1": scaler_stats(3), "X2": scaler_stats(3)}
+            ).encode(),
+            "version1/prob_model.pt": saved_weights(),
+        },
+    )
+    source = {**app_module.default_source(), "data_folder": "version1"}
+    with patch.object(app_module, "get_bucket", return_value=bucket):
+        state = app_module.load_serving_state(source)
+
+    assert state.data_version == "version1"
+    assert state.model_version.startswith("version1/prob_model.pt#")
+    assert set(state.startup_seconds) == {
+        "torch_threads",
+        "gcs_client",
+        "scalers",
+        "model",
+        "worker",
+    }
+    assert state.scaler_X1.transform(np.ones((2, 3))).shape == (2, 3)
+    state.close()
+
+
+def test_load_scalers_without_saved_statistics(app_module, loading_patches, tmp_path):
+    data = {"X1": np.random.rand(20, 5, 3), "X2": np.random.rand(20, 5, 3)}
+    bucket = local_bucket(
+        tmp_path / "bucket", {"version1/data.pkl": pickle.dumps(data)}
+    )
+    source = {"data_folder": "version1", "data_file": "data.pkl"}
+
+    scaler_X1, scaler_X2, input_size = app_module.load_scalers(bucket, source)
+
+    assert input_size == 3
+    assert np.allclose(scaler_X1.mean_, data["X1"].reshape(-1, 3).mean(axis=0))
+
+
+@pytest.mark.parametrize(
+    "report, quantized",
+    [
+        (None, False),
+        ({"fp32": {"auc": 0.7, "f1": 0.65}, "int8": {"auc": 0.6, "f1": 0.65}}, False),
+        ({"fp32": {"auc": 0.7, "f1": 0.65}, "int8": {"auc": 0.7, "f1": 0.65}}, True),
+    ],
+)
+def test_load_quantized_model_guard(
+    app_module, loading_patches, tmp_path, report, quantized
+):
+    files = {}
+    if report is not None:
+        files["version1/prob_model_quantization.json"] = json.dumps(report).encode()
+    model = object()
+    with patch.object(
+        app_module, "quantize_dynamic_int8", lambda m: "int8", create=True
+    ):
+        result = app_module.load_quantized_model(
+            local_bucket(tmp_path / "bucket", files), model, "version1"
+        )
+    assert result == (("int8", True) if quantized else (model, False))
+
+
+def test_read_manifest(app_module, tmp_path):
+    manifest = {"probability_model": {"data_folder": "version3"}}
+    bucket = local_bucket(
+        tmp_path / "bucket", {"serving_manifest.json": json.dumps(manifest).encode()}
+    )
+    with patch.object(app_module, "get_bucket", return_value=bucket):
+        assert app_module.read_manifest() == {"data_folder": "version3"}
+    empty_bucket = local_bucket(tmp_path / "empty", {})
+    with patch.object(app_module, "get_bucket", return_value=empty_bucket):
+        assert app_module.read_manifest() is None
@@ -1,5 +1,14 @@
+import asyncio
+import queue
+import threading
+import time
+from unittest.mock import patch
+
+import torch
+
 import pytest
 from fastapi.testclient import TestClient
+import app as app_module
 from app import app
 
 client = TestClient(app)
@@ -52,3 +61,171 @@ def test_predict_endpoint_valid_input():
 def test_predict_endpoint_edge_cases(invalid_data):
     response = client.post("/predict", json=invalid_data)
     assert response.status_code in [400, 422]
+
+
+def test_predict_endpoint_overloaded():
+    test_data = {"X1": [[0.1]], "X2": [[0.2]], "M1": [0], "M2": [0]}
+    with patch.object(
+        app_module.serving_state.worker, "predict", side_effect=queue.Full
+    ):
+        response = client.post("/predict", json=test_data)
+    assert response.status_code == 503
+
+
+def test_ready_endpoint():
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert {"model_version", "data_version"} <= set(response.json())
+
+
+def test_predict_and_ready_while_loading():
+    test_data = {"X1": [[0.1]], "X2": [[0.2]], "M1": [0], "M2": [0]}
+    with patch.object(app_module, "serving_state", None):
+        response = client.post("/predict", json=test_data)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(app_module.RETRY_AFTER_SECONDS)
+
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "loading"
+        assert client.get("/health").status_code == 200
+
+
+def test_lifespan_loads_in_background():
+    state = app_module.serving_state
+    loading = threading.Event()
+
+    def slow_load():
+        loading.wait(5)
+        return state
+
+    with patch.object(app_module, "serving_state", None), patch.object(
+        app_module, "load_serving_state", slow_load
+    ):
+        # Startup returns before loading completes
+        with TestClient(app) as lifespan_client:
+            assert lifespan_client.get("/ready").status_code == 503
+            loading.set()
+            for _ in range(100):
+                if lifespan_client.get("/ready").status_code == 200:
+                    break
+                time.sleep(0.05)
+            assert lifespan_client.get("/ready").status_code == 200
+
+
+def test_late_startup_load_does_not_replace_reload():
+    state = app_module.serving_state
+    startup_state = app_module.ServingState(
+        app_module.TennisLSTM(),
+        state.scaler_X1,
+        state.scaler_X2,
+        state.device,
+        model_version="startup",
+    )
+    with patch.object(app_module, "serving_state", None):
+        assert app_module.publish_initial_state(startup_state)
+        assert app_module.serving_state is startup_state
+
+        # A reload finished while the startup model was loading
+        stale_state = app_module.ServingState(
+            app_module.TennisLSTM(),
+            state.scaler_X1,
+            state.scaler_X2,
+            state.device,
+            model_version="stale",
+        )
+        assert not app_module.publish_initial_state(stale_state)
+        assert app_module.serving_state is startup_state
+        assert not stale_state.worker.thread.is_alive()
+    startup_state.close()
+
+
+def test_poll_manifest_loads_after_failed_startup():
+    state = app_module.serving_state
+    sources = []
+
+    def load(source):
+        sources.append(source)
+        return state
+
+    async def poll_until_served():
+        task = asyncio.create_task(app_module.poll_manifest())
+        for _ in range(100):
+            if app_module.serving_state is not None:
+                break
+            await asyncio.sleep(0.05)
+        task.cancel()
+
+    with patch.object(app_module, "serving_state", None), patch.object(
+        app_module, "loading_error", "weights not found"
+    ), patch.object(app_module, "MANIFEST_POLL_SECONDS", 0.01), patch.object(
+        app_module, "read_manifest", return_value={"data_folder": "version2"}
+    ), patch.object(
+        app_module, "load_serving_state", load
+    ):
+        asyncio.run(poll_until_served())
+        assert app_module.serving_state is state
+    assert sources[0]["data_folder"] == "version2"
+
+
+def test_admin_endpoints_need_token():
+    with patch.object(app_module, "ADMIN_TOKEN", None):
+        assert client.post("/admin/reload").status_code == 403
+    with patch.object(app_module, "ADMIN_TOKEN", "secret"):
+        response = client.post("/admin/reload", headers={"X-Admin-Token": "wrong"})
+        assert response.status_code == 401
+        assert client.get("/admin/version").status_code == 401
+
+
+def test_admin_reload_swaps_state():
+    test_data = {"X1": [[0.1]], "X2": [[0.2]], "M1": [0], "M2": [0]}
+    old_state = app_module.serving_state
+    sources = []
+
+    def load(source):
+        sources.append(source)
+        return app_module.ServingState(
+            app_module.TennisLSTM(),
+            old_state.scaler_X1,
+            old_state.scaler_X2,
+            old_state.device,
+            source,
+            model_version="version2/prob_model.pt#abcd1234",
+        )
+
+    headers = {"X-Admin-Token": "secret"}
+    with patch.object(app_module, "ADMIN_TOKEN", "secret"), patch.object(
+        app_module, "serving_state", old_state
+    ), patch.object(app_module, "load_serving_state", load), patch.object(
+        app_module, "RELOAD_GRACE_SECONDS", 60
+    ):
+        response = client.post("/predict", json=test_data)
+        assert response.headers["X-Model-Version"] == "mock"
+
+        response = client.post(
+            "/admin/reload", json={"data_folder": "version2"}, headers=headers
+        )
+        assert response.status_code == 202
+        for _ in range(100):
+            if app_module.serving_state is not old_state:
+                break
+            time.sleep(0.05)
+
+        assert sources[0]["data_folder"] == "version2"
+        assert sources[0]["weights_file"] == old_state.source["weights_file"]
+        response = client.post("/predict", json=test_data)
+        assert response.headers["X-Model-Version"] == "version2/prob_model.pt#abcd1234"
+        assert response.headers["X-Data-Version"] == "version2"
+        # Requests holding the old state still finish on it
+        output, _ = old_state.worker.predict(torch.zeros(1), timeout=5)
+        assert output.item() == 0.5
+
+        version = client.get("/admin/version", headers=headers).json()
+        assert version["data_version"] == "version2"
+        assert version["reload"]["state"] == "idle"
+
+        # Only one reload runs at a time
+        with app_module.reload_lock:
+            response = client.post("/admin/reload", headers=headers)
+            assert response.status_code == 409
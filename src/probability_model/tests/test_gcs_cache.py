@@ -0,0 +1,223 @@
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+import gcs_cache
+from gcs_cache import META_SUFFIX, GcsCache, LocalBucket
+from npy_dataset import ARRAY_NAMES, SCHEMA_FILE, load_npy_dataset
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"), "test-bucket")
+    for name, content in [("a.bin", b"a" * 100), ("b.bin", b"b" * 100)]:
+        bucket.blob(f"folder/{name}").upload_from_string(content)
+    return bucket
+
+
+def count_downloads(bucket):
+    """Record the names of blobs downloaded from bucket"""
+    downloads = []
+    get_blob = bucket.get_blob
+
+    def counting_get_blob(name):
+        blob = get_blob(name)
+        if blob is not None:
+            download = blob.download_to_filename
+
+            def counting_download(filename):
+                downloads.append(name)
+                download(filename)
+
+            blob.download_to_filename = counting_download
+        return blob
+
+    bucket.get_blob = counting_get_blob
+    return downloads
+
+
+def test_cache_hit_skips_download(bucket, tmp_path):
+    cache = GcsCache(str(tmp_path / "cache"))
+    downloads = count_downloads(bucket)
+
+    assert cache.read_bytes(bucket, "folder/a.bin") == b"a" * 100
+    assert cache.read_bytes(bucket, "folder/a.bin") == b"a" * 100
+    assert downloads == ["folder/a.bin"]
+    assert cache.get_path(bucket, "folder/a.bin") == str(
+        tmp_path / "cache" / "test-bucket" / "folder" / "a.bin"
+    )
+
+
+def test_overwritten_blob_is_downloaded_again(bucket, tmp_path):
+    cache = GcsCache(str(tmp_path / "cache"))
+    cache.read_bytes(bucket, "folder/a.bin")
+
+    blob = bucket.blob("folder/a.bin")
+    blob.upload_from_string(b"new content")
+    # Make sure the generation changes even on coarse filesystem clocks
+    os.utime(blob.path, ns=(1, 1))
+
+    assert cache.read_bytes(bucket, "folder/a.bin") == b"new content"
+
+
+def test_file_without_metadata_is_not_trusted(bucket, tmp_path):
+    cache = GcsCache(str(tmp_path / "cache"))
+    path = cache.get_path(bucket, "folder/a.bin")
+    # A crash between writing the data and its metadata
+    os.remove(f"{path}{META_SUFFIX}")
+    with open(path, "wb") as f:
+        f.write(b"partial")
+
+    assert cache.read_bytes(bucket, "folder/a.bin") == b"a" * 100
+
+
+def test_corrupt_download_is_rejected(bucket, tmp_path):
+    cache = GcsCache(str(tmp_path / "cache"))
+    get_blob = bucket.get_blob
+
+    def corrupt_get_blob(name):
+        blob = get_blob(name)
+        blob.md5_hash = "corrupt"
+        return blob
+
+    bucket.get_blob = corrupt_get_blob
+    with pytest.raises(ValueError, match="md5 mismatch"):
+        cache.get_path(bucket, "folder/a.bin")
+    with pytest.raises(ValueError, match="md5 mismatch"):
+        GcsCache().read_bytes(bucket, "folder/a.bin")
+    assert cache.entries() == []
+
+
+def test_missing_blob_raises_not_found(bucket, tmp_path):
+    with pytest.raises(NotFound):
+        GcsCache(str(tmp_path / "cache")).get_path(bucket, "folder/missing.bin")
+    with pytest.raises(NotFound):
+        GcsCache().read_bytes(bucket, "folder/missing.bin")
+
+
+def test_least_recently_used_files_are_evicted(bucket, tmp_path):
+    bucket.blob("folder/c.bin").upload_from_string(b"c" * 100)
+    cache = GcsCache(str(tmp_path / "cache"), max_bytes=250)
+
+    path_a = cache.get_path(bucket, "folder/a.bin")
+    path_b = cache.get_path(bucket, "folder/b.bin")
+    os.utime(f"{path_a}{META_SUFFIX}", (1, 1))
+    os.utime(f"{path_b}{META_SUFFIX}", (2, 2))
+    # Using a makes b the least recently used
+    cache.get_path(bucket, "folder/a.bin")
+    path_c = cache.get_path(bucket, "folder/c.bin")
+
+    assert os.path.exists(path_a)
+    assert not os.path.exists(path_b)
+    assert os.path.exists(path_c)
+    assert sum(size for _, size, _ in cache.entries()) == 200
+
+
+def test_multi_file_artifact_is_never_partly_evicted(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"), "test-bucket")
+    arrays = {
+        name: np.full(50, i, dtype=np.float32) for i, name in enumerate(ARRAY_NAMES)
+    }
+    schema = {"format_version": 1, "arrays": {}}
+    for name, array in arrays.items():
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        bucket.blob(f"data/{name}.npy").upload_from_string(buffer.getvalue())
+        schema["arrays"][name] = {
+            "file": f"{name}.npy",
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+        }
+    bucket.blob(f"data/{SCHEMA_FILE}").upload_from_string(json.dumps(schema))
+    bucket.blob("folder/old.bin").upload_from_string(b"o" * 100)
+    # Smaller than the dataset alone
+    cache = GcsCache(str(tmp_path / "cache"), max_bytes=500)
+    old_path = cache.get_path(bucket, "folder/old.bin")
+
+    names = [SCHEMA_FILE] + [f"{name}.npy" for name in ARRAY_NAMES]
+    paths = cache.get_paths(bucket, [f"data/{name}" for name in names])
+
+    assert all(os.path.exists(path) for path in paths)
+    assert not os.path.exists(old_path)
+    data = load_npy_dataset(os.path.dirname(paths[0]))
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(data[name], array)
+
+
+def test_stale_temporary_files_are_removed(bucket, tmp_path):
+    cache = GcsCache(str(tmp_path / "cache"))
+    path = cache.get_path(bucket, "folder/a.bin")
+    stale = f"{path}.123.gcstmp"
+    with open(stale, "wb") as f:
+        f.write(b"partial")
+    os.utime(stale, (1, 1))
+    # Files the cache did not write are neither listed nor evicted
+    other = tmp_path / "cache" / "splits" / "split.npz"
+    other.parent.mkdir()
+    other.write_bytes(b"split")
+
+    assert [entry[2] for entry in cache.entries()] == [path]
+    assert not os.path.exists(stale)
+    assert other.exists()
+
+
+def record_ranges(bucket, fail_once=()):
+    """Record the ranges read from bucket, failing the first read of fail_once"""
+    ranges = []
+    get_blob = bucket.get_blob
+
+    def recording_get_blob(name):
+        blob = get_blob(name)
+        download = blob.download_as_bytes
+
+        def recording_download(start=None, end=None, **kwargs):
+            ranges.append((start, end))
+            if start in fail_once and ranges.count((start, end)) == 1:
+                raise ConnectionError("connection reset")
+            return download(start=start, end=end, **kwargs)
+
+        blob.download_as_bytes = recording_download
+        return blob
+
+    bucket.get_blob = recording_get_blob
+    return ranges
+
+
+@pytest.mark.parametrize("root", [None, "cache"])
+def test_large_blobs_are_downloaded_in_ranges(bucket, tmp_path, root):
+    content = os.urandom(1000)
+    bucket.blob("folder/large.bin").upload_from_string(content)
+    cache = GcsCache(root and str(tmp_path / root), workers=4, chunk_bytes=300)
+    ranges = record_ranges(bucket)
+
+    data = cache.read_bytes(bucket, "folder/large.bin")
+    assert data == content
+    # In memory, the preallocated buffer is returned instead of a copy
+    assert isinstance(data, bytearray) == (root is None)
+    assert sorted(ranges) == [(0, 299), (300, 599), (600, 899), (900, 999)]
+
+
+def test_failed_ranges_are_retried_alone(bucket, tmp_path, monkeypatch):
+    monkeypatch.setattr(gcs_cache, "RANGE_RETRY_SECONDS", 0)
+    content = os.urandom(1000)
+    bucket.blob("folder/large.bin").upload_from_string(content)
+    cache = GcsCache(str(tmp_path / "cache"), workers=4, chunk_bytes=300)
+    ranges = record_ranges(bucket, fail_once={300})
+
+    assert cache.read_bytes(bucket, "folder/large.bin") == content
+    assert len(ranges) == 5 and ranges.count((300, 599)) == 2
+
+
+def test_blob_overwritten_mid_download_is_not_mixed(bucket, tmp_path):
+    bucket.blob("folder/large.bin").upload_from_string(os.urandom(1000))
+    blob = bucket.get_blob("folder/large.bin")
+    # A new version lands after the metadata was read
+    bucket.blob("folder/large.bin").upload_from_string(os.urandom(1000))
+    os.utime(blob.path, ns=(1, 1))
+
+    with pytest.raises(PreconditionFailed):
+        gcs_cache.download_ranges(blob, 1000, lambda offset, data: None, 300, 4)
@@ -0,0 +1,184 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+import torch
+
+from inference import (
+    InferenceWorker,
+    OnnxModel,
+    TorchScriptModel,
+    WorkerClosed,
+    check_quantization_report,
+    quantize_dynamic_int8,
+)
+
+
+class WeightedMask(torch.nn.Module):
+    """Stand-in for an exported model: needs (batch, seq_len) masks"""
+
+    def forward(self, x1, x2, opponent_mask1, opponent_mask2):
+        scores = (x1 - x2).sum(dim=2) + opponent_mask1 - opponent_mask2
+        return torch.sigmoid(scores.sum(dim=1, keepdim=True))
+
+
+@pytest.fixture
+def inputs():
+    torch.manual_seed(42)
+    x1 = torch.randn(1, 5, 3)
+    x2 = torch.randn(1, 5, 3)
+    # The service passes unbatched masks, as for TennisLSTM
+    return x1, x2, torch.tensor([0.0, 1, 0, 0, 1]), torch.zeros(5)
+
+
+def test_torchscript_model(inputs):
+    buffer = BytesIO()
+    torch.jit.save(torch.jit.script(WeightedMask()), buffer)
+    model = TorchScriptModel(buffer.getvalue())
+
+    output, _ = model.to(torch.device("cpu"))(*inputs)
+
+    x1, x2, m1, m2 = inputs
+    expected = WeightedMask()(x1, x2, m1.unsqueeze(0), m2.unsqueeze(0))
+    assert output.shape == (1, 1)
+    assert torch.allclose(output, expected)
+
+
+def test_onnx_model(inputs):
+    pytest.importorskip("onnxruntime")
+    buffer = BytesIO()
+    x1, x2, m1, m2 = inputs
+    torch.onnx.export(
+        WeightedMask(),
+        (x1, x2, m1.unsqueeze(0), m2.unsqueeze(0)),
+        buffer,
+        input_names=["x1", "x2", "opponent_mask1", "opponent_mask2"],
+        dynamic_axes={name: {0: "batch"} for name in ["x1", "x2"]},
+        dynamo=False,
+    )
+    model = OnnxModel(buffer.getvalue(), threads=1)
+
+    output, _ = model(*inputs)
+
+    expected = WeightedMask()(x1, x2, m1.unsqueeze(0), m2.unsqueeze(0))
+    assert torch.allclose(output, expected, atol=1e-6)
+
+
+class SharedLSTM(torch.nn.Module):
+    """Stand-in for TennisLSTM (mocked under ENV=test) with an LSTM and Linear"""
+
+    def __init__(self):
+        super().__init__()
+        self.lstm = torch.nn.LSTM(3, 8, 2, batch_first=True)
+        self.fc2 = torch.nn.Linear(8, 1)
+
+    def forward(self, x1, x2, opponent_mask1, opponent_mask2):
+        h1, _ = self.lstm(x1)
+        h2, _ = self.lstm(x2)
+        return torch.sigmoid(self.fc2((h1 - h2).mean(dim=1))), None
+
+
+def test_quantize_dynamic_int8():
+    torch.manual_seed(42)
+    model = SharedLSTM().eval()
+    x1, x2 = torch.randn(4, 5, 3), torch.randn(4, 5, 3)
+    masks = torch.zeros(4, 5), torch.zeros(4, 5)
+    with torch.no_grad():
+        expected, _ = model(x1, x2, *masks)
+        quantized = quantize_dynamic_int8(model)
+        output, _ = quantized(x1, x2, *masks)
+
+    assert isinstance(quantized.lstm, torch.ao.nn.quantized.dynamic.LSTM)
+    assert isinstance(quantized.fc2, torch.ao.nn.quantized.dynamic.Linear)
+    assert torch.allclose(output, expected, atol=0.05)
+
+
+@pytest.mark.parametrize(
+    "int8, failed",
+    [
+        ({"auc": 0.70, "f1": 0.65}, []),
+        ({"auc": 0.697, "f1": 0.645}, []),
+        ({"auc": 0.69, "f1": 0.65}, ["auc"]),
+        ({"auc": 0.69, "f1": 0.60}, ["auc", "f1"]),
+        ({"auc": None, "f1": 0.65}, ["auc"]),
+    ],
+)
+def test_check_quantization_report(int8, failed):
+    report = {"fp32": {"auc": 0.70, "f1": 0.65}, "int8": int8}
+    reasons = check_quantization_report(report, max_auc_drop=0.005, max_f1_drop=0.01)
+    assert [reason.split()[0] for reason in reasons] == failed
+
+
+def test_inference_worker_runs_model_on_one_thread():
+    threads = set()
+
+    def model(x):
+        threads.add(threading.get_ident())
+        assert not torch.is_grad_enabled()
+        return x * 2
+
+    worker = InferenceWorker(model)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(
+            pool.map(lambda i: worker.predict(torch.tensor(i), timeout=5), range(32))
+        )
+    worker.close()
+
+    assert [result.item() for result in results] == [i * 2 for i in range(32)]
+    assert threads == {worker.thread.ident}
+
+
+def test_inference_worker_errors_and_full_queue():
+    release = threading.Event()
+
+    def model(x):
+        release.wait(5)
+        if x < 0:
+            raise ValueError("negative input")
+        return x
+
+    worker = InferenceWorker(model, max_queue=1)
+    running = worker.submit(-1)
+    # Wait until the worker has taken the first request off the queue
+    while not running.running():
+        pass
+    queued = worker.submit(1)
+    with pytest.raises(queue.Full):
+        worker.submit(2)
+
+    release.set()
+    with pytest.raises(ValueError, match="negative input"):
+        running.result(5)
+    assert queued.result(5) == 1
+    worker.close()
+
+
+def test_inference_worker_close_with_full_queue():
+    release = threading.Event()
+
+    def model(x):
+        release.wait(5)
+        return x
+
+    worker = InferenceWorker(model, max_queue=1)
+    running = worker.submit(1)
+    while not running.running():
+        pass
+    queued = worker.submit(2)
+
+    # close neither blocks on the full queue nor waits for queued requests
+    closing = threading.Thread(target=worker.close)
+    closing.start()
+    with pytest.raises(WorkerClosed):
+        queued.result(5)
+    release.set()
+    closing.join(5)
+    assert not closing.is_alive()
+    assert running.result(5) == 1
+
+    # Late requests fail at once instead of waiting for a timeout
+    with pytest.raises(WorkerClosed):
+        worker.submit(3)
+    worker.close()
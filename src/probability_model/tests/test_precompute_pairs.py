@@ -0,0 +1,168 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from gcs_cache import GcsCache, LocalBucket
+from helper import create_matchup_data
+from precompute_pairs import (
+    compute_pair_matrix,
+    load_quantized_model,
+    load_player_dfs,
+    player_windows,
+    scale_windows,
+    select_players,
+)
+
+PLAYERS = ["Ann", "Bea", "Cat", "Dee"]
+PLAYER_IDS = {"Old": 100, "Ann": 101, "Bea": 102, "Cat": 103, "Dee": 104}
+
+
+class WeightedMask(torch.nn.Module):
+    """Stand-in for TennisLSTM that depends on both windows and both masks"""
+
+    def forward(self, x1, x2, opponent_mask1, opponent_mask2):
+        opponent_mask1 = opponent_mask1.reshape(x1.shape[:2])
+        opponent_mask2 = opponent_mask2.reshape(x1.shape[:2])
+        scores = (x1 - 2 * x2).mean(dim=2) + opponent_mask1 - 3 * opponent_mask2
+        return torch.sigmoid(scores.sum(dim=1, keepdim=True) / 10), None
+
+
+class Shift:
+    def __init__(self, offset):
+        self.offset = offset
+
+    def transform(self, x):
+        return x + self.offset
+
+
+def sample_matches():
+    """Round robins between PLAYERS, and a retired player with old matches"""
+    rng = np.random.default_rng(0)
+    rows = []
+    for week in range(12):
+        for i, winner in enumerate(PLAYERS):
+            loser = PLAYERS[(i + week % 3 + 1) % len(PLAYERS)]
+            if winner == loser:
+                continue
+            rows.append(
+                {
+                    "tourney_date": pd.Timestamp("2023-01-02")
+                    + pd.Timedelta(weeks=week),
+                    "surface": "hard",
+                    "draw_size": 32,
+                    "winner_id": PLAYER_IDS[winner],
+                    "winner_name": winner,
+                    "loser_id": PLAYER_IDS[loser],
+                    "loser_name": loser,
+                    "w_ace": rng.integers(0, 20),
+                    "l_ace": rng.integers(0, 20),
+                    "w_rank": PLAYERS.index(winner) + 1,
+                    "l_rank": PLAYERS.index(loser) + 1,
+                }
+            )
+    for week in range(12):
+        rows.append(
+            {
+                "tourney_date": pd.Timestamp("2020-01-06") + pd.Timedelta(weeks=week),
+                "surface": "clay",
+                "draw_size": 64,
+                "winner_id": PLAYER_IDS["Old"],
+                "winner_name": "Old",
+                "loser_id": PLAYER_IDS["Bea"],
+                "loser_name": "Bea",
+                "w_ace": 5,
+                "l_ace": 4,
+                "w_rank": 1,
+                "l_rank": 9,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def player_dfs(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    bucket.blob("version1/combined_atp_matches.csv").upload_from_string(
+        sample_matches().to_csv(index=False)
+    )
+    # Without a snapshot in the bucket, one is built from the CSV
+    return load_player_dfs(
+        bucket,
+        GcsCache(str(tmp_path / "cache")),
+        "version1",
+        "combined_atp_matches.csv",
+    )
+
+
+def test_select_players(player_dfs):
+    assert select_players(player_dfs, 2, 3, 365) == [101, 102]
+    # Old last played years before everyone else
+    assert select_players(player_dfs, 10, 3, 365) == [101, 102, 103, 104]
+    assert select_players(player_dfs, 10, 3, 10000)[0] == PLAYER_IDS["Old"]
+    assert select_players(player_dfs, 1, 3, 365, [104, 999]) == [101, 104]
+
+
+def test_pair_matrix_matches_pairwise_predictions(player_dfs):
+    lookback = 4
+    players = select_players(player_dfs, 10, lookback, 365)
+    features, opponents = player_windows(
+        player_dfs, players, player_dfs.feature_cols, lookback
+    )
+    model = WeightedMask()
+    scaler_X1, scaler_X2 = Shift(1.0), Shift(-2.0)
+    # Small batches, so pairs span several forward passes
+    matrix = compute_pair_matrix(
+        model,
+        scale_windows(features, scaler_X1),
+        scale_windows(features, scaler_X2),
+        opponents,
+        batch_size=4,
+    )
+
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(np.diag(matrix), 0.5)
+    for i, player_a in enumerate(players):
+        for j in range(i + 1, len(players)):
+            # As the API and the model service compute it for one pair
+            x1, x2, m1, m2 = create_matchup_data(
+                player_dfs[player_a].tail(lookback + 1).reset_index(),
+                player_dfs[players[j]].tail(lookback + 1).reset_index(),
+                player_dfs.feature_cols,
+            )
+            assert any(m1) and any(m2)
+            x1 = torch.tensor(scaler_X1.transform(np.array(x1)), dtype=torch.float32)
+            x2 = torch.tensor(scaler_X2.transform(np.array(x2)), dtype=torch.float32)
+            output, _ = model(
+                x1.unsqueeze(0),
+                x2.unsqueeze(0),
+                torch.tensor(m1, dtype=torch.float32),
+                torch.tensor(m2, dtype=torch.float32),
+            )
+            assert matrix[i, j] == pytest.approx(output.item(), abs=1e-6)
+            assert matrix[j, i] == pytest.approx(1 - output.item(), abs=1e-6)
+
+
+@pytest.mark.parametrize(
+    "report, quantized",
+    [
+        (None, False),
+        ({"fp32": {"auc": 0.7, "f1": 0.65}, "int8": {"auc": 0.6, "f1": 0.65}}, False),
+        ({"fp32": {"auc": 0.7, "f1": 0.65}, "int8": {"auc": 0.7, "f1": 0.65}}, True),
+    ],
+)
+def test_load_quantized_model_matches_the_service_guard(tmp_path, report, quantized):
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    if report is not None:
+        bucket.blob("version1/prob_model_quantization.json").upload_from_string(
+            json.dumps(report)
+        )
+    model = object()
+    with patch("precompute_pairs.quantize_dynamic_int8", lambda m: "int8"):
+        result = load_quantized_model(
+            bucket, GcsCache(str(tmp_path / "cache")), model, "version1"
+        )
+    assert result == (("int8", True) if quantized else (model, False))
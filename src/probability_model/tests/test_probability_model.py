@@ -193,3 +193,15 @@ def test_tennis_lstm_init():
     assert tennis_lstm.lstm.input_size == 10
     assert tennis_lstm.lstm.hidden_size == 20
     assert tennis_lstm.lstm.num_layers == 2
+
+
+def test_fit_scaler_in_chunks_matches_full_fit(sample_data):
+    from model import fit_scaler
+
+    X1, _, _, features, _ = sample_data
+
+    expected = StandardScaler().fit(X1.reshape(-1, features))
+    scaler = fit_scaler(X1, StandardScaler(), chunk_rows=7)
+
+    np.testing.assert_allclose(scaler.mean_, expected.mean_)
+    np.testing.assert_allclose(scaler.scale_, expected.scale_)
@@ -66,7 +66,7 @@ echo "✅ Training data preprocessing complete!"
 echo "Step 3: Running model training..."
 cd ../train_probability_model
 export IMAGE_NAME="train-probability-model"
-export DATA_FILE="training_data_lookback=$LOOKBACK.pkl"
+export DATA_FILE="training_data_lookback=$LOOKBACK"
 
 if [ "$USE_GPU" = "1" ]; then
     echo "🚀 Running with GPU on Vertex AI..."
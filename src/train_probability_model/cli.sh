@@ -32,6 +32,15 @@ export LR=0.001
 export NUM_EPOCHS=100
 export RUN_SWEEP=0
 export VAL_F1_THRESHOLD=.63
+export EVAL_MIN_AUC=0
+export EVAL_MAX_P99_MS=0
+export COMPILE_MODEL=0
+export BF16=0
+# Vertex AI restarts a preempted job with the same args, so it resumes from here
+export CHECKPOINT_DIR="$GCS_BUCKET_URI/checkpoints/$DISPLAY_NAME"
+export SWEEP_EXECUTOR="wandb"
+export SWEEP_WORKERS=1
+export SWEEP_THREADS=1
 
 # Read WANDB_KEY from JSON file
 if [ ! -f "$SECRETS_DIR/wandb-key.json" ]; then
@@ -55,6 +64,14 @@ export CMDARGS="--bucket-name=$BUCKET_NAME,\
 --num-epochs=$NUM_EPOCHS,\
 --run-sweep=$RUN_SWEEP,\
 --val-f1-threshold=$VAL_F1_THRESHOLD,\
+--eval-min-auc=$EVAL_MIN_AUC,\
+--eval-max-p99-ms=$EVAL_MAX_P99_MS,\
+--compile-model=$COMPILE_MODEL,\
+--bf16=$BF16,\
+--checkpoint-dir=$CHECKPOINT_DIR,\
+--sweep-executor=$SWEEP_EXECUTOR,\
+--sweep-workers=$SWEEP_WORKERS,\
+--sweep-threads=$SWEEP_THREADS,\
 --wandb-key=$WANDB_KEY"
 
 # Submit job to Vertex AI with command line arguments
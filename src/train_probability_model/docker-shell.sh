@@ -19,6 +19,10 @@ export LR=${LR:-0.001}
 export NUM_EPOCHS=${NUM_EPOCHS:-30}
 export RUN_SWEEP=${RUN_SWEEP:-0}
 export VAL_F1_THRESHOLD=${VAL_F1_THRESHOLD:-.63}
+export EVAL_MIN_AUC=${EVAL_MIN_AUC:-0}
+export EVAL_MAX_P99_MS=${EVAL_MAX_P99_MS:-0}
+export COMPILE_MODEL=${COMPILE_MODEL:-0}
+export BF16=${BF16:-0}
 export GOOGLE_APPLICATION_CREDENTIALS=${GOOGLE_APPLICATION_CREDENTIALS:-"/secrets/model-training-account.json"}
 
 # Read WANDB_KEY from JSON file
@@ -65,4 +69,8 @@ docker run --rm -it \
 -e WANDB_KEY=$WANDB_KEY \
 -e RUN_SWEEP=$RUN_SWEEP \
 -e VAL_F1_THRESHOLD=$VAL_F1_THRESHOLD \
+-e EVAL_MIN_AUC=$EVAL_MIN_AUC \
+-e EVAL_MAX_P99_MS=$EVAL_MAX_P99_MS \
+-e COMPILE_MODEL=$COMPILE_MODEL \
+-e BF16=$BF16 \
 -e DEV=1 $IMAGE_NAME
@@ -0,0 +1,293 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+import torch
+from torch import nn
+from torch.utils.data import DataLoader
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
+from trainer.model import TennisLSTM
+from trainer.sweep import grid_configs, run_sweep
+from trainer.training_pipeline import (
+    BinaryMetrics,
+    TennisDataset,
+    TensorBatchLoader,
+    create_data_loaders,
+    train_model,
+)
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark trainer epoch time")
+    parser.add_argument("--samples", type=int, default=160000, help="Samples")
+    parser.add_argument("--lookback", type=int, default=10, help="Lookback window")
+    parser.add_argument("--features", type=int, default=30, help="Features")
+    parser.add_argument("--batch-size", type=int, default=32, help="Batch size")
+    parser.add_argument("--hidden-size", type=int, default=32, help="LSTM hidden size")
+    parser.add_argument("--num-layers", type=int, default=2, help="LSTM layers")
+    parser.add_argument(
+        "--train-steps",
+        type=int,
+        default=500,
+        help="Batches to time with forward/backward passes (0 to skip)",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="*",
+        default=[],
+        choices=["eager", "bf16", "compile", "compile+bf16"],
+        help="Train in these modes and compare steps/s and validation F1 with eager",
+    )
+    parser.add_argument(
+        "--mode-epochs", type=int, default=3, help="Epochs to train per mode"
+    )
+    parser.add_argument(
+        "--f1-tolerance",
+        type=float,
+        default=0.02,
+        help="Largest validation F1 difference from eager fp32 that passes",
+    )
+    parser.add_argument(
+        "--sweep-workers",
+        nargs="*",
+        type=int,
+        default=[],
+        help="Time a local sweep over a small grid with these worker counts",
+    )
+    parser.add_argument(
+        "--sweep-epochs", type=int, default=9, help="Epochs per sweep trial"
+    )
+    return parser.parse_args()
+
+
+def make_tensors(samples, lookback, features):
+    rng = np.random.default_rng(42)
+    X1 = rng.standard_normal((samples, lookback, features), dtype=np.float32)
+    X2 = rng.standard_normal((samples, lookback, features), dtype=np.float32)
+    M1 = (rng.random((samples, lookback)) < 0.1).astype(np.float32)
+    M2 = (rng.random((samples, lookback)) < 0.1).astype(np.float32)
+    # Learnable labels, so validation F1 is meaningful for parity checks
+    y = (X1[:, :, 0].mean(axis=1) > X2[:, :, 0].mean(axis=1)).astype(np.float32)
+    return [torch.from_numpy(array) for array in [X1, X2, M1, M2, y]]
+
+
+def time_epoch(loader, step=None, max_steps=None):
+    start_time = time.perf_counter()
+    batches = 0
+    for batch in loader:
+        if step is not None:
+            step(batch)
+        batches += 1
+        if max_steps and batches >= max_steps:
+            break
+    return time.perf_counter() - start_time, batches
+
+
+def list_epoch_metrics(batches):
+    """Per-batch .item() and Python lists, scored with sklearn at the end"""
+    total_loss, preds, true = 0.0, [], []
+    for outputs, y, loss in batches:
+        total_loss += loss.item()
+        preds.extend([1 if p > 0.5 else 0 for p in outputs.squeeze().cpu().numpy()])
+        true.extend(y.cpu().numpy())
+    return {
+        "loss": total_loss / len(batches),
+        "accuracy": accuracy_score(true, preds),
+        "precision": precision_score(true, preds),
+        "recall": recall_score(true, preds),
+        "f1": f1_score(true, preds),
+    }
+
+
+def tensor_epoch_metrics(batches):
+    metrics = BinaryMetrics()
+    for outputs, y, loss in batches:
+        metrics.update(outputs, y, loss)
+    return metrics.compute()
+
+
+def timed_metrics(fn, batches):
+    start_time = time.perf_counter()
+    result = fn(batches)
+    return result, time.perf_counter() - start_time
+
+
+class EpochTimer:
+    """train_model callback recording when each epoch ends and its validation F1"""
+
+    def __init__(self):
+        self.times = [time.perf_counter()]
+        self.val_f1 = []
+
+    def on_epoch_end(self, epoch, val_f1, **metrics):
+        self.times.append(time.perf_counter())
+        self.val_f1.append(val_f1)
+
+
+def train_in_mode(mode, tensors, args):
+    """Train with train_model in mode; returns (steps/s, compile time, val F1)"""
+    split = int(len(tensors[0]) * 0.8)
+    split -= split % args.batch_size
+    train_loader = TensorBatchLoader([t[:split] for t in tensors], args.batch_size)
+    val_loader = TensorBatchLoader([t[split:] for t in tensors], args.batch_size)
+
+    torch.manual_seed(0)
+    model = TennisLSTM(args.features, args.hidden_size, args.num_layers)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3, amsgrad=True)
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode="max")
+    timer = EpochTimer()
+    train_model(
+        model,
+        train_loader,
+        val_loader,
+        nn.BCELoss(),
+        optimizer,
+        scheduler,
+        num_epochs=args.mode_epochs,
+        callback=timer,
+        compile_model="compile" in mode,
+        autocast_dtype=torch.bfloat16 if "bf16" in mode else None,
+    )
+
+    # The first epoch includes compilation, so throughput uses the rest
+    epoch_times = np.diff(timer.times)
+    steps_per_epoch = len(train_loader) + len(val_loader)
+    steps_per_sec = steps_per_epoch / np.mean(epoch_times[1:])
+    warmup = max(epoch_times[0] - np.mean(epoch_times[1:]), 0.0)
+    return steps_per_sec, warmup, timer.val_f1[-1]
+
+
+def benchmark_sweep(tensors, args):
+    # What each trial of the W&B sweep repeats before training
+    arrays = [tensor.numpy() for tensor in tensors]
+    start_time = time.perf_counter()
+    train_loader, val_loader = create_data_loaders(
+        torch.device("cpu"), *arrays, test_size=0.2, batch_size=args.batch_size
+    )
+    logging.info(
+        f"Scaling and splitting per trial: {time.perf_counter() - start_time:.2f}s"
+    )
+
+    configs = grid_configs(
+        {"hidden_size": {"values": [8, 16, 32]}, "num_layers": {"values": [1, 2]}}
+    )
+    runs = [(1, args.sweep_epochs)] + [(workers, 1) for workers in args.sweep_workers]
+    for workers, min_epochs in runs:
+        start_time = time.perf_counter()
+        results = run_sweep(
+            train_loader.tensors,
+            val_loader.tensors,
+            configs,
+            batch_size=args.batch_size,
+            learning_rate=1e-3,
+            num_epochs=args.sweep_epochs,
+            workers=workers,
+            min_epochs=min_epochs,
+            log_file="/dev/null",
+        )
+        halving = "no halving" if min_epochs == args.sweep_epochs else "halving"
+        logging.info(
+            f"Sweep ({workers} worker(s), {halving}): "
+            f"{time.perf_counter() - start_time:.1f}s, "
+            f"{sum(result['epochs'] for result in results)} epochs trained, "
+            f"best {results[0]['config']} val F1 {results[0]['best_val_f1']:.4f}"
+        )
+
+
+def main():
+    args = parse_args()
+    logging.info(f"Torch threads: {torch.get_num_threads()}")
+    tensors = make_tensors(args.samples, args.lookback, args.features)
+
+    loaders = {
+        "DataLoader(TennisDataset)": DataLoader(
+            TennisDataset(*tensors), batch_size=args.batch_size, shuffle=False
+        ),
+        "DataLoader(TennisDataset, shuffle)": DataLoader(
+            TennisDataset(*tensors), batch_size=args.batch_size, shuffle=True
+        ),
+        "TensorBatchLoader": TensorBatchLoader(tensors, args.batch_size),
+        "TensorBatchLoader(shuffle)": TensorBatchLoader(
+            tensors, args.batch_size, shuffle=True
+        ),
+    }
+
+    # Iteration only: the cost of producing batches
+    for label, loader in loaders.items():
+        elapsed, batches = time_epoch(loader)
+        logging.info(
+            f"{label}: {elapsed:.2f}s per epoch, "
+            f"{elapsed / batches * 1e6:.1f}us per batch ({batches} batches)"
+        )
+
+    # Metric bookkeeping for one epoch of model outputs
+    batches = [
+        (torch.rand(args.batch_size, 1), batch[4] % 2, torch.rand(()))
+        for batch in loaders["TensorBatchLoader"]
+    ]
+    (list_metrics, list_time), (tensor_metrics, tensor_time) = [
+        timed_metrics(fn, batches) for fn in [list_epoch_metrics, tensor_epoch_metrics]
+    ]
+    for key in tensor_metrics:
+        assert abs(list_metrics[key] - tensor_metrics[key]) < 1e-9, key
+    logging.info(
+        f"Epoch metrics: {list_time:.2f}s with per-batch lists and sklearn, "
+        f"{tensor_time:.2f}s with BinaryMetrics (same values)"
+    )
+
+    if args.modes:
+        results = {mode: train_in_mode(mode, tensors, args) for mode in args.modes}
+        baseline = results.get("eager")
+        for mode, (steps_per_sec, warmup, val_f1) in results.items():
+            message = (
+                f"{mode}: {steps_per_sec:.0f} steps/s (train + val), "
+                f"first epoch overhead {warmup:.1f}s, val F1 {val_f1:.4f}"
+            )
+            if baseline is not None:
+                f1_diff = abs(val_f1 - baseline[2])
+                parity = "ok" if f1_diff <= args.f1_tolerance else "FAILED"
+                message += (
+                    f", {steps_per_sec / baseline[0]:.2f}x eager, "
+                    f"F1 parity {parity} ({f1_diff:.4f})"
+                )
+            logging.info(message)
+
+    if args.sweep_workers:
+        benchmark_sweep(tensors, args)
+
+    if not args.train_steps:
+        return
+
+    # With a training step per batch, extrapolated to a full epoch
+    model = TennisLSTM(args.features, args.hidden_size, args.num_layers)
+    criterion = nn.BCELoss()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3, amsgrad=True)
+
+    def step(batch):
+        X1, X2, M1, M2, y = batch
+        optimizer.zero_grad()
+        outputs, _ = model(X1, X2, M1, M2)
+        loss = criterion(outputs.squeeze(), y)
+        loss.backward()
+        optimizer.step()
+
+    model.train()
+    for label in ["DataLoader(TennisDataset)", "TensorBatchLoader"]:
+        elapsed, batches = time_epoch(loaders[label], step, args.train_steps)
+        epoch_time = elapsed / batches * len(loaders[label])
+        logging.info(
+            f"{label} + training step: {batches / elapsed:.0f} steps/s, "
+            f"~{epoch_time:.0f}s per epoch"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import io
+import logging
+import os
+
+import torch
+from google.cloud import storage
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+CHECKPOINT_FILE = "checkpoint.pt"
+
+
+class Checkpointer:
+    """
+    Save and load a training checkpoint in a local directory or a gs:// prefix,
+    e.g. the AIP_CHECKPOINT_DIR Vertex AI sets for custom jobs.
+
+    Local checkpoints are written to a temporary file and renamed, and GCS
+    object uploads are atomic, so a preempted save never leaves a partial file.
+    """
+
+    def __init__(self, directory, every=1):
+        self.directory = directory
+        self.every = every
+        self.bucket = None
+        if directory.startswith("gs://"):
+            bucket_name, _, prefix = directory.removeprefix("gs://").partition("/")
+            self.bucket = storage.Client().bucket(bucket_name)
+            self.blob_name = f"{prefix.rstrip('/')}/{CHECKPOINT_FILE}".lstrip("/")
+        else:
+            self.path = os.path.join(directory, CHECKPOINT_FILE)
+
+    def save(self, state):
+        buffer = io.BytesIO()
+        torch.save(state, buffer)
+        buffer.seek(0)
+        if self.bucket is not None:
+            self.bucket.blob(self.blob_name).upload_from_file(
+                buffer, content_type="application/octet-stream"
+            )
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(buffer.getbuffer())
+            os.replace(tmp_path, self.path)
+        logging.info(f"Saved checkpoint for epoch {state['epoch']} to {self.directory}")
+
+    def load(self):
+        """Return the saved checkpoint, or None if there isn't one"""
+        if self.bucket is not None:
+            blob = self.bucket.blob(self.blob_name)
+            if not blob.exists():
+                return None
+            buffer = io.BytesIO(blob.download_as_bytes())
+        elif os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                buffer = io.BytesIO(f.read())
+        else:
+            return None
+        # Checkpoints hold optimizer and RNG state besides tensors
+        return torch.load(buffer, map_location="cpu", weights_only=False)
@@ -1,17 +1,221 @@
-from sklearn.metrics import accuracy_score, roc_auc_score
+import logging
+import time
+
 import torch
 
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+LOG_LOSS_EPS = 1e-7
+
+
+def count_samples(loader):
+    """Number of samples a loader iterates over at most"""
+    if hasattr(loader, "num_samples"):
+        return loader.num_samples
+    return len(loader.dataset)
+
+
+def predict(model, loader, device=None):
+    """
+    Run batched inference into preallocated tensors.
+
+    model may return the probability or a (probability, attention) tuple as
+    TennisLSTM does. Each forward pass is timed on its own, after a device
+    sync, so batch loading and host-to-device copies are not counted.
+
+    Returns:
+    probabilities and labels as 1-D float tensors on the device, and the
+    (batch size, seconds) of every batch
+    """
+    capacity = count_samples(loader)
+    probabilities = torch.empty(capacity, device=device)
+    labels = torch.empty(capacity, device=device)
+    timings = []
+    synchronize = device is not None and torch.device(device).type == "cuda"
 
-def evaluate_model(model, test_loader):
     model.eval()
-    test_preds = []
-    test_true = []
+    filled = 0
     with torch.no_grad():
-        for X1, X2, M1, M2, y in test_loader:
+        for X1, X2, M1, M2, y in loader:
+            batch_size = len(y)
+            start_time = time.perf_counter()
             outputs = model(X1, X2, M1, M2)
-            test_preds.extend(outputs.squeeze().tolist())
-            test_true.extend(y.tolist())
+            if isinstance(outputs, tuple):
+                outputs = outputs[0]
+            if synchronize:
+                torch.cuda.synchronize()
+            timings.append((batch_size, time.perf_counter() - start_time))
+
+            end = filled + batch_size
+            probabilities[filled:end] = outputs.reshape(-1)
+            labels[filled:end] = y.reshape(-1)
+            filled = end
+    # A loader with drop_last stops short of its sample count
+    return probabilities[:filled], labels[:filled], timings
+
+
+def roc_auc(probabilities, labels):
+    """
+    ROC AUC as the Mann-Whitney U statistic, with tied scores given their
+    average rank (as sklearn's roc_auc_score). None if the labels hold a
+    single class, where the AUC is undefined.
+    """
+    labels = labels > 0.5
+    positives = labels.sum().item()
+    negatives = len(labels) - positives
+    if positives == 0 or negatives == 0:
+        return None
+
+    sorted_scores, order = torch.sort(probabilities.double())
+    _, counts = torch.unique_consecutive(sorted_scores, return_counts=True)
+    # 1-based average rank of each run of tied scores
+    ends = torch.cumsum(counts, dim=0).double()
+    average_ranks = ends - (counts.double() - 1) / 2
+    ranks = torch.repeat_interleave(average_ranks, counts)
+    positive_rank_sum = ranks[labels[order]].sum().item()
+    return (positive_rank_sum - positives * (positives + 1) / 2) / (
+        positives * negatives
+    )
+
+
+def reliability_bins(probabilities, labels, n_bins=10):
+    """
+    Calibration curve over equal-width probability bins, and the expected
+    calibration error (count-weighted mean |confidence - frequency|).
+
+    Returns:
+    dict of per-bin lists (lower edge, count, mean probability, positive
+    rate; the means are None for empty bins) and the ECE, None without
+    samples
+    """
+    probabilities = probabilities.double()
+    bins = torch.clamp((probabilities * n_bins).long(), max=n_bins - 1)
+    counts = torch.bincount(bins, minlength=n_bins)
+    probability_sums = torch.bincount(bins, weights=probabilities, minlength=n_bins)
+    label_sums = torch.bincount(bins, weights=labels.double(), minlength=n_bins)
+
+    nonempty = counts > 0
+    divisor = counts.clamp(min=1).double()
+    mean_probability = probability_sums / divisor
+    positive_rate = label_sums / divisor
+    ece = (counts * (mean_probability - positive_rate).abs()).sum() / max(
+        len(probabilities), 1
+    )
+    ece = ece.item() if len(probabilities) else None
+    return {
+        "lower_edge": [i / n_bins for i in range(n_bins)],
+        "count": counts.tolist(),
+        "mean_probability": [
+            p if n else None for p, n in zip(mean_probability.tolist(), nonempty)
+        ],
+        "positive_rate": [
+            r if n else None for r, n in zip(positive_rate.tolist(), nonempty)
+        ],
+        "ece": ece,
+    }
+
+
+def quality_metrics(probabilities, labels, threshold=0.5, n_bins=10):
+    """
+    AUC, accuracy, log-loss, Brier score and reliability bins, as Python
+    values. Metrics that are undefined for the samples, such as every metric
+    of an empty set, are None.
+    """
+    if len(labels) == 0:
+        return {
+            "auc": None,
+            "accuracy": None,
+            "log_loss": None,
+            "brier": None,
+            "reliability": reliability_bins(probabilities, labels, n_bins),
+        }
+    probabilities = probabilities.double()
+    labels = labels.double()
+    clipped = probabilities.clamp(LOG_LOSS_EPS, 1 - LOG_LOSS_EPS)
+    log_loss = -(
+        labels * torch.log(clipped) + (1 - labels) * torch.log1p(-clipped)
+    ).mean()
+    return {
+        "auc": roc_auc(probabilities, labels),
+        "accuracy": ((probabilities > threshold) == (labels > 0.5))
+        .double()
+        .mean()
+        .item(),
+        "log_loss": log_loss.item(),
+        "brier": ((probabilities - labels) ** 2).mean().item(),
+        "reliability": reliability_bins(probabilities, labels, n_bins),
+    }
+
+
+def latency_profile(timings, warmup_batches=1):
+    """
+    Per-batch latency percentiles in milliseconds and throughput in samples/s.
+    The first warmup_batches are left out, as they include one-off setup.
+    Without any batches, the latencies and throughput are None.
+    """
+    if not timings:
+        return {
+            "batches": 0,
+            "batch_size": None,
+            "p50_ms": None,
+            "p95_ms": None,
+            "p99_ms": None,
+            "samples_per_second": None,
+        }
+    if len(timings) > warmup_batches:
+        timings = timings[warmup_batches:]
+    sizes = torch.tensor([size for size, _ in timings], dtype=torch.float64)
+    seconds = torch.tensor([elapsed for _, elapsed in timings], dtype=torch.float64)
+    p50, p95, p99 = torch.quantile(
+        seconds * 1000, torch.tensor([0.5, 0.95, 0.99], dtype=torch.float64)
+    ).tolist()
+    return {
+        "batches": len(timings),
+        "batch_size": int(sizes.max().item()),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "samples_per_second": (sizes.sum() / seconds.sum()).item(),
+    }
+
+
+def evaluate_model(model, test_loader, device=None, threshold=0.5, n_bins=10):
+    """
+    Quality metrics and an inference latency profile of a model on a loader
+
+    Returns:
+    dict with auc, accuracy, log_loss, brier, reliability and latency
+    """
+    probabilities, labels, timings = predict(model, test_loader, device)
+    report = quality_metrics(probabilities, labels, threshold, n_bins)
+    report["samples"] = len(labels)
+    report["latency"] = latency_profile(timings)
+    return report
+
+
+def format_metric(value, digits=4):
+    """A metric for log messages, which may be None when it is undefined"""
+    return "undefined" if value is None else f"{value:.{digits}f}"
+
 
-    test_auc = roc_auc_score(test_true, test_preds)
-    test_acc = accuracy_score(test_true, [1 if p > 0.5 else 0 for p in test_preds])
-    return test_auc, test_acc
+def check_deployment(report, min_auc=None, max_p99_ms=None):
+    """
+    Reasons the evaluated model should not be deployed; empty if it passes.
+    A configured gate whose metric is undefined (None) fails.
+    """
+    reasons = []
+    auc = report["auc"]
+    if min_auc is not None and auc is None:
+        reasons.append(f"auc is undefined, cannot check it against {min_auc}")
+    elif min_auc is not None and auc < min_auc:
+        reasons.append(f"auc {auc:.4f} is below {min_auc}")
+    p99_ms = report["latency"]["p99_ms"]
+    if max_p99_ms is not None and p99_ms is None:
+        reasons.append(
+            f"p99 batch latency is undefined, cannot check it against {max_p99_ms}ms"
+        )
+    elif max_p99_ms is not None and p99_ms > max_p99_ms:
+        reasons.append(f"p99 batch latency {p99_ms:.2f}ms is above {max_p99_ms}ms")
+    return reasons
@@ -0,0 +1,206 @@
+import argparse
+import copy
+import inspect
+import logging
+import os
+
+import numpy as np
+import torch
+from sklearn.metrics import f1_score
+from torch import nn
+
+from trainer.evaluate import roc_auc
+from trainer.model import TennisLSTM
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+ONNX_OPSET = 17
+INPUT_NAMES = ["x1", "x2", "opponent_mask1", "opponent_mask2"]
+
+
+def batchnorm_affine(bn: nn.BatchNorm1d):
+    """Eval-mode BatchNorm as a per-channel scale and shift"""
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    shift = bn.bias - bn.running_mean * scale
+    return scale.detach(), shift.detach()
+
+
+def fold_batchnorm_into_next_linear(bn: nn.BatchNorm1d, linear: nn.Linear):
+    """
+    Return a Linear equal to linear(bn(x)) in eval mode:
+    W(scale * x + shift) + b = (W * scale) x + (W shift + b)
+    """
+    scale, shift = batchnorm_affine(bn)
+    folded = copy.deepcopy(linear)
+    with torch.no_grad():
+        folded.weight.copy_(linear.weight * scale)
+        folded.bias.copy_(linear.bias + linear.weight @ shift)
+    return folded
+
+
+class InferenceTennisLSTM(nn.Module):
+    """
+    TennisLSTM rewritten for inference only:
+    - dropout is removed
+    - bn_fc is folded into fc2; bn_lstm follows the LSTM's nonlinear output,
+      so it becomes a precomputed per-channel scale and shift
+    - both players' sequences go through the LSTM as a single batch
+    - attention weights are not returned, only the win probability of shape (batch, 1)
+
+    Inputs are x1, x2 of shape (batch, seq_len, input_size) and opponent masks
+    of shape (batch, seq_len).
+    """
+
+    def __init__(self, model: TennisLSTM):
+        super().__init__()
+        model = copy.deepcopy(model).eval()
+        self.lstm = model.lstm
+        scale, shift = batchnorm_affine(model.bn_lstm)
+        self.register_buffer("lstm_scale", scale)
+        self.register_buffer("lstm_shift", shift)
+        self.attention_norm = model.attention_norm
+        self.attention = model.attention
+        self.register_buffer(
+            "inverse_temperature", 1.0 / model.attention_temperature.detach()
+        )
+        self.fc = model.fc
+        self.fc2 = fold_batchnorm_into_next_linear(model.bn_fc, model.fc2)
+
+    def attend(self, sequence, opponent_mask):
+        sequence = self.attention_norm(sequence * self.lstm_scale + self.lstm_shift)
+        scores = self.attention(sequence) + opponent_mask.unsqueeze(-1) * 2.0
+        weights = torch.softmax(scores * self.inverse_temperature, dim=1)
+        return (sequence * weights).sum(dim=1)
+
+    def forward(self, x1, x2, opponent_mask1, opponent_mask2):
+        batch_size = x1.shape[0]
+        h_seq, _ = self.lstm(torch.cat([x1, x2], dim=0))
+        h1_context = self.attend(h_seq[:batch_size], opponent_mask1)
+        h2_context = self.attend(h_seq[batch_size:], opponent_mask2)
+        x = torch.relu(self.fc(h1_context - h2_context))
+        return torch.sigmoid(self.fc2(x))
+
+
+def example_inputs(input_size, lookback, batch_size=2):
+    return (
+        torch.randn(batch_size, lookback, input_size),
+        torch.randn(batch_size, lookback, input_size),
+        torch.zeros(batch_size, lookback),
+        torch.zeros(batch_size, lookback),
+    )
+
+
+def export_torchscript(model: TennisLSTM, f):
+    """Script and freeze the inference model, then save it to a path or file object"""
+    module = torch.jit.script(InferenceTennisLSTM(model).eval())
+    module = torch.jit.optimize_for_inference(torch.jit.freeze(module))
+    torch.jit.save(module, f)
+
+
+def export_onnx(model: TennisLSTM, f, lookback):
+    """Export the inference model to ONNX with dynamic batch and sequence length"""
+    module = InferenceTennisLSTM(model).eval()
+    inputs = example_inputs(model.lstm.input_size, lookback)
+    kwargs = {}
+    # Newer torch defaults to the dynamo exporter; keep the TorchScript one
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+    torch.onnx.export(
+        module,
+        inputs,
+        f,
+        input_names=INPUT_NAMES,
+        output_names=["probability"],
+        dynamic_axes={
+            "x1": {0: "batch", 1: "seq_len"},
+            "x2": {0: "batch", 1: "seq_len"},
+            "opponent_mask1": {0: "batch", 1: "seq_len"},
+            "opponent_mask2": {0: "batch", 1: "seq_len"},
+            "probability": {0: "batch"},
+        },
+        opset_version=ONNX_OPSET,
+        do_constant_folding=True,
+        **kwargs,
+    )
+
+
+def quantize_dynamic_int8(model: TennisLSTM):
+    """
+    Copy of the model with int8 weights for its LSTM and Linear layers;
+    activations are quantized on the fly, so it runs on CPU only.
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    return torch.ao.quantization.quantize_dynamic(
+        model, {nn.LSTM, nn.Linear}, dtype=torch.qint8
+    )
+
+
+def predict_probabilities(model, X1, X2, M1, M2, batch_size=1024) -> np.ndarray:
+    """Win probabilities of a TennisLSTM-like model for numpy arrays, batch by batch"""
+    model.eval()
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(X1), batch_size):
+            end = min(start + batch_size, len(X1))
+            inputs = [torch.as_tensor(array[start:end]) for array in (X1, X2, M1, M2)]
+            output, _ = model(*inputs)
+            outputs.append(output.view(-1))
+    if not outputs:
+        return np.empty(0, dtype=np.float32)
+    return torch.cat(outputs).numpy()
+
+
+def quantization_report(model: TennisLSTM, X1, X2, M1, M2, y):
+    """
+    AUC and F1 of the fp32 model and of its dynamic int8 quantization on
+    held-out data, for the model service to decide whether int8 is safe to serve.
+    Undefined metrics are None, as in evaluate: the AUC of a single class, and
+    both metrics without samples. The model service refuses int8 then.
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    report = {"samples": int(len(y))}
+    for name, candidate in [("fp32", model), ("int8", quantize_dynamic_int8(model))]:
+        probabilities = predict_probabilities(candidate, X1, X2, M1, M2)
+        report[name] = {
+            "auc": roc_auc(torch.as_tensor(probabilities), torch.as_tensor(y)),
+            "f1": (
+                float(f1_score(y, probabilities > 0.5, zero_division=0))
+                if len(y)
+                else None
+            ),
+        }
+    return report
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Export a saved TennisLSTM state_dict for inference"
+    )
+    parser.add_argument("--weights", type=str, required=True, help="prob_model.pt")
+    parser.add_argument("--input-size", type=int, default=30, help="Input features")
+    parser.add_argument("--hidden-size", type=int, required=True, help="Hidden size")
+    parser.add_argument("--num-layers", type=int, required=True, help="LSTM layers")
+    parser.add_argument("--lookback", type=int, default=10, help="Lookback window")
+    parser.add_argument("--out-dir", type=str, default=".", help="Output directory")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    model = TennisLSTM(args.input_size, args.hidden_size, args.num_layers)
+    model.load_state_dict(torch.load(args.weights, map_location="cpu"))
+    model.eval()
+
+    name = os.path.splitext(os.path.basename(args.weights))[0]
+    torchscript_path = os.path.join(args.out_dir, f"{name}.ts")
+    onnx_path = os.path.join(args.out_dir, f"{name}.onnx")
+    export_torchscript(model, torchscript_path)
+    export_onnx(model, onnx_path, args.lookback)
+    logging.info(f"Exported {torchscript_path} and {onnx_path}")
+
+
+if __name__ == "__main__":
+    main()
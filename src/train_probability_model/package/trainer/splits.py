@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import math
+import os
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from trainer.npy_dataset import ARRAY_NAMES
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+SPLIT_FORMAT_VERSION = 1
+SPLIT_FILE = "split.json"
+SCALED_ARRAYS = ["X1", "X2"]
+SPLIT_ARRAYS = [f"{name}_{part}" for part in ["train", "val"] for name in ARRAY_NAMES]
+
+
+def fit_scaler(X: np.ndarray, rows: int, chunk_rows: int = 65536) -> StandardScaler:
+    """Fit a StandardScaler on the first rows samples of X, a chunk at a time"""
+    features = X.shape[-1]
+    scaler = StandardScaler()
+    for start in range(0, rows, chunk_rows):
+        end = min(start + chunk_rows, rows)
+        scaler.partial_fit(np.asarray(X[start:end]).reshape(-1, features))
+    return scaler
+
+
+def scale(X: np.ndarray, scaler: StandardScaler, chunk_rows: int = 65536):
+    """Scale X into a new float32 array, a chunk at a time"""
+    features = X.shape[-1]
+    scaled = np.empty(X.shape, dtype=np.float32)
+    for start in range(0, len(X), chunk_rows):
+        end = min(start + chunk_rows, len(X))
+        chunk = np.asarray(X[start:end]).reshape(-1, features)
+        scaled[start:end] = scaler.transform(chunk).reshape(-1, *X.shape[1:])
+    return scaled
+
+
+def scaler_to_dict(scaler: StandardScaler) -> Dict[str, Any]:
+    return {
+        "mean": scaler.mean_.tolist(),
+        "var": scaler.var_.tolist(),
+        "scale": scaler.scale_.tolist(),
+        "n_samples_seen": int(scaler.n_samples_seen_),
+    }
+
+
+def scaler_from_dict(stats: Dict[str, Any]) -> StandardScaler:
+    """Rebuild a fitted StandardScaler from scaler_to_dict output"""
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(stats["mean"])
+    scaler.var_ = np.array(stats["var"])
+    scaler.scale_ = np.array(stats["scale"])
+    scaler.n_samples_seen_ = stats["n_samples_seen"]
+    scaler.n_features_in_ = len(stats["mean"])
+    return scaler
+
+
+def create_split(data: Dict[str, np.ndarray], test_size: float) -> Dict[str, Any]:
+    """
+    Split the data chronologically and scale it with scalers fitted on the
+    training rows only, so no validation statistics leak into training.
+
+    The validation set is the last ceil(test_size * samples) rows, as with
+    train_test_split(shuffle=False).
+
+    Returns:
+    dict with float32 arrays X1_train ... y_val and the scaler statistics
+    """
+    samples = len(data["y"])
+    train_rows = samples - math.ceil(test_size * samples)
+
+    split = {"scalers": {}}
+    for name in ARRAY_NAMES:
+        if name in SCALED_ARRAYS:
+            scaler = fit_scaler(data[name], train_rows)
+            split["scalers"][name] = scaler_to_dict(scaler)
+            array = scale(data[name], scaler)
+        else:
+            array = np.asarray(data[name], dtype=np.float32)
+        split[f"{name}_train"] = array[:train_rows]
+        split[f"{name}_val"] = array[train_rows:]
+    return split
+
+
+def get_split_key(data_version: str, test_size: float) -> str:
+    key = json.dumps(
+        {
+            "format_version": SPLIT_FORMAT_VERSION,
+            "data_version": data_version,
+            "test_size": test_size,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def save_split(split: Dict[str, Any], directory: str, metadata: Dict[str, Any]):
+    """Write a split as .npy files; split.json is written last and marks it complete"""
+    os.makedirs(directory, exist_ok=True)
+    for name in SPLIT_ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), split[name])
+    tmp_path = os.path.join(directory, f"{SPLIT_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "format_version": SPLIT_FORMAT_VERSION,
+                "scalers": split["scalers"],
+                "metadata": metadata,
+            },
+            f,
+        )
+    os.replace(tmp_path, os.path.join(directory, SPLIT_FILE))
+
+
+def load_split(directory: str) -> Optional[Dict[str, Any]]:
+    """Load a split written by save_split, or None if there is no complete one"""
+    split_path = os.path.join(directory, SPLIT_FILE)
+    if not os.path.exists(split_path):
+        return None
+    with open(split_path) as f:
+        info = json.load(f)
+    if info["format_version"] != SPLIT_FORMAT_VERSION:
+        return None
+
+    split = {"scalers": info["scalers"]}
+    for name in SPLIT_ARRAYS:
+        split[name] = np.load(os.path.join(directory, f"{name}.npy"))
+    return split
+
+
+def load_or_create_split(
+    cache_dir: str,
+    data_version: str,
+    test_size: float,
+    read_data: Callable[[], Dict[str, np.ndarray]],
+) -> Dict[str, Any]:
+    """
+    Return the scaled train/val split of a dataset, cached on disk under
+    cache_dir by data version and test_size. read_data is only called on a
+    cache miss, so repeat runs skip reading and scaling the raw data.
+    """
+    directory = os.path.join(cache_dir, get_split_key(data_version, test_size))
+    split = load_split(directory)
+    if split is not None:
+        logging.info(f"Loaded cached split from {directory}")
+        return split
+
+    logging.info(f"No cached split in {directory}, scaling data")
+    split = create_split(read_data(), test_size)
+    save_split(split, directory, {"data_version": data_version, "test_size": test_size})
+    logging.info(f"Cached split to {directory}")
+    return split
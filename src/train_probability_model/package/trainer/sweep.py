@@ -0,0 +1,272 @@
+import itertools
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+import torch
+import torch.multiprocessing as mp
+from torch import nn
+
+from trainer.model import TennisLSTM
+from trainer.training_pipeline import TensorBatchLoader, train_model
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# Set in each worker process by _init_worker
+_worker_state: Dict[str, Any] = {}
+
+
+class TrialPruned(Exception):
+    """Raised from a trial's callback when successive halving stops it"""
+
+
+class JsonlLogger:
+    """Append one JSON record per line to a local file, for offline sweeps"""
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+
+    def log(self, record):
+        # Single short appends from several processes don't interleave
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def finish(self):
+        pass
+
+
+class WandbLogger:
+    """Log each trial as its own W&B run, grouped by sweep"""
+
+    def __init__(self, path=None, project=None, group=None, name=None, config=None):
+        import wandb
+
+        self.run = wandb.init(
+            project=project, group=group, name=name, config=config, reinit=True
+        )
+
+    def log(self, record):
+        self.run.log(record)
+
+    def finish(self):
+        self.run.finish()
+
+
+LOGGERS = {"jsonl": JsonlLogger, "wandb": WandbLogger}
+
+
+def grid_configs(parameters: Dict[str, Dict[str, list]]) -> List[Dict[str, Any]]:
+    """Expand a W&B grid sweep "parameters" section into a list of configs"""
+    names = list(parameters)
+    values = [parameters[name]["values"] for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def get_rungs(min_epochs: int, eta: int, num_epochs: int) -> List[int]:
+    """Epochs at which successive halving compares trials: min_epochs * eta^k"""
+    rungs = []
+    epoch = min_epochs
+    while epoch < num_epochs:
+        rungs.append(epoch)
+        epoch *= eta
+    return rungs
+
+
+class TrialCallback:
+    """
+    train_model callback that logs each epoch and applies asynchronous
+    successive halving: at every rung a trial continues only if its validation
+    F1 is in the top 1/eta of all trials that have reached that rung so far.
+    """
+
+    def __init__(self, trial_id, config, logger, rungs, eta, rung_results, lock):
+        self.trial_id = trial_id
+        self.config = config
+        self.logger = logger
+        self.rungs = rungs
+        self.eta = eta
+        self.rung_results = rung_results
+        self.lock = lock
+        self.best_val_f1 = float("-inf")
+        self.epochs = 0
+
+    def on_epoch_end(self, epoch, **metrics):
+        self.epochs = epoch
+        self.best_val_f1 = max(self.best_val_f1, metrics["val_f1"])
+        self.logger.log(
+            {"trial": self.trial_id, **self.config, "epoch": epoch, **metrics}
+        )
+        if epoch not in self.rungs:
+            return
+
+        with self.lock:
+            results = self.rung_results.get(epoch, []) + [self.best_val_f1]
+            self.rung_results[epoch] = results
+        keep = max(1, len(results) // self.eta)
+        cutoff = sorted(results, reverse=True)[keep - 1]
+        if self.best_val_f1 < cutoff:
+            raise TrialPruned(
+                f"val F1 {self.best_val_f1:.4f} below rung {epoch} cutoff {cutoff:.4f}"
+            )
+
+
+def _init_worker(state):
+    global _worker_state
+    _worker_state = state
+    torch.set_num_threads(state["threads"])
+
+
+def _run_trial(trial):
+    trial_id, config = trial
+    state = _worker_state
+    device = torch.device(state["device"])
+    torch.manual_seed(state["seed"])
+
+    # As in create_split_loaders, BatchNorm must not see a 1-sample batch
+    train_loader = TensorBatchLoader(
+        [tensor.to(device) for tensor in state["train"]],
+        state["batch_size"],
+        drop_last=True,
+    )
+    val_loader = TensorBatchLoader(
+        [tensor.to(device) for tensor in state["val"]], state["batch_size"]
+    )
+    model = TennisLSTM(
+        state["input_size"], config["hidden_size"], config["num_layers"]
+    ).to(device)
+    optimizer = torch.optim.AdamW(
+        model.parameters(), lr=state["learning_rate"], amsgrad=True
+    )
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
+        optimizer, mode="max", factor=0.5, patience=3
+    )
+
+    logger = LOGGERS[state["logger"]](
+        path=state["log_file"],
+        project=state["project"],
+        group=state["sweep_name"],
+        name=f"{state['sweep_name']}-{trial_id}",
+        config=config,
+    )
+    callback = TrialCallback(
+        trial_id,
+        config,
+        logger,
+        state["rungs"],
+        state["eta"],
+        state["rung_results"],
+        state["lock"],
+    )
+
+    start_time = time.perf_counter()
+    pruned = False
+    try:
+        train_model(
+            model,
+            train_loader,
+            val_loader,
+            nn.BCELoss(),
+            optimizer,
+            scheduler,
+            num_epochs=state["num_epochs"],
+            callback=callback,
+        )
+    except TrialPruned as e:
+        logging.info(
+            f"Trial {trial_id} {config} pruned after {callback.epochs} epochs: {e}"
+        )
+        pruned = True
+    finally:
+        logger.finish()
+
+    return {
+        "trial": trial_id,
+        "config": config,
+        "best_val_f1": callback.best_val_f1,
+        "epochs": callback.epochs,
+        "pruned": pruned,
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+def run_sweep(
+    train_tensors,
+    val_tensors,
+    configs,
+    batch_size,
+    learning_rate,
+    num_epochs,
+    workers=1,
+    threads_per_trial=1,
+    min_epochs=3,
+    eta=3,
+    logger="jsonl",
+    log_file="sweep.jsonl",
+    project="tennis-match-predictor",
+    sweep_name="local-sweep",
+    device="cpu",
+    seed=42,
+):
+    """
+    Train every config on data that is loaded and scaled once, running trials
+    in parallel across a process pool.
+
+    The tensors are moved to shared memory, so workers map them instead of
+    each getting a copy. Each worker runs torch with threads_per_trial
+    threads, and trials are stopped by successive halving at the epochs in
+    get_rungs(min_epochs, eta, num_epochs).
+
+    Returns:
+    list of trial results, best validation F1 first
+    """
+    rungs = get_rungs(min_epochs, eta, num_epochs)
+    logging.info(
+        f"Running {len(configs)} trials on {workers} worker(s) with "
+        f"{threads_per_trial} thread(s) each, halving rungs at epochs {rungs}"
+    )
+
+    context = mp.get_context("spawn")
+    manager = context.Manager()
+    state = {
+        "train": [tensor.share_memory_() for tensor in train_tensors],
+        "val": [tensor.share_memory_() for tensor in val_tensors],
+        "input_size": train_tensors[0].shape[-1],
+        "batch_size": batch_size,
+        "learning_rate": learning_rate,
+        "num_epochs": num_epochs,
+        "threads": threads_per_trial,
+        "rungs": rungs,
+        "eta": eta,
+        "rung_results": manager.dict(),
+        "lock": manager.Lock(),
+        "logger": logger,
+        "log_file": log_file,
+        "project": project,
+        "sweep_name": sweep_name,
+        "device": str(device),
+        "seed": seed,
+    }
+
+    results = []
+    with manager, ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(state,),
+    ) as executor:
+        futures = [executor.submit(_run_trial, trial) for trial in enumerate(configs)]
+        for future in as_completed(futures):
+            result = future.result()
+            logging.info(
+                f"Trial {result['trial']} {result['config']}: best val F1 "
+                f"{result['best_val_f1']:.4f} after {result['epochs']} epochs "
+                f"in {result['seconds']:.1f}s"
+            )
+            results.append(result)
+
+    results.sort(key=lambda result: result["best_val_f1"], reverse=True)
+    return results
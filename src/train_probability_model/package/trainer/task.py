@@ -39,7 +39,10 @@ def parse_args():
         "--num-epochs", type=int, required=True, help="Number of training epochs"
     )
     parser.add_argument(
-        "--wandb-key", type=str, required=True, help="Weights & Biases API key"
+        "--wandb-key",
+        type=str,
+        default="",
+        help="Weights & Biases API key (not needed for a local sweep with --sweep-logger=jsonl)",
     )
     parser.add_argument(
         "--run-sweep",
@@ -53,6 +56,90 @@ def parse_args():
         required=True,
         help="Validation F1 score threshold",
     )
+    parser.add_argument(
+        "--eval-min-auc",
+        type=float,
+        default=0.0,
+        help="Validation AUC a model needs to be saved (0 to disable)",
+    )
+    parser.add_argument(
+        "--eval-max-p99-ms",
+        type=float,
+        default=0.0,
+        help="Max p99 validation batch latency in ms for a model to be saved "
+        "(0 to disable)",
+    )
+    parser.add_argument(
+        "--compile-model",
+        type=int,
+        default=0,
+        help="Whether to train with torch.compile (1) or in eager mode (0)",
+    )
+    parser.add_argument(
+        "--bf16",
+        type=int,
+        default=0,
+        help="Whether to train with bfloat16 autocast where supported (1) or not (0)",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        default="",
+        help="Local path or gs:// prefix to checkpoint to and resume from "
+        "(defaults to AIP_CHECKPOINT_DIR on Vertex AI, if set)",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=1,
+        help="Save a checkpoint every N epochs",
+    )
+
+    # Sweep configs
+    parser.add_argument(
+        "--sweep-executor",
+        type=str,
+        default="wandb",
+        choices=["wandb", "local"],
+        help="Run the sweep with a W&B agent or the local parallel executor",
+    )
+    parser.add_argument(
+        "--sweep-workers",
+        type=int,
+        default=1,
+        help="Trials to run in parallel with the local executor",
+    )
+    parser.add_argument(
+        "--sweep-threads",
+        type=int,
+        default=1,
+        help="Torch threads per trial with the local executor",
+    )
+    parser.add_argument(
+        "--sweep-min-epochs",
+        type=int,
+        default=3,
+        help="First successive halving rung for the local executor",
+    )
+    parser.add_argument(
+        "--sweep-eta",
+        type=int,
+        default=3,
+        help="Keep the top 1/eta trials at each successive halving rung",
+    )
+    parser.add_argument(
+        "--sweep-logger",
+        type=str,
+        default="wandb",
+        choices=["wandb", "jsonl"],
+        help="Log local sweep trials to W&B or to a JSONL file",
+    )
+    parser.add_argument(
+        "--sweep-log-file",
+        type=str,
+        default="sweep.jsonl",
+        help="JSONL file for --sweep-logger=jsonl",
+    )
 
     args = parser.parse_args()
 
@@ -69,6 +156,19 @@ def parse_args():
     os.environ["WANDB_KEY"] = args.wandb_key
     os.environ["RUN_SWEEP"] = str(args.run_sweep)
     os.environ["VAL_F1_THRESHOLD"] = str(args.val_f1_threshold)
+    os.environ["EVAL_MIN_AUC"] = str(args.eval_min_auc)
+    os.environ["EVAL_MAX_P99_MS"] = str(args.eval_max_p99_ms)
+    os.environ["COMPILE_MODEL"] = str(args.compile_model)
+    os.environ["BF16"] = str(args.bf16)
+    os.environ["CHECKPOINT_DIR"] = args.checkpoint_dir
+    os.environ["CHECKPOINT_EVERY"] = str(args.checkpoint_every)
+    os.environ["SWEEP_EXECUTOR"] = args.sweep_executor
+    os.environ["SWEEP_WORKERS"] = str(args.sweep_workers)
+    os.environ["SWEEP_THREADS"] = str(args.sweep_threads)
+    os.environ["SWEEP_MIN_EPOCHS"] = str(args.sweep_min_epochs)
+    os.environ["SWEEP_ETA"] = str(args.sweep_eta)
+    os.environ["SWEEP_LOGGER"] = args.sweep_logger
+    os.environ["SWEEP_LOG_FILE"] = args.sweep_log_file
 
     # Log all settings
     logging.info("=== Training Configuration ===")
@@ -83,6 +183,18 @@ def parse_args():
     logging.info(f"Number of Epochs: {args.num_epochs}")
     logging.info(f"Run Sweep: {args.run_sweep}")
     logging.info(f"Validation F1 Threshold: {args.val_f1_threshold}")
+    logging.info(f"Compile Model: {args.compile_model}")
+    logging.info(f"BF16 Autocast: {args.bf16}")
+    logging.info(f"Checkpoint Dir: {args.checkpoint_dir}")
+    logging.info(f"Checkpoint Every: {args.checkpoint_every}")
+    if args.run_sweep:
+        logging.info(f"Sweep Executor: {args.sweep_executor}")
+        if args.sweep_executor == "local":
+            logging.info(f"Sweep Workers: {args.sweep_workers}")
+            logging.info(f"Sweep Threads per Trial: {args.sweep_threads}")
+            logging.info(f"Sweep Min Epochs: {args.sweep_min_epochs}")
+            logging.info(f"Sweep Eta: {args.sweep_eta}")
+            logging.info(f"Sweep Logger: {args.sweep_logger}")
     logging.info("===========================")
 
     return args
@@ -1,14 +1,27 @@
 import os
+import json
 import pickle
 import logging
+import tempfile
 from google.cloud import storage
 import torch
 from torch import nn
 from io import BytesIO
 import wandb
 
-from trainer.training_pipeline import create_data_loaders, train_model
+from trainer.training_pipeline import (
+    create_split_loaders,
+    get_autocast_dtype,
+    train_model,
+)
 from trainer.model import TennisLSTM
+from trainer.checkpoint import Checkpointer
+from trainer.evaluate import check_deployment, evaluate_model, format_metric
+from trainer.gcs_cache import GcsCache
+from trainer.export import export_onnx, export_torchscript, quantization_report
+from trainer.splits import load_or_create_split
+from trainer.sweep import grid_configs, run_sweep
+from trainer.npy_dataset import ARRAY_NAMES, SCHEMA_FILE, load_npy_dataset
 
 # Set up logging
 logging.basicConfig(
@@ -28,8 +41,39 @@ LR = float(os.environ.get("LR"))
 NUM_EPOCHS = int(os.environ.get("NUM_EPOCHS"))
 RUN_SWEEP = os.environ.get("RUN_SWEEP", "0").lower() == "1"
 VAL_F1_THRESHOLD = float(os.environ.get("VAL_F1_THRESHOLD"))
+# Deployment gates on the final evaluation, 0 disables them
+EVAL_MIN_AUC = float(os.environ.get("EVAL_MIN_AUC", "0")) or None
+EVAL_MAX_P99_MS = float(os.environ.get("EVAL_MAX_P99_MS", "0")) or None
 WANDB_KEY = os.environ.get("WANDB_KEY")
 GCS_CACHE = os.environ.get("GCS_CACHE")
+# Least recently used files are evicted past this size; 0 for no limit
+GCS_CACHE_MAX_MB = int(os.environ.get("GCS_CACHE_MAX_MB", "16384"))
+# Opt-in performance mode
+COMPILE_MODEL = os.environ.get("COMPILE_MODEL", "0") == "1"
+BF16 = os.environ.get("BF16", "0") == "1"
+# Vertex AI sets AIP_CHECKPOINT_DIR when the job has a base output directory
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR") or os.environ.get(
+    "AIP_CHECKPOINT_DIR"
+)
+CHECKPOINT_EVERY = int(os.environ.get("CHECKPOINT_EVERY", "1"))
+# Sweep configs
+SWEEP_EXECUTOR = os.environ.get("SWEEP_EXECUTOR", "wandb")
+SWEEP_WORKERS = int(os.environ.get("SWEEP_WORKERS", "1"))
+SWEEP_THREADS = int(os.environ.get("SWEEP_THREADS", "1"))
+SWEEP_MIN_EPOCHS = int(os.environ.get("SWEEP_MIN_EPOCHS", "3"))
+SWEEP_ETA = int(os.environ.get("SWEEP_ETA", "3"))
+SWEEP_LOGGER = os.environ.get("SWEEP_LOGGER", "wandb")
+SWEEP_LOG_FILE = os.environ.get("SWEEP_LOG_FILE", "sweep.jsonl")
+
+# Files larger than GCS_CHUNK_MB download as concurrent byte ranges
+GCS_DOWNLOAD_WORKERS = int(os.environ.get("GCS_DOWNLOAD_WORKERS", "8"))
+GCS_CHUNK_MB = int(os.environ.get("GCS_CHUNK_MB", "32"))
+gcs_cache = GcsCache(
+    GCS_CACHE,
+    GCS_CACHE_MAX_MB * 1024 * 1024 or None,
+    workers=GCS_DOWNLOAD_WORKERS,
+    chunk_bytes=GCS_CHUNK_MB * 1024 * 1024,
+)
 
 logging.info(f"Using GCS bucket: {BUCKET_NAME}")
 logging.info(f"Using GCS credentials: {GOOGLE_APPLICATION_CREDENTIALS}")
@@ -37,31 +81,52 @@ logging.info(f"Using GCS credentials: {GOOGLE_APPLICATION_CREDENTIALS}")
 
 def read_file_from_gcs_or_cache(bucket: storage.Bucket, file_name: str):
     """
-    Read a file from GCS or local cache if it exists.
-    /gcs_cache/msmballstars-data is where the data may be cached.
+    Read a pickle from GCS, through the local cache under GCS_CACHE if it is set
     """
     logging.info(f"Loading file: {file_name}")
-    if GCS_CACHE:
-        local_file_path = os.path.join(GCS_CACHE, file_name)
-        if os.path.exists(local_file_path):
-            logging.info(f"File found in local cache: {local_file_path}")
-            with open(local_file_path, "rb") as f:
-                return pickle.load(f)
-        else:
-            logging.info(f"File not found in local cache: {local_file_path}")
-    else:
-        logging.info("GCS_CACHE is not set, skipping local cache check")
+    return pickle.loads(gcs_cache.read_bytes(bucket, file_name))
+
 
-    blob = bucket.blob(file_name)
-    pickle_data = blob.download_as_bytes()
-    if GCS_CACHE:
-        local_file_path = os.path.join(GCS_CACHE, file_name)
-        # create all parent directories if they don't exist
-        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-        with open(local_file_path, "wb") as f:
-            f.write(pickle_data)
+def read_training_data(bucket: storage.Bucket, file_name: str):
+    """
+    Read training data written by preprocessing_for_training_data.
 
-    return pickle.loads(BytesIO(pickle_data).getvalue())
+    Legacy datasets are a single .pkl file. Newer ones are a folder of .npy files,
+    which are downloaded to the local cache and memory-mapped.
+    """
+    if file_name.endswith(".pkl"):
+        return read_file_from_gcs_or_cache(bucket, file_name)
+
+    names = [f"{name}.npy" for name in ARRAY_NAMES] + [SCHEMA_FILE]
+    local_paths = gcs_cache.get_paths(bucket, [f"{file_name}/{name}" for name in names])
+    return load_npy_dataset(os.path.dirname(local_paths[0]))
+
+
+def get_data_version(bucket: storage.Bucket, file_name: str) -> str:
+    """
+    Content hash of a training dataset, from GCS object metadata only. For .npy
+    datasets this is the schema's md5, which covers the md5 of every array.
+    """
+    if not file_name.endswith(".pkl"):
+        file_name = f"{file_name}/{SCHEMA_FILE}"
+    blob = bucket.get_blob(file_name)
+    if blob is None:
+        raise FileNotFoundError(f"gs://{bucket.name}/{file_name} not found")
+    return blob.md5_hash
+
+
+def load_training_split(bucket: storage.Bucket, file_name: str, test_size: float):
+    """
+    Scaled train/val split of a dataset, cached on disk (under GCS_CACHE if
+    set) so repeat runs and sweep trials skip reading and scaling the data
+    """
+    cache_dir = os.path.join(GCS_CACHE or tempfile.gettempdir(), "splits")
+    return load_or_create_split(
+        cache_dir,
+        get_data_version(bucket, file_name),
+        test_size,
+        lambda: read_training_data(bucket, file_name),
+    )
 
 
 def count_trainable_parameters(model):
@@ -120,23 +185,14 @@ def run_training_setup(
     bucket = client.bucket(BUCKET_NAME)
     logging.info(f"Connected to GCS bucket: {BUCKET_NAME}")
 
-    # Read data file
-    data = read_file_from_gcs_or_cache(bucket, os.path.join(DATA_FOLDER, DATA_FILE))
+    # Read the scaled split of the data file
+    split = load_training_split(bucket, os.path.join(DATA_FOLDER, DATA_FILE), test_size)
 
     # Create dataset loaders
-    train_loader, test_loader = create_data_loaders(
-        device,
-        data["X1"],
-        data["X2"],
-        data["M1"],
-        data["M2"],
-        data["y"],
-        test_size=test_size,
-        batch_size=batch_size,
-    )
+    train_loader, test_loader = create_split_loaders(device, split, batch_size)
 
     # Initialize model
-    input_size = data["X1"].shape[-1]
+    input_size = split["X1_train"].shape[-1]
     model = TennisLSTM(input_size, hidden_size, num_layers).to(device)
     trainable_params = count_trainable_parameters(model)
     logging.info(f"Total number of trainable parameters: {trainable_params}")
@@ -156,6 +212,21 @@ def run_training_setup(
         verbose=True,
     )
 
+    autocast_dtype = None
+    if BF16:
+        autocast_dtype = get_autocast_dtype(device)
+        if autocast_dtype is None:
+            logging.info(f"bfloat16 autocast is not supported on {device}, using fp32")
+    logging.info(f"torch.compile: {COMPILE_MODEL}, autocast dtype: {autocast_dtype}")
+
+    # Sweep trials would overwrite each other's checkpoints
+    checkpointer = None
+    if CHECKPOINT_DIR and not RUN_SWEEP:
+        checkpointer = Checkpointer(CHECKPOINT_DIR, every=CHECKPOINT_EVERY)
+        logging.info(
+            f"Checkpointing every {CHECKPOINT_EVERY} epoch(s) to {CHECKPOINT_DIR}"
+        )
+
     wandb_run.watch(model)
     model, best_val_f1 = train_model(
         model,
@@ -166,6 +237,9 @@ def run_training_setup(
         scheduler,
         num_epochs=NUM_EPOCHS,
         callback=WandbCallback(),
+        compile_model=COMPILE_MODEL,
+        autocast_dtype=autocast_dtype,
+        checkpointer=checkpointer,
     )
 
     # Save model directly to GCS using BytesIO
@@ -177,6 +251,28 @@ def run_training_setup(
                 f"Threshold: {VAL_F1_THRESHOLD}"
             )
             return
+
+        # Quality and latency of the best weights on the validation set
+        report = evaluate_model(model, test_loader, device)
+        metrics = {
+            name: format_metric(report[name])
+            for name in ["auc", "accuracy", "log_loss", "brier"]
+        }
+        logging.info(
+            f"Evaluation: auc {metrics['auc']}, accuracy {metrics['accuracy']}, "
+            f"log loss {metrics['log_loss']}, brier {metrics['brier']}, "
+            f"ece {format_metric(report['reliability']['ece'])}, "
+            f"latency {report['latency']}"
+        )
+        for name in ["auc", "accuracy", "log_loss", "brier"]:
+            wandb_run.summary[f"eval_{name}"] = report[name]
+        wandb_run.summary["eval_ece"] = report["reliability"]["ece"]
+        wandb_run.summary["eval_p99_ms"] = report["latency"]["p99_ms"]
+        reasons = check_deployment(report, EVAL_MIN_AUC, EVAL_MAX_P99_MS)
+        if reasons:
+            logging.info(f"Skipping saving model: {'; '.join(reasons)}")
+            return
+
         gcs_output_path = f"{DATA_FOLDER}/prob_model.pt"
         buffer = BytesIO()
         torch.save(model.state_dict(), buffer)
@@ -188,6 +284,47 @@ def run_training_setup(
         )
         logging.info("Successfully uploaded model to Google Cloud Storage")
 
+        # The model service scales inputs with the same training-set statistics
+        scalers_path = f"{DATA_FOLDER}/prob_model_scalers.json"
+        bucket.blob(scalers_path).upload_from_string(
+            json.dumps(split["scalers"]), content_type="application/json"
+        )
+        logging.info(f"Uploaded scaler statistics to {scalers_path}")
+
+        evaluation_path = f"{DATA_FOLDER}/prob_model_evaluation.json"
+        bucket.blob(evaluation_path).upload_from_string(
+            json.dumps(report), content_type="application/json"
+        )
+        logging.info(f"Uploaded evaluation report to {evaluation_path}")
+
+        # Inference artifacts with BatchNorm folded and dropout removed
+        model.eval()
+        lookback = split["X1_train"].shape[1]
+        for suffix, export in [
+            ("ts", export_torchscript),
+            ("onnx", lambda m, f: export_onnx(m, f, lookback)),
+        ]:
+            export_path = f"{DATA_FOLDER}/prob_model.{suffix}"
+            buffer = BytesIO()
+            export(model.cpu(), buffer)
+            buffer.seek(0)
+            bucket.blob(export_path).upload_from_file(
+                buffer, content_type="application/octet-stream"
+            )
+            logging.info(f"Uploaded inference model to {export_path}")
+
+        # Held-out accuracy of dynamic int8 quantization, checked by the model
+        # service before it serves a quantized model
+        report = quantization_report(
+            model, *[split[f"{name}_val"] for name in ARRAY_NAMES]
+        )
+        logging.info(f"Quantization report: {report}")
+        report_path = f"{DATA_FOLDER}/prob_model_quantization.json"
+        bucket.blob(report_path).upload_from_string(
+            json.dumps(report), content_type="application/json"
+        )
+        logging.info(f"Uploaded quantization report to {report_path}")
+
 
 def objective():
     """Objective function for wandb sweep"""
@@ -210,11 +347,52 @@ def objective():
     wandb.finish()
 
 
+def run_local_sweep(sweep_config):
+    """
+    Run the sweep grid with the local executor. The split is loaded once and
+    shared by every trial.
+    """
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    client = storage.Client()
+    bucket = client.bucket(BUCKET_NAME)
+    split = load_training_split(bucket, os.path.join(DATA_FOLDER, DATA_FILE), TEST_SIZE)
+
+    # Workers move the shared CPU tensors to device
+    train_loader, test_loader = create_split_loaders(
+        torch.device("cpu"), split, batch_size=BATCH_SIZE, data_on_device=True
+    )
+    del split
+
+    results = run_sweep(
+        train_loader.tensors,
+        test_loader.tensors,
+        grid_configs(sweep_config["parameters"]),
+        batch_size=BATCH_SIZE,
+        learning_rate=LR,
+        num_epochs=NUM_EPOCHS,
+        workers=SWEEP_WORKERS,
+        threads_per_trial=SWEEP_THREADS,
+        min_epochs=SWEEP_MIN_EPOCHS,
+        eta=SWEEP_ETA,
+        logger=SWEEP_LOGGER,
+        log_file=SWEEP_LOG_FILE,
+        project="tennis-match-predictor",
+        device=device,
+    )
+    best = results[0]
+    logging.info(
+        f"Best config: {best['config']} with val F1 {best['best_val_f1']:.4f} "
+        f"({sum(result['pruned'] for result in results)} of {len(results)} "
+        "trials stopped early)"
+    )
+
+
 def main():
     logging.info("Starting training script")
 
-    # Initialize wandb
-    wandb.login(key=WANDB_KEY)
+    # Initialize wandb, unless running an offline local sweep
+    if not (RUN_SWEEP and SWEEP_EXECUTOR == "local" and SWEEP_LOGGER == "jsonl"):
+        wandb.login(key=WANDB_KEY)
 
     if RUN_SWEEP:
         # Define sweep configuration
@@ -242,11 +420,14 @@ def main():
             },
         }
 
-        # Initialize sweep
-        sweep_id = wandb.sweep(sweep_config, project="tennis-match-predictor")
+        if SWEEP_EXECUTOR == "local":
+            run_local_sweep(sweep_config)
+        else:
+            # Initialize sweep
+            sweep_id = wandb.sweep(sweep_config, project="tennis-match-predictor")
 
-        # Run sweep (will try all combinations)
-        wandb.agent(sweep_id, objective)
+            # Run sweep (will try all combinations)
+            wandb.agent(sweep_id, objective)
     else:
         # Regular single training run
         wandb.init(
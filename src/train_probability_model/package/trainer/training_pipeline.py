@@ -1,10 +1,12 @@
 import logging
+from collections import deque
+from functools import partial
 
 import torch
-from torch.utils.data import Dataset, DataLoader
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from torch.utils.data import Dataset
+
+from trainer.npy_dataset import ARRAY_NAMES
+from trainer.splits import create_split
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -26,13 +28,103 @@ class TennisDataset(Dataset):
         return self.X1[idx], self.X2[idx], self.M1[idx], self.M2[idx], self.y[idx]
 
 
-def adjust_to_batch_size(data, batch_size):
-    num_samples = len(data)
-    num_batches = num_samples // batch_size
-    return data[: num_batches * batch_size]
+class TensorBatchLoader:
+    """
+    Iterate over equally indexed tensors in batches, without per-sample
+    __getitem__ calls or collation.
+
+    Unshuffled batches are contiguous slices (views, no copy). Shuffled batches
+    gather a slice of a random permutation with one index_select per tensor.
+
+    If the tensors live on the CPU and device is a GPU, each batch is gathered
+    into pinned memory and copied with non_blocking=True, keeping up to
+    `prefetch` batches in flight so transfers overlap with compute.
+
+    With drop_last, a final partial batch is skipped, e.g. so BatchNorm never
+    sees a batch of one sample in training.
+    """
 
+    def __init__(
+        self,
+        tensors,
+        batch_size,
+        shuffle=False,
+        drop_last=False,
+        device=None,
+        pin_memory=False,
+        prefetch=2,
+        generator=None,
+    ):
+        self.tensors = tensors
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.device = device
+        self.pin_memory = pin_memory
+        self.prefetch = max(1, prefetch)
+        self.generator = generator
+        self.num_samples = len(tensors[0])
 
-def create_data_loaders(device, X1, X2, M1, M2, y, test_size, batch_size):
+    def __len__(self):
+        if self.drop_last:
+            return self.num_samples // self.batch_size
+        return (self.num_samples + self.batch_size - 1) // self.batch_size
+
+    def _batches(self):
+        if self.shuffle:
+            order = torch.randperm(
+                self.num_samples,
+                generator=self.generator,
+                device=self.tensors[0].device,
+            )
+        for start in range(0, len(self) * self.batch_size, self.batch_size):
+            end = min(start + self.batch_size, self.num_samples)
+            if self.shuffle:
+                index = order[start:end]
+                yield [tensor.index_select(0, index) for tensor in self.tensors]
+            else:
+                yield [tensor[start:end] for tensor in self.tensors]
+
+    def _transfer(self, batch):
+        if self.pin_memory and not batch[0].is_pinned():
+            batch = [tensor.pin_memory() for tensor in batch]
+        return [tensor.to(self.device, non_blocking=True) for tensor in batch]
+
+    def __iter__(self):
+        if self.device is None or self.tensors[0].device == torch.device(self.device):
+            yield from self._batches()
+            return
+
+        # Queue the next transfers before handing out the current batch
+        pending = deque()
+        for batch in self._batches():
+            pending.append(self._transfer(batch))
+            if len(pending) > self.prefetch:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+
+def fits_on_device(device, nbytes, headroom=0.5):
+    """Whether nbytes of data fit in the free memory of device, leaving headroom"""
+    if device.type != "cuda":
+        return True
+    free, _ = torch.cuda.mem_get_info(device)
+    return nbytes < free * (1 - headroom)
+
+
+def get_autocast_dtype(device):
+    """bfloat16 if autocast supports it on device, otherwise None"""
+    if device.type == "cuda" and torch.cuda.is_bf16_supported():
+        return torch.bfloat16
+    if device.type == "cpu":
+        return torch.bfloat16
+    return None
+
+
+def create_data_loaders(
+    device, X1, X2, M1, M2, y, test_size, batch_size, data_on_device=None
+):
     """
     Create PyTorch dataloaders from the input data.
 
@@ -45,115 +137,156 @@ def create_data_loaders(device, X1, X2, M1, M2, y, test_size, batch_size):
     y (np.array): Array of labels
     test_size (float): Fraction of data to use for testing
     batch_size (int): Batch size for training
+    data_on_device (bool): See create_split_loaders
+
+    Returns:
+    train_loader (TensorBatchLoader): Batches of training data
+    test_loader (TensorBatchLoader): Batches of testing data
+    """
+    split = create_split({"X1": X1, "X2": X2, "M1": M1, "M2": M2, "y": y}, test_size)
+    return create_split_loaders(device, split, batch_size, data_on_device)
+
+
+def create_split_loaders(device, split, batch_size, data_on_device=None):
+    """
+    Create PyTorch dataloaders from a scaled split (see trainer.splits).
+
+    Args:
+    device (torch.device): Device to use for training
+    split (dict): Arrays X1_train ... y_val from create_split or load_split
+    batch_size (int): Batch size for training
+    data_on_device (bool): Copy the whole dataset to device up front. When
+        False, batches are streamed from pinned host memory. Defaults to
+        whether the data fits in free device memory.
 
     Returns:
-    train_loader (DataLoader): DataLoader for training data
-    test_loader (DataLoader): DataLoader for testing data
+    train_loader (TensorBatchLoader): Batches of training data
+    test_loader (TensorBatchLoader): Batches of testing data
     """
-    # Assuming X1 and X2 are 3D arrays with shape (samples, time_steps, features)
-    samples, time_steps, features = X1.shape
-
-    # Reshape X1 and X2 to 2D
-    X1_reshaped = X1.reshape(-1, features)
-    X2_reshaped = X2.reshape(-1, features)
-
-    # Initialize scalers
-    scaler_X1 = StandardScaler()
-    scaler_X2 = StandardScaler()
-
-    # Fit and transform X1 and X2
-    X1_scaled = scaler_X1.fit_transform(X1_reshaped)
-    X2_scaled = scaler_X2.fit_transform(X2_reshaped)
-
-    # Reshape back to 3D
-    X1_scaled = X1_scaled.reshape(samples, time_steps, features)
-    X2_scaled = X2_scaled.reshape(samples, time_steps, features)
-
-    # Split the scaled data
-    (
-        X1_train,
-        X1_test,
-        X2_train,
-        X2_test,
-        M1_train,
-        M1_test,
-        M2_train,
-        M2_test,
-        y_train,
-        y_test,
-    ) = train_test_split(
-        X1_scaled,
-        X2_scaled,
-        M1,
-        M2,
-        y,
-        test_size=test_size,
-        random_state=42,
+    train = [torch.as_tensor(split[f"{name}_train"]) for name in ARRAY_NAMES]
+    test = [torch.as_tensor(split[f"{name}_val"]) for name in ARRAY_NAMES]
+    logging.info(f"Training samples: {len(train[0])}")
+    logging.info(f"Testing samples: {len(test[0])}")
+
+    if data_on_device is None:
+        nbytes = sum(tensor.nbytes for tensor in train + test)
+        data_on_device = fits_on_device(device, nbytes)
+
+    pin_memory = False
+    if data_on_device:
+        logging.info(f"Moving data to device: {device}")
+        train = [tensor.to(device) for tensor in train]
+        test = [tensor.to(device) for tensor in test]
+    elif device.type == "cuda":
+        logging.info(f"Streaming batches to {device} from pinned memory")
+        pin_memory = True
+        train = [tensor.pin_memory() for tensor in train]
+        test = [tensor.pin_memory() for tensor in test]
+
+    # Drop the last partial training batch instead of trimming the arrays;
+    # validation uses every sample
+    train_loader = TensorBatchLoader(
+        train,
+        batch_size,
         shuffle=False,
+        drop_last=True,
+        device=device,
+        pin_memory=pin_memory,
+    )
+    test_loader = TensorBatchLoader(
+        test, batch_size, shuffle=False, device=device, pin_memory=pin_memory
     )
-
-    logging.info(f"Training samples: {len(X1_train)}")
-    logging.info(f"Testing samples: {len(X1_test)}")
-
-    # Avoid uneven batches
-    logging.info("Trimming to have even batch sizes")
-    X1_train = adjust_to_batch_size(X1_train, batch_size)
-    X2_train = adjust_to_batch_size(X2_train, batch_size)
-    M1_train = adjust_to_batch_size(M1_train, batch_size)
-    M2_train = adjust_to_batch_size(M2_train, batch_size)
-    y_train = adjust_to_batch_size(y_train, batch_size)
-    X1_test = adjust_to_batch_size(X1_test, batch_size)
-    X2_test = adjust_to_batch_size(X2_test, batch_size)
-    M1_test = adjust_to_batch_size(M1_test, batch_size)
-    M2_test = adjust_to_batch_size(M2_test, batch_size)
-    y_test = adjust_to_batch_size(y_test, batch_size)
-    logging.info(f"Adjusted training samples: {len(X1_train)}")
-    logging.info(f"Adjusted testing samples: {len(X1_test)}")
-
-    # Move data to device
-    logging.info(f"Moving data to device: {device}")
-    X1_train = torch.FloatTensor(X1_train).to(device)
-    X2_train = torch.FloatTensor(X2_train).to(device)
-    M1_train = torch.FloatTensor(M1_train).to(device)
-    M2_train = torch.FloatTensor(M2_train).to(device)
-    y_train = torch.FloatTensor(y_train).to(device)
-    X1_test = torch.FloatTensor(X1_test).to(device)
-    X2_test = torch.FloatTensor(X2_test).to(device)
-    M1_test = torch.FloatTensor(M1_test).to(device)
-    M2_test = torch.FloatTensor(M2_test).to(device)
-    y_test = torch.FloatTensor(y_test).to(device)
-
-    # Create PyTorch datasets and dataloaders
-    train_dataset = TennisDataset(X1_train, X2_train, M1_train, M2_train, y_train)
-    test_dataset = TennisDataset(X1_test, X2_test, M1_test, M2_test, y_test)
-
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=False)
-    test_loader = DataLoader(test_dataset, batch_size=batch_size, shuffle=False)
     return train_loader, test_loader
 
 
+class BinaryMetrics:
+    """
+    Accumulate summed loss and confusion-matrix counts as tensors on the
+    device, so metrics need a single device sync per epoch.
+
+    Predictions are thresholded at 0.5, and precision, recall and F1 are 0
+    when undefined, as with sklearn's defaults.
+    """
+
+    def __init__(self, device=None):
+        # Indexed by 2 * true + pred: [tn, fp, fn, tp]
+        self.counts = torch.zeros(4, dtype=torch.long, device=device)
+        self.loss_sum = torch.zeros((), dtype=torch.float64, device=device)
+        self.batches = 0
+
+    def update(self, outputs, y, loss):
+        preds = (outputs.detach().reshape(-1) > 0.5).long()
+        true = (y.reshape(-1) > 0.5).long()
+        self.counts += torch.bincount(2 * true + preds, minlength=4)
+        self.loss_sum += loss.detach()
+        self.batches += 1
+
+    def compute(self):
+        tn, fp, fn, tp = self.counts.tolist()
+        loss = self.loss_sum.item() / max(self.batches, 1)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+        return {
+            "loss": loss,
+            "accuracy": (tp + tn) / max(tp + tn + fp + fn, 1),
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+        }
+
+
 class EarlyStopping:
-    def __init__(self, patience=5, min_delta=0.001):
+    def __init__(self, patience=5, min_delta=0.001, offload_to_cpu=True):
         self.patience = patience
         self.min_delta = min_delta
+        self.offload_to_cpu = offload_to_cpu
         self.counter = 0
         self.best_f1 = None
         self.early_stop = False
         self.best_state = None
 
+    def snapshot(self, model):
+        """
+        Copy the model weights. state_dict() returns references to the live
+        parameters, which later optimizer steps would keep changing.
+        """
+        return {
+            key: (
+                value.detach().to("cpu", copy=True)
+                if self.offload_to_cpu
+                else value.detach().clone()
+            )
+            for key, value in model.state_dict().items()
+        }
+
     def __call__(self, val_f1, model):
         if self.best_f1 is None:
             self.best_f1 = val_f1
-            self.best_state = model.state_dict()
+            self.best_state = self.snapshot(model)
         elif val_f1 < self.best_f1 + self.min_delta:
             self.counter += 1
             if self.counter >= self.patience:
                 self.early_stop = True
         else:
             self.best_f1 = val_f1
-            self.best_state = model.state_dict()
+            self.best_state = self.snapshot(model)
             self.counter = 0
 
+    def state_dict(self):
+        return {
+            "counter": self.counter,
+            "best_f1": self.best_f1,
+            "early_stop": self.early_stop,
+            "best_state": self.best_state,
+        }
+
+    def load_state_dict(self, state):
+        self.counter = state["counter"]
+        self.best_f1 = state["best_f1"]
+        self.early_stop = state["early_stop"]
+        self.best_state = state["best_state"]
+
 
 def train_model(
     model,
@@ -164,35 +297,70 @@ def train_model(
     scheduler,
     num_epochs,
     callback=None,
+    compile_model=False,
+    autocast_dtype=None,
+    checkpointer=None,
 ):
     """
     Train the model with early stopping, learning rate scheduling, and optional wandb callback.
 
     Args:
         model: The PyTorch model to train
-        train_loader: DataLoader for training data
-        val_loader: DataLoader for validation data
+        train_loader: Iterable of training batches (X1, X2, M1, M2, y)
+        val_loader: Iterable of validation batches
         criterion: Loss function
         optimizer: Optimizer (AdamW with weight decay)
         scheduler: Learning rate scheduler
         num_epochs: Number of epochs to train
         callback: Optional WandbCallback instance for logging metrics
+        compile_model: Run forward passes through torch.compile(model)
+        autocast_dtype: Run forward passes under autocast to this dtype (e.g. bfloat16)
+        checkpointer: Optional Checkpointer to save training state to every
+            checkpointer.every epochs and resume from if a checkpoint exists
     """
     early_stopping = EarlyStopping(patience=5, min_delta=0.001)
+    device = next(model.parameters()).device
+
+    start_epoch = 0
+    checkpoint = checkpointer.load() if checkpointer is not None else None
+    if checkpoint is not None:
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        scheduler.load_state_dict(checkpoint["scheduler"])
+        early_stopping.load_state_dict(checkpoint["early_stopping"])
+        torch.set_rng_state(checkpoint["rng_state"])
+        if checkpoint["cuda_rng_state"] is not None and torch.cuda.is_available():
+            torch.cuda.set_rng_state_all(checkpoint["cuda_rng_state"])
+        start_epoch = checkpoint["epoch"]
+        logging.info(f"Resuming training from checkpoint after epoch {start_epoch}")
+        if early_stopping.early_stop:
+            logging.info("Checkpointed run had already stopped early")
+            model.load_state_dict(early_stopping.best_state)
+            return model, early_stopping.best_f1
+
+    # The compiled module shares parameters with model, so state_dict keys,
+    # early stopping and saving keep working on the original model
+    forward = torch.compile(model) if compile_model else model
+    autocast = partial(
+        torch.autocast,
+        device.type,
+        dtype=autocast_dtype,
+        enabled=autocast_dtype is not None,
+    )
 
-    for epoch in range(num_epochs):
+    for epoch in range(start_epoch, num_epochs):
         model.train()
-        train_loss = 0.0
-        train_preds = []
-        train_true = []
+        train_metrics = BinaryMetrics(device)
 
         # Training loop
         for X1, X2, M1, M2, y in train_loader:
 
             # Forward pass
             optimizer.zero_grad()
-            outputs, _ = model(X1, X2, M1, M2)
-            loss = criterion(outputs.squeeze(), y)
+            with autocast():
+                outputs, _ = forward(X1, X2, M1, M2)
+            # BCELoss is not autocast-safe, so the loss is computed in fp32
+            loss = criterion(outputs.view(-1).float(), y)
 
             # Backward pass
             loss.backward()
@@ -201,48 +369,37 @@ def train_model(
             torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
 
             optimizer.step()
-            train_loss += loss.item()
-            train_preds.extend(
-                [1 if p > 0.5 else 0 for p in outputs.squeeze().detach().cpu().numpy()]
-            )
-            train_true.extend(y.cpu().numpy())
+            train_metrics.update(outputs, y, loss)
 
         # Validation loop
         model.eval()
-        val_loss = 0
-        val_preds = []
-        val_true = []
+        val_metrics = BinaryMetrics(device)
         with torch.no_grad():
             for X1, X2, M1, M2, y in val_loader:
 
                 # Forward pass
-                outputs, _ = model(X1, X2, M1, M2)
-                loss = criterion(outputs.squeeze(), y)
-
-                val_loss += loss.item()
-                val_preds.extend(
-                    [
-                        1 if p > 0.5 else 0
-                        for p in outputs.squeeze().detach().cpu().numpy()
-                    ]
-                )
-                val_true.extend(y.cpu().numpy())
-
-        # Calculate average losses and metrics
-        train_loss /= len(train_loader)
-        val_loss /= len(val_loader)
+                with autocast():
+                    outputs, _ = forward(X1, X2, M1, M2)
+                loss = criterion(outputs.view(-1).float(), y)
+
+                val_metrics.update(outputs, y, loss)
+
+        # Calculate average losses and metrics, syncing with the device once
+        train = train_metrics.compute()
+        val = val_metrics.compute()
+        train_loss, val_loss = train["loss"], val["loss"]
 
         # Calculate training metrics
-        train_acc = accuracy_score(train_true, train_preds)
-        train_precision = precision_score(train_true, train_preds)
-        train_recall = recall_score(train_true, train_preds)
-        train_f1 = f1_score(train_true, train_preds)
+        train_acc = train["accuracy"]
+        train_precision = train["precision"]
+        train_recall = train["recall"]
+        train_f1 = train["f1"]
 
         # Calculate validation metrics
-        val_acc = accuracy_score(val_true, val_preds)
-        val_precision = precision_score(val_true, val_preds)
-        val_recall = recall_score(val_true, val_preds)
-        val_f1 = f1_score(val_true, val_preds)
+        val_acc = val["accuracy"]
+        val_precision = val["precision"]
+        val_recall = val["recall"]
+        val_f1 = val["f1"]
 
         # Log metrics using wandb callback if provided
         if callback is not None:
@@ -265,14 +422,38 @@ def train_model(
 
         # Early stopping check
         early_stopping(val_f1, model)
+        if not early_stopping.early_stop:
+            # Step the scheduler based on validation F1 score
+            scheduler.step(val_f1)
+
+        # Save the state needed to continue after this epoch
+        if checkpointer is not None and (
+            (epoch + 1) % checkpointer.every == 0
+            or epoch + 1 == num_epochs
+            or early_stopping.early_stop
+        ):
+            checkpointer.save(
+                {
+                    "epoch": epoch + 1,
+                    "model": model.state_dict(),
+                    "optimizer": optimizer.state_dict(),
+                    "scheduler": scheduler.state_dict(),
+                    "early_stopping": early_stopping.state_dict(),
+                    "rng_state": torch.get_rng_state(),
+                    "cuda_rng_state": (
+                        torch.cuda.get_rng_state_all()
+                        if torch.cuda.is_available()
+                        else None
+                    ),
+                }
+            )
+
         if early_stopping.early_stop:
             logging.info(f"Early stopping triggered after {epoch + 1} epochs")
             # Restore best model
             model.load_state_dict(early_stopping.best_state)
             break
 
-        # Step the scheduler based on validation F1 score
-        scheduler.step(val_f1)
         current_lr = optimizer.param_groups[0]["lr"]
 
         # Log progress
@@ -1,10 +1,49 @@
+import io
+import json
 import pytest
 import pandas as pd
 import numpy as np
+import sys
+import os
+import torch
 from unittest.mock import patch
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.metrics import (
+    accuracy_score,
+    brier_score_loss,
+    f1_score,
+    log_loss,
+    precision_score,
+    recall_score,
+    roc_auc_score,
+)
+from torch.utils.data import DataLoader
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../package"))
+from trainer.checkpoint import Checkpointer  # noqa: E402
+from trainer.evaluate import (  # noqa: E402
+    check_deployment,
+    evaluate_model,
+    quality_metrics,
+)
+from trainer.gcs_cache import GcsCache, LocalBucket  # noqa: E402
+from trainer.export import (  # noqa: E402
+    InferenceTennisLSTM,
+    export_torchscript,
+    quantization_report,
+    quantize_dynamic_int8,
+)
+from trainer.model import TennisLSTM  # noqa: E402
+from trainer.splits import load_or_create_split  # noqa: E402
+from trainer.sweep import get_rungs, grid_configs, run_sweep  # noqa: E402
+from trainer.training_pipeline import (  # noqa: E402
+    BinaryMetrics,
+    EarlyStopping,
+    TennisDataset,
+    TensorBatchLoader,
+    train_model,
+)
 
 
 @pytest.fixture
@@ -235,3 +274,373 @@ def test_edge_cases(sample_training_data):
     )
 
     assert not np.isinf(scaled_features).any()
+
+
+@pytest.fixture
+def training_tensors():
+    torch.manual_seed(42)
+    X1 = torch.randn(100, 5, 3)
+    X2 = torch.randn(100, 5, 3)
+    M1 = (torch.rand(100, 5) < 0.2).float()
+    M2 = (torch.rand(100, 5) < 0.2).float()
+    y = torch.arange(100).float()
+    return [X1, X2, M1, M2, y]
+
+
+def test_tensor_batch_loader_matches_dataloader(training_tensors):
+    expected = DataLoader(TennisDataset(*training_tensors), batch_size=32)
+    loader = TensorBatchLoader(training_tensors, batch_size=32)
+
+    assert len(loader) == len(expected) == 4
+    for batch, expected_batch in zip(loader, expected):
+        for tensor, expected_tensor in zip(batch, expected_batch):
+            assert torch.equal(tensor, expected_tensor)
+
+
+def test_tensor_batch_loader_shuffle(training_tensors):
+    loader = TensorBatchLoader(
+        training_tensors,
+        batch_size=32,
+        shuffle=True,
+        generator=torch.Generator().manual_seed(0),
+    )
+
+    # Every sample appears exactly once, with its rows kept together
+    seen = []
+    for X1, X2, M1, M2, y in loader:
+        index = y.long()
+        assert torch.equal(X1, training_tensors[0][index])
+        assert torch.equal(M2, training_tensors[3][index])
+        seen.extend(index.tolist())
+    assert sorted(seen) == list(range(100))
+    assert seen != list(range(100))
+
+
+@pytest.mark.parametrize("threshold", [0.0, 1.0])
+def test_binary_metrics_match_sklearn(threshold):
+    torch.manual_seed(42)
+    outputs = [torch.rand(32, 1) * (1 - threshold) for _ in range(5)]
+    labels = [(torch.rand(32) < 0.5).float() for _ in range(5)]
+    losses = [torch.rand(()) for _ in range(5)]
+
+    metrics = BinaryMetrics()
+    for batch_outputs, y, loss in zip(outputs, labels, losses):
+        metrics.update(batch_outputs, y, loss)
+    result = metrics.compute()
+
+    # threshold=1.0 predicts no positives, where sklearn reports 0 precision
+    preds = (torch.cat(outputs).squeeze() > 0.5).long().numpy()
+    true = torch.cat(labels).numpy()
+    assert result["loss"] == pytest.approx(sum(loss.item() for loss in losses) / 5)
+    assert result["accuracy"] == pytest.approx(accuracy_score(true, preds))
+    assert result["precision"] == pytest.approx(
+        precision_score(true, preds, zero_division=0)
+    )
+    assert result["recall"] == pytest.approx(recall_score(true, preds))
+    assert result["f1"] == pytest.approx(f1_score(true, preds, zero_division=0))
+
+
+def test_train_model_bf16_autocast(training_tensors):
+    training_tensors[4] = (training_tensors[0][:, :, 0].mean(dim=1) > 0).float()
+    loader = TensorBatchLoader(training_tensors, batch_size=20)
+    model = TennisLSTM(3, 8, 1)
+    optimizer = torch.optim.AdamW(model.parameters())
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode="max")
+
+    model, best_f1 = train_model(
+        model,
+        loader,
+        loader,
+        torch.nn.BCELoss(),
+        optimizer,
+        scheduler,
+        num_epochs=2,
+        autocast_dtype=torch.bfloat16,
+    )
+
+    assert 0 <= best_f1 <= 1
+    assert all(
+        p.dtype == torch.float32
+        for p in model.state_dict().values()
+        if p.is_floating_point()
+    )
+
+
+def test_local_sweep(training_tensors, tmp_path):
+    training_tensors[4] = (training_tensors[0][:, :, 0].mean(dim=1) > 0).float()
+    configs = grid_configs(
+        {"hidden_size": {"values": [4, 8]}, "num_layers": {"values": [1, 2]}}
+    )
+    assert len(configs) == 4
+    assert get_rungs(min_epochs=1, eta=2, num_epochs=3) == [1, 2]
+
+    log_file = str(tmp_path / "sweep.jsonl")
+    results = run_sweep(
+        # 81 training samples leave a final batch of one
+        [tensor[:81] for tensor in training_tensors],
+        [tensor[81:] for tensor in training_tensors],
+        configs,
+        batch_size=20,
+        learning_rate=1e-3,
+        num_epochs=3,
+        workers=2,
+        min_epochs=1,
+        eta=2,
+        log_file=log_file,
+    )
+
+    assert sorted(result["trial"] for result in results) == [0, 1, 2, 3]
+    assert results[0]["best_val_f1"] == max(r["best_val_f1"] for r in results)
+    # Pruned trials stop at a rung, the others train all epochs
+    for result in results:
+        assert result["epochs"] in ([1, 2] if result["pruned"] else [3])
+    with open(log_file) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == sum(result["epochs"] for result in results)
+
+
+def test_early_stopping_snapshots_best_state():
+    model = TennisLSTM(3, 8, 1)
+    early_stopping = EarlyStopping(patience=2)
+    early_stopping(0.7, model)
+    best_weight = model.fc2.weight.detach().clone()
+
+    with torch.no_grad():
+        model.fc2.weight.add_(1.0)
+    early_stopping(0.6, model)
+
+    assert torch.equal(early_stopping.best_state["fc2.weight"], best_weight)
+    assert early_stopping.best_state["fc2.weight"].device.type == "cpu"
+
+
+def test_train_model_resumes_from_checkpoint(training_tensors, tmp_path):
+    training_tensors[4] = (training_tensors[0][:, :, 0].mean(dim=1) > 0).float()
+    loader = TensorBatchLoader(training_tensors, batch_size=20)
+
+    class EpochRecorder:
+        def __init__(self):
+            self.epochs = []
+
+        def on_epoch_end(self, epoch, **metrics):
+            self.epochs.append(epoch)
+
+    def train(num_epochs, checkpointer=None):
+        torch.manual_seed(0)
+        model = TennisLSTM(3, 8, 2)
+        optimizer = torch.optim.AdamW(model.parameters())
+        scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode="max")
+        recorder = EpochRecorder()
+        train_model(
+            model,
+            loader,
+            loader,
+            torch.nn.BCELoss(),
+            optimizer,
+            scheduler,
+            num_epochs=num_epochs,
+            callback=recorder,
+            checkpointer=checkpointer,
+        )
+        return model, recorder.epochs
+
+    uninterrupted, _ = train(4)
+
+    # Simulate a preemption after epoch 2, then a restart of the same job
+    checkpointer = Checkpointer(str(tmp_path))
+    _, first_epochs = train(2, checkpointer)
+    resumed, resumed_epochs = train(4, checkpointer)
+
+    assert first_epochs == [1, 2]
+    assert resumed_epochs == [3, 4]
+    for key, value in uninterrupted.state_dict().items():
+        assert torch.equal(resumed.state_dict()[key], value), key
+
+
+def test_tensor_batch_loader_drop_last(training_tensors):
+    loader = TensorBatchLoader(training_tensors, batch_size=32, drop_last=True)
+
+    batches = list(loader)
+    assert len(loader) == len(batches) == 3
+    assert all(len(batch[4]) == 32 for batch in batches)
+
+
+def test_split_scaled_on_train_rows_and_cached(tmp_path):
+    rng = np.random.default_rng(42)
+    # Later rows drift, so full-data statistics would differ from train-only ones
+    X = rng.normal(size=(100, 5, 3)) + np.linspace(0, 10, 100)[:, None, None]
+    data = {"X1": X, "X2": X * 2, "M1": np.zeros((100, 5)), "M2": np.zeros((100, 5))}
+    data["y"] = np.tile([1, 0], 50)
+    reads = []
+
+    def read_data():
+        reads.append(1)
+        return data
+
+    split = load_or_create_split(str(tmp_path), "md5-a", 0.2, read_data)
+
+    assert len(split["X1_train"]) == 80 and len(split["y_val"]) == 20
+    assert split["X1_train"].dtype == np.float32
+    train_rows = X[:80].reshape(-1, 3)
+    np.testing.assert_allclose(split["scalers"]["X1"]["mean"], train_rows.mean(axis=0))
+    np.testing.assert_allclose(
+        split["X1_train"].reshape(-1, 3).mean(axis=0), 0, atol=1e-5
+    )
+    assert split["X1_val"].reshape(-1, 3).mean() > 1
+
+    # Same data version and test size: served from disk without reading data
+    cached = load_or_create_split(str(tmp_path), "md5-a", 0.2, read_data)
+    assert len(reads) == 1
+    for key in split:
+        if key != "scalers":
+            np.testing.assert_array_equal(cached[key], split[key])
+    assert cached["scalers"] == split["scalers"]
+
+    # A new data version or test size is a different split
+    load_or_create_split(str(tmp_path), "md5-b", 0.2, read_data)
+    load_or_create_split(str(tmp_path), "md5-a", 0.3, read_data)
+    assert len(reads) == 3
+
+
+def test_gcs_cache_validates_and_evicts(tmp_path):
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    for name in ["a", "b"]:
+        bucket.blob(f"data/{name}.npy").upload_from_string(name * 100)
+    cache = GcsCache(str(tmp_path / "cache"), max_bytes=150)
+
+    path_a = cache.get_path(bucket, "data/a.npy")
+    assert path_a == str(tmp_path / "cache" / "local-bucket" / "data" / "a.npy")
+    assert cache.read_bytes(bucket, "data/a.npy") == b"a" * 100
+
+    # A rewritten object has a new generation and is downloaded again
+    bucket.blob("data/a.npy").upload_from_string(b"new")
+    os.utime(bucket.blob("data/a.npy").path, ns=(1, 1))
+    assert cache.read_bytes(bucket, "data/a.npy") == b"new"
+
+    # Past max_bytes, the least recently used file goes first
+    cache.get_path(bucket, "data/b.npy")
+    bucket.blob("data/c.npy").upload_from_string(b"c" * 100)
+    path_c = cache.get_path(bucket, "data/c.npy")
+    assert os.path.exists(path_c) and not os.path.exists(path_a)
+
+
+def test_evaluate_model_with_undefined_metrics(training_tensors):
+    model = TennisLSTM(3, 8, 2).eval()
+    # A single class has no AUC
+    training_tensors[4] = torch.ones(100)
+    report = evaluate_model(model, TensorBatchLoader(training_tensors, batch_size=32))
+    assert report["auc"] is None
+    assert report["accuracy"] is not None
+    # A configured gate fails closed
+    assert check_deployment(report) == []
+    assert check_deployment(report, min_auc=0.9)[0].startswith("auc is undefined")
+    json.loads(json.dumps(report), parse_constant=pytest.fail)
+
+    # An empty loader has no metrics or latencies at all
+    empty = TensorBatchLoader([tensor[:0] for tensor in training_tensors], 32)
+    report = evaluate_model(model, empty)
+    assert report["samples"] == 0
+    assert report["auc"] is None and report["log_loss"] is None
+    assert report["latency"]["p99_ms"] is None
+    assert len(check_deployment(report, min_auc=0.9, max_p99_ms=1.0)) == 2
+    json.loads(json.dumps(report), parse_constant=pytest.fail)
+
+
+def test_inference_export_matches_eager(training_tensors):
+    X1, X2, M1, M2, _ = training_tensors
+    torch.manual_seed(42)
+    model = TennisLSTM(3, 8, 2)
+    # Give the BatchNorm layers non-trivial running statistics to fold
+    model.train()
+    for _ in range(3):
+        model(X1 * 3 + 1, X2, M1, M2)
+    model.eval()
+
+    with torch.no_grad():
+        expected, _ = model(X1, X2, M1, M2)
+        folded = InferenceTennisLSTM(model)
+        assert not any(
+            isinstance(m, (torch.nn.BatchNorm1d, torch.nn.Dropout))
+            for m in folded.modules()
+        )
+        assert torch.allclose(folded(X1, X2, M1, M2), expected, atol=1e-6)
+
+        buffer = io.BytesIO()
+        export_torchscript(model, buffer)
+        buffer.seek(0)
+        scripted = torch.jit.load(buffer)
+        assert torch.allclose(scripted(X1, X2, M1, M2), expected, atol=1e-6)
+
+
+def test_dynamic_int8_quantization(training_tensors):
+    X1, X2, M1, M2, _ = training_tensors
+    torch.manual_seed(42)
+    model = TennisLSTM(3, 8, 2).eval()
+    quantized = quantize_dynamic_int8(model)
+
+    assert isinstance(quantized.lstm, torch.ao.nn.quantized.dynamic.LSTM)
+    assert isinstance(quantized.fc, torch.ao.nn.quantized.dynamic.Linear)
+    # The original model is left in fp32
+    assert isinstance(model.lstm, torch.nn.LSTM)
+    with torch.no_grad():
+        expected, _ = model(X1, X2, M1, M2)
+        output, _ = quantized(X1, X2, M1, M2)
+    assert torch.allclose(output, expected, atol=0.05)
+
+    y = (expected.view(-1) > expected.median()).float().numpy()
+    report = quantization_report(
+        model, X1.numpy(), X2.numpy(), M1.numpy(), M2.numpy(), y
+    )
+    assert report["samples"] == 100
+    assert report["fp32"]["auc"] == 1.0
+    assert set(report["int8"]) == {"auc", "f1"}
+
+    # A single-class split has no AUC, instead of failing the export
+    report = quantization_report(
+        model, X1.numpy(), X2.numpy(), M1.numpy(), M2.numpy(), np.ones(100)
+    )
+    assert report["fp32"]["auc"] is None and report["int8"]["auc"] is None
+    assert report["fp32"]["f1"] is not None
+    json.loads(json.dumps(report), parse_constant=pytest.fail)
+
+
+def test_quality_metrics_match_sklearn():
+    torch.manual_seed(42)
+    labels = (torch.rand(500) < 0.4).float()
+    # Rounded scores, so the AUC has to handle ties
+    probabilities = torch.round((torch.rand(500) * 0.6 + labels * 0.3) * 20) / 20
+
+    result = quality_metrics(probabilities, labels, n_bins=5)
+
+    p, y = probabilities.numpy(), labels.numpy()
+    assert result["auc"] == pytest.approx(roc_auc_score(y, p))
+    assert result["accuracy"] == pytest.approx(accuracy_score(y, p > 0.5))
+    assert result["log_loss"] == pytest.approx(log_loss(y, p), rel=1e-5)
+    assert result["brier"] == pytest.approx(brier_score_loss(y, p))
+
+    bins = result["reliability"]
+    assert sum(bins["count"]) == 500
+    assert bins["count"][4] == int((p >= 0.8).sum())
+    assert bins["positive_rate"][4] == pytest.approx(y[p >= 0.8].mean())
+    assert 0 < bins["ece"] < 1
+
+
+def test_evaluate_model_unpacks_tennis_lstm_outputs(training_tensors):
+    torch.manual_seed(42)
+    model = TennisLSTM(3, 8, 2).eval()
+    training_tensors[4] = (torch.rand(100) < 0.5).float()
+    loader = TensorBatchLoader(training_tensors, batch_size=32)
+
+    report = evaluate_model(model, loader)
+
+    with torch.no_grad():
+        expected, _ = model(*training_tensors[:4])
+    y = training_tensors[4].numpy()
+    assert report["samples"] == 100
+    assert report["auc"] == pytest.approx(roc_auc_score(y, expected.view(-1).numpy()))
+    # The first of 4 batches is left out as warmup
+    assert report["latency"]["batches"] == 3
+    assert report["latency"]["samples_per_second"] > 0
+    assert report["latency"]["p50_ms"] <= report["latency"]["p99_ms"]
+
+    assert check_deployment(report) == []
+    assert len(check_deployment(report, min_auc=1.01, max_p99_ms=0.0)) == 2